@@ -1,10 +1,10 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
+import click
 import os
 import sys
-import logging
+import weakref
 from datetime import timedelta
 
 # 获取项目根目录路径
@@ -19,32 +19,31 @@ from config import Config
 # 初始化扩展
 db = SQLAlchemy()
 login_manager = LoginManager()
-migrate = Migrate()
 
 # 配置登录管理器
 login_manager.login_view = 'auth.login'  # 设置登录视图
 login_manager.login_message = '请先登录以访问此页面。'
 login_manager.login_message_category = 'warning'
 
+# gunicorn --preload 时连接池在master进程中创建，worker中丢弃继承来的连接。
+# fork 回调只注册一次；引擎用弱引用记录，测试等场景多次 create_app 后旧应用的引擎可以被回收
+_fork_engines = weakref.WeakSet()
+
+def _dispose_engines_after_fork():
+    for engine in list(_fork_engines):
+        engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
 def create_app(config_class=Config):
     """应用工厂函数"""
     app = Flask(__name__)
     app.config.from_object(config_class)
     
-    # 生产环境日志配置
-    if not app.debug:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        
-        # 文件日志处理器
-        file_handler = logging.FileHandler('logs/app.log')
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
-        app.logger.info('餐厅点餐平台启动')
+    # 日志配置（结构化日志、请求ID、后台线程写出）
+    from app.services.app_logging import app_logging
+    app_logging.init_app(app)
+    app.logger.info('餐厅点餐平台启动')
     
     # 确保上传目录存在
     upload_dirs = [
@@ -57,14 +56,54 @@ def create_app(config_class=Config):
         if upload_dir and not os.path.exists(upload_dir):
             try:
                 os.makedirs(upload_dir, exist_ok=True)
-                app.logger.info(f"创建上传目录: {upload_dir}")
+                app.logger.info("创建上传目录: %s", upload_dir)
             except Exception as e:
-                app.logger.error(f"创建目录失败 {upload_dir}: {e}")
+                app.logger.error("创建目录失败 %s: %s", upload_dir, e)
     
     # 初始化扩展
     db.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    
+    # Flask-Migrate 会导入整个 alembic（约占启动时间的两成），只在 flask 命令行中需要
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
+    # 模板中块标签所在的行不输出多余的空行和缩进
+    app.jinja_env.trim_blocks = True
+    app.jinja_env.lstrip_blocks = True
+    
+    # 响应压缩（最先注册的 after_request 最后执行，压缩在其他钩子之后进行）
+    from app.services.compression import compression
+    compression.init_app(app)
+    
+    # 带指纹和预压缩的静态资源（/assets/）
+    from app.services.assets import assets
+    assets.init_app(app)
+    
+    # 请求级SQL统计和慢查询日志
+    from app.services.query_stats import query_stats
+    query_stats.init_app(app)
+    
+    # Prometheus 监控指标（/metrics）
+    from app.services.metrics import metrics
+    metrics.init_app(app)
+    
+    # 按需的请求性能分析（PROFILER_ENABLED 开启时）
+    from app.services.profiler import request_profiler
+    request_profiler.init_app(app)
+    
+    # 服务端购物车存储
+    from app.services.cart_service import cart_service
+    cart_service.init_app(app)
+    
+    # 订单事件推送
+    from app.services.order_events import order_events
+    order_events.init_app(app)
+    
+    # 高峰期订单写入队列（ORDER_INGEST_MODE = 'queue' 时启用）
+    from app.services.order_ingest import order_ingest
+    order_ingest.init_app(app)
     
     # 用户加载器
     from app.models import User
@@ -75,7 +114,7 @@ def create_app(config_class=Config):
         try:
             return User.query.get(int(user_id))
         except Exception as e:
-            app.logger.error(f"加载用户时出错: {e}")
+            app.logger.error("加载用户时出错: %s", e)
             return None
     
     # 注册蓝图
@@ -87,18 +126,24 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
     app.register_blueprint(restaurant_bp, url_prefix='/restaurant')
     
-    # 创建数据库表
+    # 数据库结构：部署时用 flask init-db 显式执行，不在每个进程启动时检查
+    from app.services.schema import upgrade_schema
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """创建缺少的表并补建新列和新索引"""
+        added = upgrade_schema()
+        print(f"✅ 数据库结构已是最新{'，补建列: ' + ', '.join(added) if added else ''}")
+    
+    if app.config.get('SCHEMA_AUTO_UPGRADE'):
+        with app.app_context():
+            try:
+                upgrade_schema()
+            except Exception as e:
+                app.logger.error("数据库创建时出错: %s", e)
+    
+    # fork 出的子进程中丢弃继承来的连接（见 _dispose_engines_after_fork）
     with app.app_context():
-        try:
-            db.create_all()
-            app.logger.info("数据库表创建/验证完成")
-            
-            # 检查表是否存在
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            app.logger.info(f"数据库表: {tables}")
-        except Exception as e:
-            app.logger.error(f"数据库创建时出错: {e}")
+        _fork_engines.update(db.engines.values())
     
     return app
\ No newline at end of file
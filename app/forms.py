@@ -143,7 +143,7 @@ class DishForm(FlaskForm):
         super(DishForm, self).__init__(*args, **kwargs)
         if restaurant_id:
             # 动态加载该餐厅的分类
-            categories = Category.query.filter_by(restaurant_id=restaurant_id).all()
+            categories = Category.query.filter_by(restaurant_id=restaurant_id).filter(Category.deleted_at.is_(None)).all()
             self.category_id.choices = [(c.id, c.name) for c in categories]
 
 class CategoryEditForm(FlaskForm):
@@ -187,7 +187,7 @@ class DishEditForm(FlaskForm):
         super(DishEditForm, self).__init__(*args, **kwargs)
         if restaurant_id:
             # 动态加载该餐厅的分类
-            categories = Category.query.filter_by(restaurant_id=restaurant_id).all()
+            categories = Category.query.filter_by(restaurant_id=restaurant_id).filter(Category.deleted_at.is_(None)).all()
             self.category_id.choices = [(c.id, c.name) for c in categories]
 
 class ReportFilterForm(FlaskForm):
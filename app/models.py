@@ -3,7 +3,7 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
 from sqlalchemy.orm import validates
-from sqlalchemy import func, distinct, Date, cast
+from sqlalchemy import func, distinct, Date, cast, case, event, select
 
 # 用户加载器
 @login_manager.user_loader
@@ -74,6 +74,11 @@ class Restaurant(db.Model):
     orders = db.relationship('Order', backref='restaurant', lazy='dynamic')
     blacklist = db.relationship('Blacklist', backref='restaurant', lazy='dynamic', cascade='all, delete-orphan')
     
+    # 餐厅列表按 (total_sales, id) 键集分页
+    __table_args__ = (
+        db.Index('ix_restaurant_total_sales_id', 'total_sales', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Restaurant {self.name}>'
     
@@ -148,6 +153,7 @@ class Category(db.Model):
     name = db.Column(db.String(50), nullable=False)
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime)  # 删除时间：仍有已归档菜品引用时保留为墓碑，不再显示
     
     # 关系定义
     dishes = db.relationship('Dish', backref='category', lazy='dynamic', cascade='all, delete-orphan')
@@ -155,6 +161,11 @@ class Category(db.Model):
     def __repr__(self):
         return f'<Category {self.name}>'
     
+    @property
+    def active_dish_count(self):
+        """未归档的菜品数"""
+        return self.dishes.filter(Dish.deleted_at.is_(None)).count()
+    
     @staticmethod
     def create_default_categories(restaurant_id):
         """为餐厅创建默认分类"""
@@ -177,6 +188,7 @@ class Dish(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     order_count = db.Column(db.Integer, default=0)  # 被点次数
     is_active = db.Column(db.Boolean, default=True)  # 是否上架
+    deleted_at = db.Column(db.DateTime)  # 归档（软删除）时间，非空表示已删除
     
     # 关系定义
     order_items = db.relationship('OrderItem', backref='dish', lazy='dynamic', cascade='all, delete-orphan')
@@ -184,6 +196,10 @@ class Dish(db.Model):
     def __repr__(self):
         return f'<Dish {self.name}>'
     
+    @property
+    def is_deleted(self):
+        return self.deleted_at is not None
+    
     @validates('description')
     def validate_description(self, key, description):
         if len(description) > 500:
@@ -235,6 +251,12 @@ class Order(db.Model):
     # 关系定义
     items = db.relationship('OrderItem', backref='order', lazy='dynamic', cascade='all, delete-orphan')
     
+    # 订单管理页面按 (created_at, id) 键集分页，可按状态筛选
+    __table_args__ = (
+        db.Index('ix_order_restaurant_created_id', 'restaurant_id', 'created_at', 'id'),
+        db.Index('ix_order_restaurant_status_created_id', 'restaurant_id', 'status', 'created_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Order {self.id}>'
     
@@ -273,4 +295,140 @@ class Blacklist(db.Model):
     __table_args__ = (db.UniqueConstraint('restaurant_id', 'user_id', name='_restaurant_user_uc'),)
     
     def __repr__(self):
-        return f'<Blacklist restaurant:{self.restaurant_id} user:{self.user_id}>'
\ No newline at end of file
+        return f'<Blacklist restaurant:{self.restaurant_id} user:{self.user_id}>'
+
+class MenuVersion(db.Model):
+    """餐厅菜单版本号 - 菜品/分类变更时递增，用于菜单页面缓存失效"""
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MenuVersion restaurant:{self.restaurant_id} v{self.version}>'
+
+class DishDeletionJob(db.Model):
+    """后台删除菜品任务 - 进度保存在数据库中，任意worker都能查询"""
+    id = db.Column(db.String(32), primary_key=True)
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), nullable=False, index=True)
+    dish_id = db.Column(db.Integer, nullable=False)  # 菜品删除后记录仍保留，不设外键
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, done, failed
+    total_orders = db.Column(db.Integer, nullable=False, default=0)
+    orders_deleted = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text, default='')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # 最后一次进度更新
+    
+    def __repr__(self):
+        return f'<DishDeletionJob {self.id} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'restaurant_id': self.restaurant_id,
+            'dish_id': self.dish_id,
+            'status': self.status,
+            'total_orders': self.total_orders,
+            'orders_deleted': self.orders_deleted,
+            'message': self.message or ''
+        }
+
+class BlacklistVersion(db.Model):
+    """餐厅黑名单版本号 - 拉黑/移除时递增，各个worker据此让黑名单缓存失效"""
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BlacklistVersion restaurant:{self.restaurant_id} v{self.version}>'
+
+class OrderIdSequence(db.Model):
+    """订单号序列 - 直接结算、写入队列预留号段、测试数据脚本都从这里取号，多个进程不会分到同一个订单号"""
+    name = db.Column(db.String(20), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<OrderIdSequence {self.name}:{self.next_id}>'
+    
+    @staticmethod
+    def allocate(connection, count=1):
+        """
+        预留 count 个连续的订单号，返回第一个（随 connection 的事务提交）
+        序列不会低于已有的最大订单号，绕过序列写入的订单也不会被重复分配
+        """
+        table = OrderIdSequence.__table__
+        floor = select(func.coalesce(func.max(Order.__table__.c.id), 0) + 1).scalar_subquery()
+        start = case((table.c.next_id > floor, table.c.next_id), else_=floor)
+        updated = connection.execute(
+            table.update().where(table.c.name == 'order').values(next_id=start + count)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(name='order', next_id=floor + count))
+        next_id = connection.execute(select(table.c.next_id).where(table.c.name == 'order')).scalar()
+        return next_id - count
+
+@event.listens_for(Order, 'before_insert')
+def _assign_order_id(mapper, connection, target):
+    """ORM 新建的订单从序列取号"""
+    if target.id is None:
+        target.id = OrderIdSequence.allocate(connection)
+
+class IdempotencyKey(db.Model):
+    """结算请求幂等键 - 保存首次请求的结果，客户端重试时原样返回"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # 请求内容摘要
+    status_code = db.Column(db.Integer)
+    response = db.Column(db.Text)  # JSON格式的响应内容
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (db.UniqueConstraint('user_id', 'key', name='_user_idempotency_key_uc'),)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey user:{self.user_id} {self.key}>'
+
+class CustomerArchiveStats(db.Model):
+    """顾客在餐厅的已归档订单汇总 - 归档订单时在业务库中累加，顾客管理页与近期订单一起在SQL中排序分页"""
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    total_spent = db.Column(db.Float, nullable=False, default=0.0)  # 已完成订单的金额
+    last_order_at = db.Column(db.DateTime)  # 最后一个已完成订单的下单时间
+    
+    def __repr__(self):
+        return f'<CustomerArchiveStats restaurant:{self.restaurant_id} user:{self.user_id}>'
+
+# ================= 冷归档（独立的 archive 数据库） =================
+
+class ArchivedOrder(db.Model):
+    """已归档订单 - 超过 ORDER_ARCHIVE_DAYS 的已完成/已取消订单，ID与原订单相同"""
+    __bind_key__ = 'archive'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    restaurant_id = db.Column(db.Integer, nullable=False, index=True)
+    total_amount = db.Column(db.Float, nullable=False, default=0.0)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, index=True)
+    paid_at = db.Column(db.DateTime)
+    remarks = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    items = db.relationship('ArchivedOrderItem', backref='order', lazy='dynamic', cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<ArchivedOrder {self.id}>'
+
+class ArchivedOrderItem(db.Model):
+    """已归档订单项"""
+    __bind_key__ = 'archive'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_order.id'), nullable=False, index=True)
+    dish_id = db.Column(db.Integer, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    price_at_time = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<ArchivedOrderItem {self.id}>'
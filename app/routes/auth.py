@@ -1,7 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, current_user, logout_user, login_required
 from werkzeug.utils import secure_filename
-from PIL import Image
 import os
 import secrets
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -38,7 +37,8 @@ def save_avatar(avatar_file):
     # 保存原始文件
     avatar_file.save(avatar_path)
     
-    # 调整图片大小
+    # 调整图片大小（PIL 导入较慢，只在上传头像时导入）
+    from PIL import Image
     try:
         img = Image.open(avatar_path)
         # 将图片转换为RGB模式（如果是PNG的话）
@@ -1,19 +1,43 @@
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session, current_app, make_response, abort, Response
+from werkzeug.http import is_resource_modified
 from flask_login import login_required, current_user
-from app.models import User, Restaurant, Dish, Order, OrderItem, Category, Blacklist
+from app.models import User, Restaurant, Dish, Order, OrderItem, Category
 from app import db
-from sqlalchemy import desc
+from app.services.cart_service import cart_service
+from app.services.menu_cache import menu_cache
+from app.services.restaurant_ranking import restaurant_ranking, fetch_page
+from app.services.blacklist_service import blacklist_service
+from app.services.order_events import order_events
+from app.services import idempotency
+from app.services.order_ingest import order_ingest
+from app.services.metrics import metrics
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 main_bp = Blueprint('main', __name__)
 
+@main_bp.before_app_request
+def migrate_session_cart():
+    """把旧版存放在Cookie会话中的购物车迁移到服务端存储"""
+    if 'cart' in session and current_user.is_authenticated:
+        legacy_cart = session.pop('cart') or {}
+        if legacy_cart:
+            cart_service.import_legacy(current_user.id, legacy_cart)
+
+@main_bp.app_context_processor
+def inject_cart_count():
+    """向所有模板注入购物车数量（导航栏徽章使用）"""
+    if current_user.is_authenticated:
+        return {'cart_count': cart_service.get_count(current_user.id)}
+    return {'cart_count': 0}
+
 @main_bp.route('/api/clear-cart', methods=['POST'])
 @login_required
 def clear_cart():
     """清空购物车"""
-    session['cart'] = {}
-    session.modified = True
-    return jsonify({'success': True, 'message': '购物车已清空'})
+    cart_service.clear(current_user.id)
+    return jsonify({'success': True, 'message': '购物车已清空', 'cart_count': 0})
 
 @main_bp.route('/')
 @main_bp.route('/index')
@@ -37,69 +61,105 @@ def menu():
 @main_bp.route('/restaurants')
 @login_required
 def restaurants():
-    """餐厅列表页面 - 按销售额排序"""
-    # 获取所有餐厅，按销售额降序排序
-    restaurants_list = Restaurant.query.order_by(desc(Restaurant.total_sales)).all()
-    
-    # 初始化购物车（如果不存在）
-    if 'cart' not in session:
-        session['cart'] = {}
+    """餐厅列表页面 - 按销售额排序，第一页来自排行缓存，之后按游标加载"""
+    restaurants_list, next_cursor = restaurant_ranking.first_page()
     
     return render_template('restaurants.html', 
                          title='选择餐厅',
-                         restaurants=restaurants_list)
+                         restaurants=restaurants_list,
+                         next_cursor=next_cursor)
+
+@main_bp.route('/api/restaurants')
+@login_required
+def api_restaurants():
+    """餐厅列表分页API（无限滚动） - 键集分页，游标为上一页最后一家餐厅"""
+    cursor = request.args.get('cursor', '').strip()
+    per_page = current_app.config.get('RESTAURANTS_PER_PAGE', 12)
+    
+    if cursor:
+        restaurants_list, next_cursor = fetch_page(cursor, limit=per_page)
+    else:
+        restaurants_list, next_cursor = restaurant_ranking.first_page()
+    
+    return jsonify({
+        'success': True,
+        'restaurants': restaurants_list,
+        'html': render_template('restaurant_cards_fragment.html', restaurants=restaurants_list),
+        'next_cursor': next_cursor
+    })
 
 @main_bp.route('/restaurant/<int:restaurant_id>/menu')
 @login_required
 def restaurant_menu(restaurant_id):
-    """餐厅菜单页面"""
+    """餐厅菜单页面 - 菜单主体按菜单版本缓存，支持条件GET"""
     restaurant = Restaurant.query.get_or_404(restaurant_id)
     
     # 新增：检查用户是否在该餐厅的黑名单中
-    blacklist_record = Blacklist.query.filter_by(
-        restaurant_id=restaurant_id,
-        user_id=current_user.id
-    ).first()
+    blacklist_record = blacklist_service.get_entry(restaurant_id, current_user.id)
     
     if blacklist_record:
-        flash(f'您已被该餐厅加入黑名单，无法查看菜单。原因：{blacklist_record.reason or "无具体原因"}', 'danger')
+        flash(f'您已被该餐厅加入黑名单，无法查看菜单。原因：{blacklist_record["reason"] or "无具体原因"}', 'danger')
         return redirect(url_for('main.restaurants'))
     
-    # 获取所有分类
-    categories = Category.query.filter_by(restaurant_id=restaurant_id).all()
-    
     # 获取分类ID（如果有的话）
     category_id = request.args.get('category_id', type=int)
     
-    # 构建菜品查询
-    if category_id:
-        # 显示特定分类的菜品
-        dishes = Dish.query.filter_by(
+    def build_fragment():
+        # 获取所有分类
+        categories = Category.query.filter_by(restaurant_id=restaurant_id).filter(Category.deleted_at.is_(None)).all()
+        
+        # 构建菜品查询
+        dish_query = Dish.query.options(joinedload(Dish.category)).filter_by(
             restaurant_id=restaurant_id,
-            category_id=category_id,
             is_active=True
-        ).all()
-        current_category = Category.query.get(category_id)
+        )
+        if category_id:
+            # 显示特定分类的菜品
+            dishes = dish_query.filter_by(category_id=category_id).all()
+            current_category = Category.query.get(category_id)
+        else:
+            # 显示所有在售菜品
+            dishes = dish_query.all()
+            current_category = None
+        
+        return render_template('restaurant_menu_fragment.html',
+                             restaurant=restaurant,
+                             categories=categories,
+                             dishes=dishes,
+                             current_category=current_category)
+    
+    menu_fragment, version, last_modified = menu_cache.get_fragment(restaurant_id, category_id, build_fragment)
+    
+    # ETag 同时包含菜单版本（各worker一致）和页面中与用户相关的部分（导航栏、购物车徽章）
+    cart_count = cart_service.get_count(current_user.id)
+    owned_restaurant = current_user.restaurant
+    etag = menu_cache.make_etag(
+        restaurant_id, category_id, version, last_modified.isoformat(),
+        current_user.id, current_user.username, current_user.avatar_path,
+        owned_restaurant.id if owned_restaurant else None, cart_count
+    )
+    
+    # 有待显示的闪现消息时必须完整渲染
+    if not session.get('_flashes') and \
+            not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
     else:
-        # 显示所有在售菜品
-        dishes = Dish.query.filter_by(
-            restaurant_id=restaurant_id,
-            is_active=True
-        ).all()
-        current_category = None
-    
-    return render_template('restaurant_menu.html',
-                         title=f'{restaurant.name} - 菜单',
-                         restaurant=restaurant,
-                         categories=categories,
-                         dishes=dishes,
-                         current_category=current_category)
+        response = make_response(render_template('restaurant_menu.html',
+                                                 title=f'{restaurant.name} - 菜单',
+                                                 menu_fragment=menu_fragment))
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @main_bp.route('/dish/<int:dish_id>')
 @login_required
 def dish_detail(dish_id):
     """菜品详情页面"""
     dish = Dish.query.get_or_404(dish_id)
+    if dish.is_deleted:
+        abort(404)
     
     return render_template('dish_detail.html',
                          title=dish.name,
@@ -109,30 +169,14 @@ def dish_detail(dish_id):
 @login_required
 def my_table():
     """我的餐桌 - 购物车页面"""
-    cart = session.get('cart', {})
-    cart_items = []
-    total_price = 0.0
+    cart = cart_service.get_cart(current_user.id)
     
-    # 计算总价并准备购物车项目
-    for dish_id_str, item in cart.items():
-        try:
-            dish_id = int(dish_id_str)
-            dish = Dish.query.get(dish_id)
-            if dish and item.get('quantity', 0) > 0:
-                quantity = item['quantity']
-                price = float(item.get('price', dish.price))
-                item_total = price * quantity
-                
-                cart_items.append({
-                    'dish': dish,
-                    'quantity': quantity,
-                    'price': price,
-                    'item_total': item_total
-                })
-                
-                total_price += item_total
-        except (ValueError, TypeError):
-            continue
+    # 一次查询解析全部菜品，同时找出已删除/已下架的菜品
+    cart_items, total_price, stale_ids = cart_service.resolve(cart)
+    
+    if stale_ids:
+        cart_service.remove_items(current_user.id, stale_ids)
+        flash(f'购物车中有 {len(stale_ids)} 个菜品已下架或被删除，已自动移除', 'warning')
     
     # 获取当前时间
     now = datetime.utcnow()
@@ -148,72 +192,94 @@ def my_table():
 def add_to_cart(dish_id):
     """添加菜品到购物车（API接口）"""
     dish = Dish.query.get_or_404(dish_id)
+    if dish.is_deleted:
+        abort(404)
     
     # 获取数量（默认为1）
     quantity = request.json.get('quantity', 1)
     
-    # 初始化购物车
-    if 'cart' not in session:
-        session['cart'] = {}
-    
-    cart = session['cart']
-    
-    # 添加或更新菜品
-    dish_id_str = str(dish_id)
-    if dish_id_str in cart:
-        cart[dish_id_str]['quantity'] += quantity
-    else:
-        cart[dish_id_str] = {
-            'dish_id': dish_id,
-            'dish_name': dish.name,
-            'dish_image': dish.image_path,
-            'price': float(dish.price),
-            'quantity': quantity,
-            'restaurant_id': dish.restaurant_id
-        }
-    
-    session['cart'] = cart
-    session.modified = True
+    item_quantity, cart_count = cart_service.add(current_user.id, dish, quantity)
     
+    # 只返回变化的部分
     return jsonify({
         'success': True,
         'message': f'已添加 {dish.name} 到我的餐桌',
-        'cart_count': sum(item['quantity'] for item in cart.values())
+        'dish_id': dish_id,
+        'quantity': item_quantity,
+        'cart_count': cart_count
     })
 
 @main_bp.route('/api/update-cart/<int:dish_id>', methods=['POST'])
 @login_required
 def update_cart(dish_id):
     """更新购物车中菜品的数量"""
-    dish_id_str = str(dish_id)
-    cart = session.get('cart', {})
+    quantity = request.json.get('quantity', 1)
     
-    if dish_id_str not in cart:
+    # 如果数量为0或负数，从购物车中移除
+    found, removed, total_price, cart_count = cart_service.set_quantity(current_user.id, dish_id, quantity)
+    
+    if not found:
         return jsonify({'success': False, 'message': '菜品不在购物车中'}), 404
     
-    quantity = request.json.get('quantity', 1)
+    return jsonify({
+        'success': True,
+        'dish_id': dish_id,
+        'quantity': 0 if removed else quantity,
+        'removed': removed,
+        'total_price': total_price,
+        'cart_count': cart_count
+    })
+
+@main_bp.route('/api/cart/batch', methods=['POST'])
+@login_required
+def batch_update_cart():
+    """
+    批量修改购物车（API接口）
+    请求体: {"operations": [{"op": "add"|"update"|"remove", "dish_id": 1, "quantity": 2}, ...]}
+    所有操作要么全部生效，要么全部不生效
+    """
+    data = request.get_json(silent=True) or {}
+    raw_operations = data.get('operations')
     
-    if quantity <= 0:
-        # 如果数量为0或负数，从购物车中移除
-        del cart[dish_id_str]
-        removed = True
-    else:
-        cart[dish_id_str]['quantity'] = quantity
-        removed = False
+    if not isinstance(raw_operations, list) or not raw_operations:
+        return jsonify({'success': False, 'message': '没有需要执行的操作'}), 400
+    
+    if len(raw_operations) > 100:
+        return jsonify({'success': False, 'message': '单次操作过多'}), 400
+    
+    # 先校验全部操作，任何一条无效则整批拒绝
+    operations = []
+    for raw in raw_operations:
+        try:
+            op = raw.get('op')
+            dish_id = int(raw.get('dish_id'))
+            quantity = int(raw.get('quantity', 1 if op == 'add' else 0))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'success': False, 'message': '无效的购物车操作'}), 400
+        
+        if op not in ('add', 'update', 'remove'):
+            return jsonify({'success': False, 'message': f'不支持的操作: {op}'}), 400
+        
+        operations.append({'op': op, 'dish_id': dish_id, 'quantity': quantity})
     
-    session['cart'] = cart
-    session.modified = True
+    # 一次查询加载所有需要加入购物车的菜品
+    needed_ids = {o['dish_id'] for o in operations if o['op'] != 'remove' and o['quantity'] > 0}
+    dishes = {}
+    if needed_ids:
+        dishes = {dish.id: dish for dish in Dish.query.filter(Dish.id.in_(needed_ids)).all()}
     
-    # 计算新的总价
-    total_price = 0.0
-    for item in cart.values():
-        total_price += item['price'] * item['quantity']
+    for dish_id in needed_ids:
+        dish = dishes.get(dish_id)
+        if not dish or not dish.is_active:
+            return jsonify({'success': False, 'message': f'菜品 #{dish_id} 不存在或已下架', 'dish_id': dish_id}), 404
+    
+    changed, total_price, cart_count = cart_service.apply_batch(current_user.id, operations, dishes)
     
     return jsonify({
         'success': True,
-        'removed': removed,
-        'total_price': round(total_price, 2),
-        'cart_count': sum(item['quantity'] for item in cart.values())
+        'items': {str(dish_id): quantity for dish_id, quantity in changed.items()},
+        'total_price': total_price,
+        'cart_count': cart_count
     })
 
 @main_bp.route('/api/ask-question/<int:dish_id>', methods=['POST'])
@@ -257,6 +323,7 @@ def ask_question(dish_id):
         ai_answer = ai_service.call_deepseek(customer_question, context)
         
         if ai_answer and "由于大模型服务暂时不可用" not in ai_answer:
+            metrics.count_ai_answer('dish_question', 'ai')
             return jsonify({
                 'success': True,
                 'answer': ai_answer
@@ -264,6 +331,7 @@ def ask_question(dish_id):
         else:
             # 如果AI不可用，使用简化的备选回答
             fallback_answer = generate_customer_fallback_answer(question, dish)
+            metrics.count_ai_answer('dish_question', 'fallback')
             return jsonify({
                 'success': True,
                 'answer': fallback_answer,
@@ -310,18 +378,39 @@ def generate_customer_fallback_answer(question, dish):
 @main_bp.route('/order/checkout', methods=['POST'])
 @login_required
 def checkout():
-    """结算下单"""
+    """结算下单 - 支持幂等键，客户端超时重试不会重复下单"""
     # 获取前端发送的JSON数据
     data = request.get_json(silent=True) or {}
-    cart = session.get('cart', {})
+    
+    # 带幂等键的重试请求直接返回首次结果
+    idempotency_key = idempotency.get_request_key(data)
+    request_fingerprint = idempotency.fingerprint(data) if idempotency_key else None
+    if idempotency_key:
+        replay = _replay_checkout(idempotency_key, request_fingerprint)
+        if replay:
+            return replay
+    
+    cart = cart_service.get_cart(current_user.id)
     
     if not cart:
         return jsonify({'success': False, 'message': '购物车为空'}), 400
     
+    # 一次查询解析全部菜品；已下架或已删除（归档）的菜品不能结算，从购物车移除后让顾客确认
+    cart_items, _, stale_ids = cart_service.resolve(cart)
+    if stale_ids:
+        cart_service.remove_items(current_user.id, stale_ids)
+        return jsonify({
+            'success': False,
+            'message': f'购物车中有 {len(stale_ids)} 个菜品已下架或被删除，已自动移除，请确认后重新结算',
+            'stale_dish_ids': stale_ids
+        }), 409
+    if not cart_items:
+        return jsonify({'success': False, 'message': '购物车为空'}), 400
+    
     # 检查购物车中所有菜品是否来自同一餐厅
     restaurant_ids = set()
-    for item in cart.values():
-        restaurant_ids.add(item['restaurant_id'])
+    for line in cart_items:
+        restaurant_ids.add(line['dish'].restaurant_id)
     
     if len(restaurant_ids) != 1:
         return jsonify({'success': False, 'message': '一次只能点一家餐厅的菜品'}), 400
@@ -332,18 +421,24 @@ def checkout():
     remarks = data.get('remarks', '').strip()
     
     # 新增：检查用户是否在该餐厅的黑名单中
-    blacklist_record = Blacklist.query.filter_by(
-        restaurant_id=restaurant_id,
-        user_id=current_user.id
-    ).first()
+    blacklist_record = blacklist_service.get_entry(restaurant_id, current_user.id)
     
     if blacklist_record:
         return jsonify({
             'success': False, 
-            'message': f'您已被该餐厅加入黑名单，无法下单。原因：{blacklist_record.reason or "无具体原因"}'
+            'message': f'您已被该餐厅加入黑名单，无法下单。原因：{blacklist_record["reason"] or "无具体原因"}'
         }), 403
     
+    # 高峰期写入队列模式：入队后立即返回订单号，由写入线程批量提交
+    if order_ingest.enabled:
+        return _enqueue_checkout(cart, cart_items, restaurant_id, remarks, idempotency_key, request_fingerprint)
+    
     try:
+        # 先占用幂等键，并发的同一请求会在这里等待并失败
+        idempotency_record = None
+        if idempotency_key:
+            idempotency_record = idempotency.reserve(current_user.id, idempotency_key, request_fingerprint)
+        
         # 创建订单，包含备注
         order = Order(
             user_id=current_user.id,
@@ -357,24 +452,22 @@ def checkout():
         
         # 添加订单项并计算总价
         total_amount = 0.0
-        for item in cart.values():
-            dish_id = item['dish_id']
-            quantity = item['quantity']
-            price = item['price']
+        for line in cart_items:
+            dish = line['dish']
+            quantity = line['quantity']
+            price = line['price']
             
             # 创建订单项
             order_item = OrderItem(
                 order_id=order.id,
-                dish_id=dish_id,
+                dish_id=dish.id,
                 quantity=quantity,
                 price_at_time=price
             )
             db.session.add(order_item)
             
-            # 更新菜品被点次数
-            dish = Dish.query.get(dish_id)
-            if dish:
-                dish.order_count = (dish.order_count or 0) + quantity
+            # 更新菜品被点次数（菜品已在 resolve 中查出）
+            dish.order_count = (dish.order_count or 0) + quantity
             
             total_amount += price * quantity
         
@@ -386,28 +479,126 @@ def checkout():
         if restaurant:
             restaurant.total_sales = (restaurant.total_sales or 0) + total_amount
         
-        db.session.commit()
-        
-        # 清空购物车
-        session['cart'] = {}
-        session.modified = True
-        
-        return jsonify({
+        result = {
             'success': True,
             'order_id': order.id,
             'total_amount': total_amount,
             'message': '下单成功！感谢您的订购。'
-        })
+        }
+        if idempotency_record:
+            idempotency.save_result(idempotency_record, result)
+        
+        db.session.commit()
+        
+        # 销售额只增不减，增量更新排行缓存
+        if restaurant:
+            restaurant_ranking.record_sale(restaurant)
+        
+        # 推送新订单给商家
+        order_events.publish_order(order, 'order_created')
         
+        # 清空购物车
+        cart_service.clear(current_user.id)
+        
+        metrics.observe_checkout('direct', 'success', cart_service.count(cart))
+        return jsonify(result)
+        
+    except IntegrityError as e:
+        db.session.rollback()
+        # 同一幂等键的并发请求已经先提交，返回它的结果
+        if idempotency_key:
+            replay = _replay_checkout(idempotency_key, request_fingerprint)
+            if replay:
+                return replay
+        metrics.observe_checkout('direct', 'error')
+        return jsonify({'success': False, 'message': f'下单失败: {str(e)}'}), 500
     except Exception as e:
         db.session.rollback()
+        metrics.observe_checkout('direct', 'error')
         return jsonify({'success': False, 'message': f'下单失败: {str(e)}'}), 500
 
+def _enqueue_checkout(cart, cart_items, restaurant_id, remarks, idempotency_key, request_fingerprint):
+    """订单写入队列"""
+    try:
+        result = order_ingest.enqueue(current_user.id, restaurant_id, cart_items, remarks,
+                                      idempotency_key, request_fingerprint)
+    except Exception as e:
+        metrics.observe_checkout('queue', 'error')
+        return jsonify({'success': False, 'message': f'下单失败: {str(e)}'}), 500
+    
+    # 同一幂等键的并发请求已经入队，返回它的结果
+    if result is None:
+        return _replay_checkout(idempotency_key, request_fingerprint)
+    
+    cart_service.clear(current_user.id)
+    metrics.observe_checkout('queue', 'success', cart_service.count(cart))
+    return jsonify(result)
+
+def _replay_checkout(key, request_fingerprint):
+    """返回幂等键对应的首次结算结果，没有记录时返回 None"""
+    record = idempotency.find(current_user.id, key)
+    if record:
+        fingerprint = record.fingerprint
+        payload, status_code = idempotency.load_result(record)
+    else:
+        # 队列模式下订单可能还没有写入业务库
+        queued = order_ingest.find_by_key(current_user.id, key) if order_ingest.enabled else None
+        if not queued:
+            return None
+        fingerprint, payload, status_code = queued
+    if fingerprint != request_fingerprint:
+        return jsonify({'success': False, 'message': '该幂等键已用于另一个结算请求'}), 422
+    response = jsonify(payload)
+    response.status_code = status_code
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def get_own_order(order_id):
+    """当前用户自己的订单（含队列中尚未写入的订单），否则 404/403"""
+    order = Order.query.get(order_id) or order_ingest.get_pending_order(order_id)
+    if order is None:
+        abort(404)
+    if order.user_id != current_user.id:
+        abort(403)
+    return order
+
+@main_bp.route('/order/<int:order_id>/events')
+@login_required
+def order_events_stream(order_id):
+    """订单状态实时推送（SSE），订单完成、取消或提交失败后结束"""
+    # 未开启实时推送时页面改为轮询 order_status，不建立长连接
+    if not order_events.live:
+        abort(404)
+    order = get_own_order(order_id)
+    
+    # 先发送当前状态，避免页面渲染和建立连接之间的状态变化被漏掉
+    stream = order_events.stream(
+        order_events.order_channel(order_id),
+        initial=order_events.order_payload(order, 'status_changed'),
+        until_statuses=('completed', 'cancelled', 'failed')
+    )
+    # 长连接期间不占用数据库连接
+    db.session.remove()
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@main_bp.route('/order/<int:order_id>/status')
+@login_required
+def order_status(order_id):
+    """订单当前状态（未开启实时推送时下单完成页轮询）"""
+    order = get_own_order(order_id)
+    return jsonify(order_events.order_payload(order, 'status_changed'))
+
 @main_bp.route('/order/complete/<int:order_id>')
 @login_required
 def order_complete(order_id):
     """订单完成页面"""
-    order = Order.query.get_or_404(order_id)
+    # 队列模式下刚下的订单可能还在队列中
+    order = Order.query.get(order_id) or order_ingest.get_pending_order(order_id)
+    if order is None:
+        abort(404)
     
     # 确保订单属于当前用户
     if order.user_id != current_user.id:
@@ -1,11 +1,20 @@
-from flask import render_template, redirect, url_for, flash, request, current_app, Blueprint, abort, jsonify, send_from_directory
+from flask import render_template, redirect, url_for, flash, request, current_app, Blueprint, abort, jsonify, send_from_directory, Response
 from flask_login import login_required, current_user
 from sqlalchemy import func, desc, text, and_, or_, case, distinct, cast, Date
 from app import db
 # 修改这里，添加 RestaurantEditForm
 from app.forms import RestaurantForm, RestaurantEditForm, DishForm, CategoryEditForm, DishEditForm, ReportFilterForm, AdvisorQuestionForm
-from app.models import User, Restaurant, Category, Dish, Order, OrderItem, Blacklist
+from app.models import User, Restaurant, Category, Dish, Order, OrderItem, Blacklist, CustomerArchiveStats
 from app.utils import save_image
+from app.services.menu_cache import menu_cache
+from app.services.restaurant_ranking import restaurant_ranking
+from app.services.blacklist_service import blacklist_service
+from app.services.dish_deletion import archive_dish, count_related_orders, delete_dish_cascade, deletion_jobs
+from app.services.order_status import VALID_STATUSES, transition_orders
+from app.services.order_list import count_by_status, fetch_orders_page
+from app.services.order_events import order_events
+from app.services.metrics import metrics
+from app.services.profiler import request_profiler
 import os
 import json
 from datetime import datetime, timedelta
@@ -62,8 +71,10 @@ def create():
             
             # 创建默认分类
             Category.create_default_categories(restaurant.id)
+            menu_cache.bump(restaurant.id)
             
             db.session.commit()
+            restaurant_ranking.invalidate()
             flash('餐厅创建成功！', 'success')
             return redirect(url_for('restaurant.dashboard', restaurant_id=restaurant.id))
             
@@ -182,7 +193,9 @@ def edit_restaurant(restaurant_id):
                 restaurant.logo_path = logo_filename
             
             # 保存更改
+            menu_cache.bump(restaurant_id)
             db.session.commit()
+            restaurant_ranking.invalidate()
             
             flash('餐厅信息更新成功！', 'success')
             return redirect(url_for('restaurant.dashboard', restaurant_id=restaurant_id))
@@ -204,7 +217,8 @@ def edit_restaurant(restaurant_id):
 def categories(restaurant_id):
     """菜品分类管理"""
     restaurant = Restaurant.query.get_or_404(restaurant_id)
-    categories = Category.query.filter_by(restaurant_id=restaurant_id).order_by(Category.id).all()
+    categories = Category.query.filter_by(restaurant_id=restaurant_id).filter(
+        Category.deleted_at.is_(None)).order_by(Category.id).all()
     
     return render_template('restaurant/categories.html',
                          title='菜品分类管理',
@@ -227,7 +241,7 @@ def add_category(restaurant_id):
         existing_category = Category.query.filter_by(
             restaurant_id=restaurant_id,
             name=form.name.data
-        ).first()
+        ).filter(Category.deleted_at.is_(None)).first()
         
         if existing_category:
             flash('分类名称已存在', 'danger')
@@ -237,6 +251,7 @@ def add_category(restaurant_id):
                 restaurant_id=restaurant_id
             )
             db.session.add(category)
+            menu_cache.bump(restaurant_id)
             db.session.commit()
             flash('分类创建成功！', 'success')
             return redirect(url_for('restaurant.categories', restaurant_id=restaurant_id))
@@ -255,13 +270,14 @@ def edit_category(restaurant_id, category_id):
     category = Category.query.get_or_404(category_id)
     
     # 验证分类属于该餐厅
-    if category.restaurant_id != restaurant_id:
+    if category.restaurant_id != restaurant_id or category.deleted_at is not None:
         abort(404)
     
     form = CategoryEditForm(obj=category)
     
     if form.validate_on_submit():
         category.name = form.name.data
+        menu_cache.bump(restaurant_id)
         db.session.commit()
         flash('分类更新成功！', 'success')
         return redirect(url_for('restaurant.categories', restaurant_id=restaurant_id))
@@ -280,17 +296,22 @@ def delete_category(restaurant_id, category_id):
     category = Category.query.get_or_404(category_id)
     
     # 验证分类属于该餐厅
-    if category.restaurant_id != restaurant_id:
+    if category.restaurant_id != restaurant_id or category.deleted_at is not None:
         abort(404)
     
-    # 检查分类下是否有菜品
-    dish_count = Dish.query.filter_by(category_id=category_id).count()
+    # 检查分类下是否有菜品（已归档的菜品不算）
+    dish_count = category.active_dish_count
     
     if dish_count > 0:
         flash(f'该分类下有 {dish_count} 个菜品，无法删除。请先移动或删除这些菜品。', 'danger')
     else:
         try:
-            db.session.delete(category)
+            if category.dishes.count() > 0:
+                # 已归档菜品仍被历史订单引用（category_id 不可为空），分类保留为墓碑
+                category.deleted_at = datetime.utcnow()
+            else:
+                db.session.delete(category)
+            menu_cache.bump(restaurant_id)
             db.session.commit()
             flash('分类删除成功！', 'success')
         except Exception as e:
@@ -310,8 +331,8 @@ def dishes(restaurant_id):
     category_id = request.args.get('category_id', type=int)
     page = request.args.get('page', 1, type=int)
     
-    # 构建查询
-    query = Dish.query.filter_by(restaurant_id=restaurant_id)
+    # 构建查询（不含已归档的菜品）
+    query = Dish.query.filter_by(restaurant_id=restaurant_id).filter(Dish.deleted_at.is_(None))
     if category_id:
         query = query.filter_by(category_id=category_id)
     
@@ -319,7 +340,7 @@ def dishes(restaurant_id):
     per_page = 12
     dishes = query.order_by(Dish.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
     
-    categories = Category.query.filter_by(restaurant_id=restaurant_id).all()
+    categories = Category.query.filter_by(restaurant_id=restaurant_id).filter(Category.deleted_at.is_(None)).all()
     
     return render_template('restaurant/dishes.html',
                          title='菜品管理',
@@ -353,6 +374,7 @@ def add_dish(restaurant_id):
             )
             
             db.session.add(dish)
+            menu_cache.bump(restaurant_id)
             db.session.commit()
             
             flash('菜品添加成功！', 'success')
@@ -480,6 +502,10 @@ def edit_dish(restaurant_id, dish_id):
     if dish.restaurant_id != restaurant_id:
         abort(404)
     
+    # 已归档的菜品不能再编辑
+    if dish.is_deleted:
+        abort(404)
+    
     form = DishEditForm(restaurant_id=restaurant_id, obj=dish)
     
     if form.validate_on_submit():
@@ -502,6 +528,7 @@ def edit_dish(restaurant_id, dish_id):
                 image_filename = save_image(form.image.data, 'dishes')
                 dish.image_path = image_filename
             
+            menu_cache.bump(restaurant_id)
             db.session.commit()
             flash('菜品更新成功！', 'success')
             return redirect(url_for('restaurant.dishes', restaurant_id=restaurant_id))
@@ -520,81 +547,45 @@ def edit_dish(restaurant_id, dish_id):
 @login_required
 @restaurant_owner_required
 def delete_dish(restaurant_id, dish_id):
-    """删除菜品及相关订单，并更新其他菜品的被点次数"""
+    """
+    删除菜品
+    默认归档（软删除）：菜品下架并标记删除，历史订单完整保留；
+    mode=purge 时删除菜品及相关订单，并更新其他菜品的被点次数
+    """
     dish = Dish.query.get_or_404(dish_id)
     
     # 验证菜品属于该餐厅
     if dish.restaurant_id != restaurant_id:
         abort(404)
     
+    if request.form.get('mode', 'archive') != 'purge':
+        try:
+            archive_dish(dish)
+            flash(f'菜品"{dish.name}"已删除，历史订单和销售数据已保留。', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'删除失败：{str(e)}', 'danger')
+        return redirect(url_for('restaurant.dishes', restaurant_id=restaurant_id))
+    
+    # 关联订单很多时交给后台任务，避免长时间占用请求和写锁
+    related_orders = count_related_orders(dish_id)
+    if related_orders > current_app.config.get('DISH_DELETE_SYNC_LIMIT', 500):
+        job_id = deletion_jobs.start(restaurant_id, dish_id, related_orders)
+        flash(f'菜品"{dish.name}"关联{related_orders}个订单，已在后台删除，请稍候刷新页面。', 'info')
+        return redirect(url_for('restaurant.dishes', restaurant_id=restaurant_id, delete_job=job_id))
+    
     try:
-        # 1. 查找所有包含该菜品的订单
-        from sqlalchemy import distinct
-        orders_to_delete = []
-        order_ids = []
-        
-        # 查询所有包含该菜品的订单ID
-        order_ids_query = db.session.query(distinct(OrderItem.order_id)).filter(
-            OrderItem.dish_id == dish_id
-        ).all()
-        order_ids = [order_id[0] for order_id in order_ids_query]
+        stats = delete_dish_cascade(restaurant_id, dish_id)
         
-        if order_ids:
-            # 获取这些订单的详细信息
-            orders_to_delete = Order.query.filter(Order.id.in_(order_ids)).all()
-            
-            # 2. 计算需要从餐厅总销售额中减去的金额
-            total_to_subtract = 0.0
-            orders_deleted = 0
-            updated_dish_count = 0  # 记录更新了多少个其他菜品
-            
-            for order in orders_to_delete:
-                # 只统计已支付和已完成的订单
-                if order.status in ['paid', 'completed']:
-                    total_to_subtract += order.total_amount
-                
-                # 3. 更新订单中其他菜品的被点次数
-                for order_item in order.items:
-                    if order_item.dish_id != dish_id:  # 如果是其他菜品
-                        other_dish = Dish.query.get(order_item.dish_id)
-                        if other_dish:
-                            # 减去这个订单中该菜品的数量
-                            other_dish.order_count = max(0, (other_dish.order_count or 0) - order_item.quantity)
-                            updated_dish_count += 1
-                            print(f"更新菜品 #{other_dish.id} '{other_dish.name}' 的被点次数: -{order_item.quantity}")
-                
-                # 4. 删除订单项
-                OrderItem.query.filter_by(order_id=order.id).delete()
-                
-                # 5. 删除订单
-                db.session.delete(order)
-                orders_deleted += 1
-            
-            # 6. 更新餐厅总销售额
-            restaurant = Restaurant.query.get(restaurant_id)
-            if restaurant and total_to_subtract > 0:
-                restaurant.total_sales = max(0, restaurant.total_sales - total_to_subtract)
-            
-            flash_message = f'菜品"{dish.name}"及{orders_deleted}个相关订单已成功删除！'
-            if total_to_subtract > 0:
-                flash_message += f' 已从餐厅销售额中减去¥{total_to_subtract:.2f}'
-            if updated_dish_count > 0:
-                flash_message += f' 已更新{updated_dish_count}个其他菜品的被点次数'
-        
-        # 7. 删除菜品图片（如果不是默认图片）
-        if dish.image_path and dish.image_path != 'default_dish.png':
-            image_path = os.path.join(current_app.config['DISH_UPLOAD_FOLDER'], dish.image_path)
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        
-        # 8. 删除菜品
-        db.session.delete(dish)
-        db.session.commit()
-        
-        if order_ids:
+        if stats['orders_deleted']:
+            flash_message = f'菜品"{stats["dish_name"]}"及{stats["orders_deleted"]}个相关订单已成功删除！'
+            if stats['total_subtracted'] > 0:
+                flash_message += f' 已从餐厅销售额中减去¥{stats["total_subtracted"]:.2f}'
+            if stats['updated_dish_count'] > 0:
+                flash_message += f' 已更新{stats["updated_dish_count"]}个其他菜品的被点次数'
             flash(flash_message, 'success')
         else:
-            flash(f'菜品"{dish.name}"删除成功！', 'success')
+            flash(f'菜品"{stats["dish_name"]}"删除成功！', 'success')
         
     except Exception as e:
         db.session.rollback()
@@ -602,6 +593,16 @@ def delete_dish(restaurant_id, dish_id):
     
     return redirect(url_for('restaurant.dishes', restaurant_id=restaurant_id))
 
+@restaurant_bp.route('/<int:restaurant_id>/dishes/delete-jobs/<job_id>')
+@login_required
+@restaurant_owner_required
+def delete_dish_job(restaurant_id, job_id):
+    """后台删除任务进度"""
+    job = deletion_jobs.get(job_id)
+    if not job or job['restaurant_id'] != restaurant_id:
+        return jsonify({'success': False, 'message': '任务不存在或已结束'}), 404
+    return jsonify({'success': True, 'job': job})
+
 @restaurant_bp.route('/<int:restaurant_id>/dishes/<int:dish_id>/toggle', methods=['POST'])
 @login_required
 @restaurant_owner_required
@@ -609,14 +610,15 @@ def toggle_dish_status(restaurant_id, dish_id):
     """切换菜品上架状态"""
     dish = Dish.query.get_or_404(dish_id)
     
-    # 验证菜品属于该餐厅
-    if dish.restaurant_id != restaurant_id:
+    # 验证菜品属于该餐厅，已归档的菜品不能再上架
+    if dish.restaurant_id != restaurant_id or dish.is_deleted:
         abort(404)
     
     dish.is_active = not dish.is_active
     status = "上架" if dish.is_active else "下架"
     
     try:
+        menu_cache.bump(restaurant_id)
         db.session.commit()
         flash(f'菜品已{status}！', 'success')
     except Exception as e:
@@ -631,38 +633,71 @@ def toggle_dish_status(restaurant_id, dish_id):
 @login_required
 @restaurant_owner_required
 def orders(restaurant_id):
-    """订单列表"""
+    """订单列表 - 按 (created_at, id) 键集分页"""
     restaurant = Restaurant.query.get_or_404(restaurant_id)
     
     # 获取筛选参数
     status = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
-    per_page = 15
-    
-    # 构建查询
-    query = Order.query.filter_by(restaurant_id=restaurant_id)
-    
-    if status != 'all':
-        query = query.filter_by(status=status)
+    after = request.args.get('after')
+    before = request.args.get('before')
+    per_page = current_app.config.get('ORDERS_PER_PAGE', 15)
     
     # 分页
-    orders = query.order_by(Order.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    
-    # 统计各状态订单数量
-    status_counts = {
-        'all': Order.query.filter_by(restaurant_id=restaurant_id).count(),
-        'pending': Order.query.filter_by(restaurant_id=restaurant_id, status='pending').count(),
-        'paid': Order.query.filter_by(restaurant_id=restaurant_id, status='paid').count(),
-        'completed': Order.query.filter_by(restaurant_id=restaurant_id, status='completed').count(),
-        'cancelled': Order.query.filter_by(restaurant_id=restaurant_id, status='cancelled').count()
-    }
+    orders = fetch_orders_page(restaurant_id, status, after=after, before=before, per_page=per_page)
+    
+    # 统计各状态订单数量（一次分组查询）
+    status_counts = count_by_status(restaurant_id)
     
     return render_template('restaurant/orders.html',
                          title='订单管理',
                          restaurant=restaurant,
                          orders=orders,
                          status=status,
-                         status_counts=status_counts)
+                         status_counts=status_counts,
+                         loaded_at=datetime.utcnow().isoformat())
+
+@restaurant_bp.route('/<int:restaurant_id>/orders/stream')
+@login_required
+@restaurant_owner_required
+def orders_stream(restaurant_id):
+    """订单实时推送（SSE）：新订单和状态变化"""
+    # 未开启实时推送时页面改为轮询 orders_updates，不建立长连接
+    if not order_events.live:
+        abort(404)
+    stream = order_events.stream(order_events.restaurant_channel(restaurant_id))
+    # 长连接期间不占用数据库连接
+    db.session.remove()
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@restaurant_bp.route('/<int:restaurant_id>/orders/updates')
+@login_required
+@restaurant_owner_required
+def orders_updates(restaurant_id):
+    """
+    订单轮询（未开启实时推送时）：各状态数量、since 之后的新订单数、ids 中订单的当前状态
+    """
+    try:
+        since = datetime.fromisoformat(request.args.get('since', ''))
+    except ValueError:
+        since = None
+    ids = [int(value) for value in request.args.get('ids', '').split(',') if value.isdigit()][:100]
+    
+    new_orders = 0
+    if since:
+        new_orders = Order.query.filter(Order.restaurant_id == restaurant_id, Order.created_at > since).count()
+    statuses = []
+    if ids:
+        statuses = db.session.query(Order.id, Order.status).filter(
+            Order.restaurant_id == restaurant_id, Order.id.in_(ids)
+        ).all()
+    return jsonify({
+        'status_counts': count_by_status(restaurant_id),
+        'new_orders': new_orders,
+        'orders': [{'order_id': order_id, 'status': status} for order_id, status in statuses]
+    })
 
 @restaurant_bp.route('/<int:restaurant_id>/orders/<int:order_id>')
 @login_required
@@ -693,24 +728,14 @@ def update_order_status(restaurant_id, order_id):
         abort(404)
     
     new_status = request.form.get('status')
-    valid_statuses = ['pending', 'paid', 'completed', 'cancelled']
     
-    if new_status not in valid_statuses:
+    if new_status not in VALID_STATUSES:
         flash('无效的订单状态', 'danger')
         return redirect(url_for('restaurant.order_detail', restaurant_id=restaurant_id, order_id=order_id))
     
-    # 更新状态
-    order.status = new_status
-    
-    # 如果是完成订单，更新菜品被点次数
-    if new_status == 'completed':
-        for item in order.items:
-            dish = Dish.query.get(item.dish_id)
-            if dish:
-                dish.order_count += item.quantity
-    
+    # 更新状态（完成订单时更新菜品被点次数，重复完成不会重复累加）
     try:
-        db.session.commit()
+        transition_orders(restaurant_id, [order_id], new_status)
         flash('订单状态更新成功！', 'success')
     except Exception as e:
         db.session.rollback()
@@ -718,6 +743,66 @@ def update_order_status(restaurant_id, order_id):
     
     return redirect(url_for('restaurant.order_detail', restaurant_id=restaurant_id, order_id=order_id))
 
+@restaurant_bp.route('/<int:restaurant_id>/orders/bulk_status', methods=['POST'])
+@login_required
+@restaurant_owner_required
+def bulk_update_order_status(restaurant_id):
+    """
+    批量更新订单状态
+    表单: order_ids（多个）、status；或JSON: {"order_ids": [...], "status": "completed"}
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        raw_ids = data.get('order_ids') or []
+        new_status = data.get('status')
+    else:
+        raw_ids = request.form.getlist('order_ids')
+        new_status = request.form.get('status')
+    
+    try:
+        order_ids = [int(order_id) for order_id in raw_ids]
+    except (TypeError, ValueError):
+        order_ids = []
+    
+    error = None
+    if not order_ids:
+        error = '请选择订单'
+    elif len(order_ids) > 200:
+        error = '一次最多更新200个订单'
+    elif new_status not in VALID_STATUSES:
+        error = '无效的订单状态'
+    
+    changed_ids = []
+    if not error:
+        try:
+            changed_ids = transition_orders(restaurant_id, order_ids, new_status)
+        except Exception as e:
+            db.session.rollback()
+            error = f'更新失败：{str(e)}'
+    
+    if request.is_json:
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+        return jsonify({
+            'success': True,
+            'updated': changed_ids,
+            'message': f'已更新{len(changed_ids)}个订单'
+        })
+    
+    if error:
+        flash(error, 'danger')
+    else:
+        skipped = len(set(order_ids)) - len(changed_ids)
+        message = f'已更新{len(changed_ids)}个订单的状态'
+        if skipped:
+            message += f'，{skipped}个订单状态未变化'
+        flash(message, 'success')
+    
+    return redirect(url_for('restaurant.orders', restaurant_id=restaurant_id,
+                            status=request.form.get('filter_status', 'all'),
+                            after=request.form.get('after') or None,
+                            before=request.form.get('before') or None))
+
 # ================= 顾客管理功能 =================
 
 @restaurant_bp.route('/<int:restaurant_id>/customers')
@@ -731,106 +816,87 @@ def customers(restaurant_id):
     sort_by = request.args.get('sort_by', 'total_spent')
     page = request.args.get('page', 1, type=int)
     
-    print(f"=== 顾客管理页面调试 ===")
-    print(f"餐厅ID: {restaurant_id}")
-    print(f"餐厅名称: {restaurant.name}")
-    print(f"当前页: {page}")
-    print(f"排序方式: {sort_by}")
-    
     try:
         # 查询在该餐厅有过订单的所有顾客
         from sqlalchemy import func
         
-        # 构建基础查询 - 只统计已支付和已完成的订单
-        customers_query = db.session.query(
-            User,
+        # 只统计已支付和已完成的订单；已归档的已完成订单来自业务库中的 CustomerArchiveStats 汇总
+        recent = db.session.query(
+            Order.user_id.label('user_id'),
             func.count(Order.id).label('order_count'),
-            func.sum(Order.total_amount).label('total_spent')
-        ).join(
-            Order, User.id == Order.user_id
+            func.sum(Order.total_amount).label('total_spent'),
+            func.max(Order.created_at).label('last_order_at')
         ).filter(
             Order.restaurant_id == restaurant_id,
             Order.status.in_(['paid', 'completed'])
+        ).group_by(Order.user_id)
+        archived = db.session.query(
+            CustomerArchiveStats.user_id,
+            CustomerArchiveStats.completed_count,
+            CustomerArchiveStats.total_spent,
+            CustomerArchiveStats.last_order_at
+        ).filter(
+            CustomerArchiveStats.restaurant_id == restaurant_id,
+            CustomerArchiveStats.completed_count > 0
+        )
+        totals = recent.union_all(archived).subquery()
+        
+        order_count = func.sum(totals.c.order_count)
+        total_spent = func.sum(totals.c.total_spent)
+        customers_query = db.session.query(
+            User,
+            order_count.label('order_count'),
+            total_spent.label('total_spent'),
+            func.max(totals.c.last_order_at).label('last_order_at')
+        ).join(
+            totals, User.id == totals.c.user_id
         ).group_by(
             User.id
         )
         
-        # 调试：打印查询条件
-        print(f"查询条件: restaurant_id={restaurant_id}, status in ['paid', 'completed']")
-        
-        # 调试：检查有多少符合条件的订单
-        order_count = Order.query.filter(
-            Order.restaurant_id == restaurant_id,
-            Order.status.in_(['paid', 'completed'])
-        ).count()
-        print(f"符合条件的订单数: {order_count}")
-        
-        # 调试：列出所有符合条件的订单
-        orders = Order.query.filter(
-            Order.restaurant_id == restaurant_id,
-            Order.status.in_(['paid', 'completed'])
-        ).all()
-        print(f"符合条件的订单详情:")
-        for order in orders:
-            customer = User.query.get(order.user_id)
-            print(f"  订单#{order.id}: 顾客={customer.username if customer else '未知'}, 状态={order.status}, 金额={order.total_amount}")
-        
         # 排序
         if sort_by == 'total_spent':
-            customers_query = customers_query.order_by(func.sum(Order.total_amount).desc())
+            customers_query = customers_query.order_by(total_spent.desc(), User.id)
         else:  # order_count
-            customers_query = customers_query.order_by(func.count(Order.id).desc())
+            customers_query = customers_query.order_by(order_count.desc(), User.id)
         
         # 分页
         customers = customers_query.paginate(page=page, per_page=20, error_out=False)
+        current_app.logger.debug('顾客管理: 餐厅 %s 第 %s 页，共 %s 位顾客，排序 %s',
+                                 restaurant_id, page, customers.total, sort_by)
+        page_user_ids = [customer_data[0].id for customer_data in customers.items]
         
-        print(f"分组查询结果: {customers.total} 位顾客")
-        print(f"当前页项目数: {len(customers.items)}")
-        
-        # 打印查询到的顾客详情
-        for i, customer_data in enumerate(customers.items):
-            if customer_data and customer_data[0]:
-                print(f"  顾客{i+1}: {customer_data[0].username}, 订单数: {customer_data[1]}, 消费额: {customer_data[2]}")
-        
-        # 获取每个顾客的最后订单时间
-        customer_last_orders = {}
-        for customer_data in customers.items:
-            if customer_data and customer_data[0]:
-                customer = customer_data[0]
-                last_order = Order.query.filter(
-                    Order.restaurant_id == restaurant_id,
-                    Order.user_id == customer.id,
-                    Order.status.in_(['paid', 'completed'])
-                ).order_by(Order.created_at.desc()).first()
-                if last_order:
-                    customer_last_orders[customer.id] = last_order.created_at
+        # 每个顾客的最后订单时间
+        customer_last_orders = {
+            customer_data[0].id: customer_data[3] for customer_data in customers.items if customer_data[3]
+        }
         
-        # 获取每个顾客的订单状态统计
+        # 每个顾客的订单状态统计（含已归档的已完成/已取消订单）
         customer_order_stats = {}
-        for customer_data in customers.items:
-            if customer_data and customer_data[0]:
-                customer = customer_data[0]
-                status_counts = db.session.query(
-                    Order.status,
-                    func.count(Order.id).label('count')
-                ).filter(
-                    Order.restaurant_id == restaurant_id,
-                    Order.user_id == customer.id
-                ).group_by(Order.status).all()
-                
-                stats_dict = {}
-                for status, count in status_counts:
-                    stats_dict[status] = count
-                
-                customer_order_stats[customer.id] = stats_dict
-        
-        # 查询黑名单
-        blacklist = Blacklist.query.filter_by(restaurant_id=restaurant_id).all()
-        blacklist_user_ids = [entry.user_id for entry in blacklist]
+        if page_user_ids:
+            status_counts = db.session.query(
+                Order.user_id,
+                Order.status,
+                func.count(Order.id)
+            ).filter(
+                Order.restaurant_id == restaurant_id,
+                Order.user_id.in_(page_user_ids)
+            ).group_by(Order.user_id, Order.status).all()
+            for user_id, status, count in status_counts:
+                customer_order_stats.setdefault(user_id, {})[status] = count
+            
+            for record in CustomerArchiveStats.query.filter(
+                CustomerArchiveStats.restaurant_id == restaurant_id,
+                CustomerArchiveStats.user_id.in_(page_user_ids)
+            ).all():
+                stats_dict = customer_order_stats.setdefault(record.user_id, {})
+                for status, count in (('completed', record.completed_count), ('cancelled', record.cancelled_count)):
+                    if count:
+                        stats_dict[status] = stats_dict.get(status, 0) + count
         
-        print(f"=== 调试结束 ===")
+        # 查询当前页顾客中的黑名单用户
+        blacklist_user_ids = list(blacklist_service.blacklisted_among(restaurant_id, page_user_ids))
         
-        # 使用调试模板
         return render_template('restaurant/customers.html',
                              title='顾客管理',
                              restaurant=restaurant,
@@ -841,9 +907,7 @@ def customers(restaurant_id):
                              blacklist_user_ids=blacklist_user_ids)
                              
     except Exception as e:
-        import traceback
-        print(f"顾客管理页面错误: {e}")
-        print(traceback.format_exc())
+        current_app.logger.exception('顾客管理页面错误: %s', e)
         
         # 创建一个简单的分页对象
         class SimplePagination:
@@ -1034,7 +1098,7 @@ def reports(restaurant_id):
             daily_sales.append((date_str, float(sales)))
             
     except Exception as e:
-        print(f"获取销售趋势数据时出错: {e}")
+        current_app.logger.warning('获取销售趋势数据时出错: %s', e)
         # 返回空数据
         daily_sales = []
     
@@ -1143,6 +1207,7 @@ def add_to_blacklist(restaurant_id):
     
     try:
         db.session.add(blacklist_record)
+        blacklist_service.bump(restaurant_id)
         db.session.commit()
         flash('用户已加入黑名单', 'success')
     except Exception as e:
@@ -1164,6 +1229,7 @@ def remove_from_blacklist(restaurant_id, record_id):
     
     try:
         db.session.delete(blacklist_record)
+        blacklist_service.bump(restaurant_id)
         db.session.commit()
         flash('用户已从黑名单移除', 'success')
     except Exception as e:
@@ -1201,45 +1267,39 @@ def advisor(restaurant_id):
                                  total_customers_count=0,
                                  now=datetime.utcnow())
         
-        print(f"🎯 用户提问: {question}")
+        current_app.logger.info('经营顾问提问: 餐厅 %s，问题长度 %s', restaurant_id, len(question))
         
         try:
             from app.services.ai_service import ai_service
             from app.services.context_builder import ContextBuilder
             
-            print("🤖 调用AI服务进行分析...")
-            
             # 尝试完整分析模式
             ai_answer = ai_service.get_ai_analysis(question, restaurant_id, use_fast_mode=False)
             
             if ai_answer:
-                print(f"✅ AI分析成功，回答长度: {len(ai_answer)}")
                 answer = ai_answer
                 used_ai = True
             else:
-                print("⚠️ 完整分析失败，尝试快速模式...")
+                current_app.logger.warning('完整分析失败，尝试快速模式')
                 # 尝试快速模式
                 ai_answer = ai_service.get_ai_analysis(question, restaurant_id, use_fast_mode=True)
                 
                 if ai_answer:
-                    print(f"✅ 快速分析成功，回答长度: {len(ai_answer)}")
                     answer = ai_answer
                     used_ai = True
                 else:
-                    print("❌ 所有AI调用失败，使用备选回答")
+                    current_app.logger.warning('所有AI调用失败，使用备选回答')
                     # 使用备选回答生成器
                     answer = generate_fallback_answer(question, restaurant_id)
                     
         except ImportError as e:
-            print(f"❌ 导入AI服务失败: {e}")
-            import traceback
-            traceback.print_exc()
+            current_app.logger.exception('导入AI服务失败: %s', e)
             answer = generate_fallback_answer(question, restaurant_id)
         except Exception as e:
-            print(f"❌ AI调用异常: {e}")
-            import traceback
-            traceback.print_exc()
+            current_app.logger.exception('AI调用异常: %s', e)
             answer = generate_fallback_answer(question, restaurant_id)
+        
+        metrics.count_ai_answer('advisor', 'ai' if used_ai else 'fallback')
     
     # 计算统计数据
     active_dishes_count = Dish.query.filter_by(restaurant_id=restaurant_id, is_active=True).count()
@@ -1691,6 +1751,43 @@ def analyze_customer_behavior(restaurant_id):
     
     return report
 
+# ================= 性能分析路由 =================
+
+@restaurant_bp.route('/<int:restaurant_id>/profiles')
+@login_required
+@restaurant_owner_required
+def profiles(restaurant_id):
+    """最近的页面性能分析"""
+    restaurant = Restaurant.query.get_or_404(restaurant_id)
+    enabled = current_app.config.get('PROFILER_ENABLED', False)
+    
+    # 带令牌打开的页面会被分析一次
+    profile_links = []
+    if enabled:
+        token = request_profiler.make_token(restaurant_id)
+        for endpoint, label in [('restaurant.dashboard', '仪表板'), ('restaurant.orders', '订单管理'),
+                                ('restaurant.customers', '顾客管理'), ('restaurant.reports', '数据报表'),
+                                ('restaurant.dishes', '菜品管理')]:
+            profile_links.append((label, url_for(endpoint, restaurant_id=restaurant_id, _profile=token)))
+    
+    return render_template('restaurant/profiles.html',
+                         title='性能分析',
+                         restaurant=restaurant,
+                         enabled=enabled,
+                         profile_links=profile_links,
+                         profiles=request_profiler.recent(restaurant_id))
+
+@restaurant_bp.route('/<int:restaurant_id>/profiles/<name>.collapsed')
+@login_required
+@restaurant_owner_required
+def download_profile(restaurant_id, name):
+    """下载 collapsed stack 文件"""
+    meta = request_profiler.load(name)
+    if not meta or meta.get('restaurant_id') != restaurant_id:
+        abort(404)
+    return send_from_directory(current_app.config['PROFILER_DIR'], f'{name}.collapsed',
+                               mimetype='text/plain', as_attachment=True)
+
 # ================= 图片访问路由 =================
 
 @restaurant_bp.route('/uploads/<path:folder>/<filename>')
@@ -1,15 +1,14 @@
 """
 改进的AI服务模块 - 整合完整上下文和智能网络处理
 """
-import requests
 import json
 import time
 import logging
 from flask import current_app
 from app.services.context_builder import ContextBuilder
+from app.services.metrics import metrics
 
-# 配置日志
-logging.basicConfig(level=logging.DEBUG)
+# 日志级别和输出由 app_logging 统一配置（LOG_LEVEL / LOG_LEVELS）
 logger = logging.getLogger(__name__)
 
 class AIService:
@@ -32,44 +31,46 @@ class AIService:
                 self.model = current_app.config.get('DEEPSEEK_MODEL', 'deepseek-chat')
                 self._initialized = True
                 
-                logger.info(f"✅ AI服务配置加载完成，API密钥长度: {len(self.api_key)}")
-                logger.info(f"   API URL: {self.api_url}")
-                logger.info(f"   模型: {self.model}")
+                logger.info("✅ AI服务配置加载完成，API密钥长度: %s", len(self.api_key))
+                logger.info("   API URL: %s", self.api_url)
+                logger.info("   模型: %s", self.model)
             except RuntimeError as e:
-                logger.error(f"❌ 初始化配置失败（不在应用上下文中）: {e}")
+                logger.error("❌ 初始化配置失败（不在应用上下文中）: %s", e)
                 raise
             except Exception as e:
-                logger.error(f"❌ 初始化配置异常: {e}")
+                logger.error("❌ 初始化配置异常: %s", e)
                 raise
     
     def call_deepseek(self, question, restaurant_id, use_reasoner=False, retry_count=0, max_retries=2):
         """调用DeepSeek API - 使用完整上下文和智能处理"""
+        import requests  # 只在调用AI时导入，不拖慢进程启动
         
         # 确保配置已初始化
         if not self._initialized:
             self._init_config()
         
-        logger.info(f"🔧 开始AI调用 (重试 {retry_count}/{max_retries}): {question}")
+        logger.info("🔧 开始AI调用 (重试 %s/%s): %s", retry_count, max_retries, question)
         
         # 检查API密钥
         if not self.api_key or len(self.api_key) < 20:
-            logger.error(f"❌ API密钥无效: 长度={len(self.api_key) if self.api_key else 0}")
+            logger.error("❌ API密钥无效: 长度=%s", len(self.api_key) if self.api_key else 0)
             return None
         
+        start_time = None
         try:
             # 构建完整的餐厅上下文
-            logger.info(f"🔄 构建餐厅 {restaurant_id} 的完整上下文...")
+            logger.info("🔄 构建餐厅 %s 的完整上下文...", restaurant_id)
             
             # 使用智能上下文构建器，根据问题类型选择相关数据
             context = ContextBuilder.build_context_for_question(question, restaurant_id, max_length=5000)
             
-            logger.info(f"📊 上下文构建完成，长度: {len(context)} 字符")
+            logger.info("📊 上下文构建完成，长度: %s 字符", len(context))
             
             # 如果上下文太长，进行智能压缩
             if len(context) > 4000:
-                logger.warning(f"⚠️ 上下文过长 ({len(context)} 字符)，进行智能压缩")
+                logger.warning("⚠️ 上下文过长 (%s 字符)，进行智能压缩", len(context))
                 context = self._compress_context(context, question)
-                logger.info(f"📉 压缩后上下文长度: {len(context)} 字符")
+                logger.info("📉 压缩后上下文长度: %s 字符", len(context))
             
             # 构建智能提示词
             prompt = self._build_intelligent_prompt(question, context)
@@ -96,12 +97,12 @@ class AIService:
             if use_reasoner:
                 payload["reasoning"] = True
             
-            logger.info(f"📤 发送请求到DeepSeek API...")
-            logger.info(f"   问题: {question[:50]}...")
-            logger.info(f"   上下文长度: {len(context)} 字符")
-            logger.info(f"   提示词长度: {len(prompt)} 字符")
-            logger.info(f"   预计token数: ~{estimated_tokens}")
-            logger.info(f"   使用模型: {self.model}")
+            logger.info("📤 发送请求到DeepSeek API...")
+            logger.info("   问题: %s...", question[:50])
+            logger.info("   上下文长度: %s 字符", len(context))
+            logger.info("   提示词长度: %s 字符", len(prompt))
+            logger.info("   预计token数: ~%s", estimated_tokens)
+            logger.info("   使用模型: %s", self.model)
             
             # 调用API - 使用更长的超时时间
             start_time = time.time()
@@ -118,46 +119,53 @@ class AIService:
             
             elapsed = time.time() - start_time
             
-            logger.info(f"📥 收到响应，状态码: {response.status_code}, 耗时: {elapsed:.2f}秒")
+            logger.info("📥 收到响应，状态码: %s, 耗时: %.2f秒", response.status_code, elapsed)
             
             if response.status_code == 200:
                 data = response.json()
                 
                 if 'choices' in data and data['choices']:
                     answer = data['choices'][0]['message']['content']
-                    logger.info(f"🎯 获取AI回答成功，长度: {len(answer)} 字符")
-                    logger.debug(f"回答预览: {answer[:200]}...")
+                    logger.info("🎯 获取AI回答成功，长度: %s 字符", len(answer))
+                    logger.debug("回答预览: %s...", answer[:200])
+                    metrics.observe_llm('full', elapsed, 'success')
                     return answer
                 else:
-                    logger.error(f"❌ API返回无choices: {data}")
+                    logger.error("❌ API返回无choices: %s", data)
+                    metrics.observe_llm('full', elapsed, 'empty')
                     return None
             else:
-                logger.error(f"❌ API调用失败: {response.status_code}")
-                logger.error(f"   错误信息: {response.text[:200]}")
+                metrics.observe_llm('full', elapsed, 'http_error')
+                logger.error("❌ API调用失败: %s", response.status_code)
+                logger.error("   错误信息: %s", response.text[:200])
                 return None
                 
         except requests.exceptions.Timeout as e:
-            logger.error(f"⏰ 请求超时: {e}")
+            logger.error("⏰ 请求超时: %s", e)
+            metrics.observe_llm('full', time.time() - start_time, 'timeout')
             
             # 重试逻辑
             if retry_count < max_retries:
+                metrics.count_llm_retry('full')
                 wait_time = 2 ** retry_count  # 指数退避
-                logger.info(f"等待 {wait_time} 秒后重试 ({retry_count + 1}/{max_retries})...")
+                logger.info("等待 %s 秒后重试 (%s/%s)...", wait_time, retry_count + 1, max_retries)
                 time.sleep(wait_time)
                 
                 # 递归重试
                 return self.call_deepseek(question, restaurant_id, use_reasoner, retry_count + 1, max_retries)
             else:
-                logger.error(f"❌ 重试{max_retries}次后仍然失败")
+                logger.error("❌ 重试%s次后仍然失败", max_retries)
                 return None
                 
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"🔌 网络连接错误: {e}")
+            logger.error("🔌 网络连接错误: %s", e)
+            metrics.observe_llm('full', time.time() - start_time, 'connection_error')
             
             # 如果是连接错误，也可以重试
             if retry_count < max_retries:
+                metrics.count_llm_retry('full')
                 wait_time = 2 ** retry_count
-                logger.info(f"等待 {wait_time} 秒后重试连接 ({retry_count + 1}/{max_retries})...")
+                logger.info("等待 %s 秒后重试连接 (%s/%s)...", wait_time, retry_count + 1, max_retries)
                 time.sleep(wait_time)
                 
                 return self.call_deepseek(question, restaurant_id, use_reasoner, retry_count + 1, max_retries)
@@ -165,14 +173,14 @@ class AIService:
                 return None
                 
         except Exception as e:
-            logger.error(f"❌ 调用异常: {type(e).__name__}: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            if start_time is not None:
+                metrics.observe_llm('full', time.time() - start_time, 'error')
+            logger.exception("❌ 调用异常: %s: %s", type(e).__name__, e)
             return None
     
     def _compress_context(self, context, question):
         """智能压缩上下文，保留关键信息"""
-        logger.info(f"🔄 智能压缩上下文...")
+        logger.info("🔄 智能压缩上下文...")
         
         # 根据问题类型确定关键信息
         question_lower = question.lower()
@@ -221,7 +229,7 @@ class AIService:
         if len(compressed_context) > 4000:
             compressed_context = compressed_context[:4000] + "...[上下文被截断]"
         
-        logger.info(f"📉 压缩后保留 {len(compressed_lines)} 行，{len(compressed_context)} 字符")
+        logger.info("📉 压缩后保留 %s 行，%s 字符", len(compressed_lines), len(compressed_context))
         return compressed_context
     
     def _build_intelligent_prompt(self, question, context):
@@ -265,6 +273,8 @@ class AIService:
     
     def call_deepseek_fast(self, question, restaurant_id):
         """快速调用DeepSeek API - 使用简化上下文"""
+        import requests  # 只在调用AI时导入，不拖慢进程启动
+        start_time = None
         try:
             # 使用最小上下文
             minimal_context = ContextBuilder.build_minimal_context(restaurant_id)
@@ -289,24 +299,33 @@ class AIService:
             logger.info("🚀 发送快速请求到DeepSeek API...")
             
             # 更短的超时时间
+            start_time = time.time()
             response = requests.post(
                 self.api_url,
                 headers=headers,
                 json=payload,
                 timeout=(5, 30)  # 连接5秒，读取30秒
             )
+            elapsed = time.time() - start_time
             
             if response.status_code == 200:
                 data = response.json()
                 if 'choices' in data and data['choices']:
                     answer = data['choices'][0]['message']['content']
-                    logger.info(f"✅ 快速调用成功，回答长度: {len(answer)}")
+                    logger.info("✅ 快速调用成功，回答长度: %s", len(answer))
+                    metrics.observe_llm('fast', elapsed, 'success')
                     return answer
+                metrics.observe_llm('fast', elapsed, 'empty')
+            else:
+                metrics.observe_llm('fast', elapsed, 'http_error')
             
             return None
             
         except Exception as e:
-            logger.error(f"快速调用失败: {e}")
+            if start_time is not None:
+                outcome = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'error'
+                metrics.observe_llm('fast', time.time() - start_time, outcome)
+            logger.error("快速调用失败: %s", e)
             return None
     
     def get_ai_analysis(self, question, restaurant_id, use_fast_mode=False):
@@ -0,0 +1,148 @@
+"""
+日志模块 - 结构化日志、请求ID和非阻塞输出
+
+- 所有日志经 QueueHandler 放入内存队列，由 QueueListener 后台线程写文件/终端，
+  请求线程不再等待磁盘I/O和文件锁
+- LOG_FORMAT = 'json' 时每条日志是一行JSON（时间、级别、模块、请求ID、路由、消息），
+  便于日志平台检索；'text' 为传统的单行文本
+- LOG_LEVEL 为全局级别，LOG_LEVELS 单独设置某些模块的级别，例如
+  {'app.services.ai_service': 'DEBUG', 'werkzeug': 'WARNING'}
+- 每个请求使用 X-Request-ID 请求头（没有时生成），写入该请求的所有日志并在响应头中返回
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+class RequestContextFilter(logging.Filter):
+    """给日志记录加上请求ID和路由（在产生日志的线程中执行）"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id', '-')
+            record.endpoint = request.endpoint or request.path
+        else:
+            record.request_id = '-'
+            record.endpoint = '-'
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """一行一条的JSON日志"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'endpoint': getattr(record, 'endpoint', '-'),
+            'message': record.getMessage(),
+            'location': f'{record.pathname}:{record.lineno}',
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    入队前只做必须在当前线程完成的事：拼接消息参数、展开异常堆栈。
+    级别过滤在此之前完成，被过滤掉的日志不会格式化消息。
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class AppLogging:
+    """应用日志配置"""
+
+    def __init__(self):
+        self._handler = None
+        self._listener = None
+        atexit.register(self.stop)
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def init_app(self, app):
+        config = app.config
+        if config.get('LOG_FORMAT', 'json') == 'json':
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(
+                '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s [in %(pathname)s:%(lineno)d]'
+            )
+
+        handlers = [logging.StreamHandler(sys.stderr)]
+        log_file = config.get('LOG_FILE')
+        if log_file and not app.debug and not app.testing:
+            os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+            handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        # 同一进程多次 create_app（测试、基准）时替换上一次的配置
+        self.stop()
+        root = logging.getLogger()
+        if self._handler is not None:
+            root.removeHandler(self._handler)
+        self._handler = _QueueHandler(queue.SimpleQueue())
+        self._handler.addFilter(RequestContextFilter())
+        root.addHandler(self._handler)
+        self._listener = logging.handlers.QueueListener(self._handler.queue, *handlers)
+        self._listener.start()
+
+        # Flask 自带的处理器是同步写终端的，改为统一经过根日志器
+        app.logger.removeHandler(default_handler)
+        level = config.get('LOG_LEVEL', 'INFO')
+        root.setLevel(level)
+        app.logger.setLevel(level)
+        for name, module_level in (config.get('LOG_LEVELS') or {}).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        app.before_request(self._assign_request_id)
+        app.after_request(self._add_request_id_header)
+
+    def stop(self):
+        """停止后台线程（会先写完队列中剩余的日志）"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _restart_after_fork(self):
+        """fork 出的子进程（gunicorn --preload）中没有父进程的后台线程，换新队列重新启动"""
+        if self._listener is None:
+            return
+        self._handler.queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._handler.queue, *self._listener.handlers)
+        self._listener.start()
+
+    @staticmethod
+    def _assign_request_id():
+        request_id = request.headers.get('X-Request-ID', '')
+        g.request_id = request_id if REQUEST_ID_PATTERN.match(request_id) else uuid.uuid4().hex
+
+    @staticmethod
+    def _add_request_id_header(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+# 创建全局实例
+app_logging = AppLogging()
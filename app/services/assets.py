@@ -0,0 +1,111 @@
+"""
+静态资源模块 - 带内容指纹的文件名、长期缓存和预压缩
+
+模板中用 asset_url('js/my_table.js') 生成 /assets/js/my_table.<哈希>.js：
+内容变化后文件名随之变化，所以可以让浏览器和CDN缓存 ASSETS_MAX_AGE（默认一年，immutable）。
+文件读入内存后缓存；每种编码（brotli/gzip，最高压缩级别）在第一次被请求时压缩一次，
+之后的请求按 Accept-Encoding 直接返回，不再读盘和压缩。
+调试模式下按修改时间检查文件，编辑 JS/CSS 后刷新页面即可生效。
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from flask import abort, current_app, request
+from werkzeug.security import safe_join
+from app.services.compression import brotli_available, choose_encoding, compress
+
+FINGERPRINT_PATTERN = re.compile(r'^(?P<base>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[A-Za-z0-9]+)$')
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.svg', '.json', '.map', '.txt'}
+
+class Assets:
+    """带指纹的静态资源"""
+
+    def __init__(self):
+        self._cache = {}
+
+    def init_app(self, app):
+        app.add_url_rule('/assets/<path:filename>', 'assets', self._serve)
+        app.jinja_env.globals['asset_url'] = self.url
+
+    def _path(self, filename):
+        path = safe_join(current_app.static_folder, filename)
+        # 上传的图片由各自的路由提供，不进入内存缓存
+        upload_folder = os.path.abspath(current_app.config.get('UPLOAD_FOLDER', ''))
+        if path is None or os.path.abspath(path).startswith(upload_folder + os.sep):
+            return None
+        return path
+
+    def _load(self, filename):
+        """返回 {'digest', 'mimetype', 'encodings', 'bodies': {编码: 内容}}，文件不存在时返回 None"""
+        entry = self._cache.get(filename)
+        if entry is not None and not current_app.debug:
+            return entry
+        path = self._path(filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        mtime = os.path.getmtime(path)
+        if entry is not None and entry['mtime'] == mtime:
+            return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        encodings = ()
+        if os.path.splitext(filename)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            encodings = ('br', 'gzip') if brotli_available() else ('gzip',)
+        entry = {
+            'digest': hashlib.sha256(data).hexdigest()[:12],
+            'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'mtime': mtime,
+            'encodings': encodings,
+            'bodies': {None: data},
+        }
+        self._cache[filename] = entry
+        return entry
+
+    def url(self, filename):
+        """模板函数：带内容指纹的资源地址"""
+        entry = self._load(filename)
+        if entry is None:
+            raise FileNotFoundError(f'静态资源不存在: {filename}')
+        base, extension = os.path.splitext(filename)
+        return f"{request.script_root}/assets/{base}.{entry['digest']}{extension}"
+
+    @staticmethod
+    def _body(entry, encoding):
+        body = entry['bodies'].get(encoding)
+        if body is None:
+            # 并发请求可能各压缩一次，结果相同，不需要加锁
+            body = compress(entry['bodies'][None], encoding, 11 if encoding == 'br' else 9)
+            entry['bodies'][encoding] = body
+        return body
+
+    def _serve(self, filename):
+        match = FINGERPRINT_PATTERN.match(filename)
+        original = match.group('base') + match.group('ext') if match else filename
+        entry = self._load(original)
+        if entry is None:
+            abort(404)
+
+        encoding = choose_encoding(entry['encodings'])
+        response = current_app.response_class(self._body(entry, encoding), mimetype=entry['mimetype'])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry['encodings']:
+            response.vary.add('Accept-Encoding')
+        if match and match.group('digest') == entry['digest']:
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config.get('ASSETS_MAX_AGE', 31536000)
+            response.cache_control.immutable = True
+        else:
+            # 旧页面引用的过期指纹或没有指纹：返回当前内容但不长期缓存
+            response.cache_control.no_cache = True
+        # If-None-Match 中的编码后缀已在 compression 中去掉，按不带后缀的 ETag 比较
+        response.set_etag(entry['digest'])
+        response = response.make_conditional(request)
+        if encoding:
+            response.set_etag(f"{entry['digest']}-{encoding}")
+        return response
+
+# 创建全局实例
+assets = Assets()
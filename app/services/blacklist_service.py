@@ -0,0 +1,108 @@
+"""
+黑名单服务模块 - 按餐厅缓存黑名单成员
+
+菜单浏览和下单每次都要判断"当前用户是否被该餐厅拉黑"，顾客管理和
+AI上下文还会整表加载黑名单。这里把每个餐厅的黑名单加载成进程内的
+{user_id: 记录信息} 映射，判断成员只是一次字典查找。
+
+add_to_blacklist / remove_from_blacklist 在同一事务中调用 bump() 递增
+BlacklistVersion 中该餐厅的版本号，本进程的缓存立即失效。菜单和下单在
+BLACKLIST_CACHE_TTL 秒内直接使用缓存，不执行任何SQL；过期后先按主键读取
+版本号，没有变化就继续使用缓存，变化了才重新加载。其他worker最多滞后
+BLACKLIST_CACHE_TTL 秒。顾客管理页（blacklisted_among）每次都核对版本号。
+"""
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import Blacklist, BlacklistVersion
+from app.services.metrics import metrics
+
+class BlacklistService:
+    """黑名单成员查询服务"""
+
+    def __init__(self):
+        # restaurant_id -> (版本号, 加载时间, {user_id: 记录信息})
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_version(restaurant_id):
+        """读取餐厅黑名单的当前版本号（一次主键查询）"""
+        record = db.session.get(BlacklistVersion, restaurant_id)
+        return record.version if record else 0
+
+    def _load(self, restaurant_id, verify=False):
+        """
+        加载餐厅黑名单
+        :param verify: 为 True 时即使缓存未过期也核对数据库中的版本号
+        """
+        ttl = current_app.config.get('BLACKLIST_CACHE_TTL', 30)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(restaurant_id)
+        if entry and not verify and now - entry[1] < ttl:
+            metrics.count_cache('blacklist', True)
+            return entry[2]
+
+        version = self.get_version(restaurant_id)
+        if entry and entry[0] == version:
+            # 版本号没有变化，缓存继续有效
+            with self._lock:
+                self._entries[restaurant_id] = (version, now, entry[2])
+            metrics.count_cache('blacklist', True)
+            return entry[2]
+
+        metrics.count_cache('blacklist', False)
+        members = {
+            record.user_id: {
+                'id': record.id,
+                'reason': record.reason,
+                'created_at': record.created_at
+            }
+            for record in Blacklist.query.filter_by(restaurant_id=restaurant_id).all()
+        }
+
+        # 版本号在查询黑名单之前读取，加载期间的变更会在下次请求时看到新版本号
+        with self._lock:
+            self._entries[restaurant_id] = (version, now, members)
+        return members
+
+    def get_members(self, restaurant_id):
+        """获取餐厅黑名单 {user_id: {'id', 'reason', 'created_at'}}"""
+        return dict(self._load(restaurant_id))
+
+    def get_entry(self, restaurant_id, user_id):
+        """获取用户的黑名单记录信息，不在黑名单中返回 None"""
+        return self._load(restaurant_id).get(user_id)
+
+    def is_blacklisted(self, restaurant_id, user_id):
+        return user_id in self._load(restaurant_id)
+
+    def blacklisted_among(self, restaurant_id, user_ids):
+        """批量判断：返回 user_ids 中被该餐厅拉黑的用户ID集合（顾客管理页，核对版本号）"""
+        members = self._load(restaurant_id, verify=True)
+        return {user_id for user_id in user_ids if user_id in members}
+
+    def count(self, restaurant_id):
+        return len(self._load(restaurant_id))
+
+    def bump(self, restaurant_id):
+        """递增黑名单版本号，使所有worker的缓存失效（随调用方的事务一起提交）"""
+        record = db.session.get(BlacklistVersion, restaurant_id)
+        if record is None:
+            record = BlacklistVersion(restaurant_id=restaurant_id, version=0)
+            db.session.add(record)
+        record.version = (record.version or 0) + 1
+        record.updated_at = datetime.utcnow()
+        # 本进程的缓存立即失效，其他worker在缓存过期后读到新版本号
+        with self._lock:
+            self._entries.pop(restaurant_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# 创建全局实例
+blacklist_service = BlacklistService()
@@ -0,0 +1,364 @@
+"""
+购物车服务模块 - 服务端购物车存储
+
+购物车不再整体写入签名Cookie，而是按用户保存在服务端存储中，
+Cookie里只保留登录会话本身。存储后端可插拔：
+- memory: 进程内字典（单进程/开发环境）
+- sqlite: 独立的SQLite文件（多个gunicorn worker共享）
+- redis:  任意Redis兼容服务（多机部署）
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app
+
+class MemoryCartBackend:
+    """进程内购物车存储"""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at < time.time()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if not entry:
+                return {}
+            cart, expires_at = entry
+            if self._expired(expires_at):
+                del self._data[key]
+                return {}
+            return json.loads(cart)
+
+    def update(self, key, mutator):
+        """在锁内读取-修改-写回购物车，返回 mutator 的结果"""
+        with self._lock:
+            cart = self.get(key)
+            result = mutator(cart)
+            self._store(key, cart)
+            return result
+
+    def _store(self, key, cart):
+        if cart:
+            expires_at = time.time() + self.ttl if self.ttl else None
+            self._data[key] = (json.dumps(cart), expires_at)
+        else:
+            self._data.pop(key, None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+class SQLiteCartBackend:
+    """SQLite购物车存储 - 与业务库分离，避免占用业务库写锁"""
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cart ('
+            ' cart_key TEXT PRIMARY KEY,'
+            ' data TEXT NOT NULL,'
+            ' expires_at REAL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # fork 出的子进程（gunicorn --preload）不能沿用父进程的连接
+        if conn is None or self._local.pid != os.getpid():
+            # isolation_level=None：由我们显式控制事务
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _load(self, conn, key):
+        row = conn.execute(
+            'SELECT data, expires_at FROM cart WHERE cart_key = ?', (key,)
+        ).fetchone()
+        if not row:
+            return {}
+        data, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return {}
+        return json.loads(data)
+
+    def get(self, key):
+        return self._load(self._connect(), key)
+
+    def update(self, key, mutator):
+        """在 BEGIN IMMEDIATE 事务中读取-修改-写回，保证并发请求不会互相覆盖"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cart = self._load(conn, key)
+            result = mutator(cart)
+            if cart:
+                expires_at = time.time() + self.ttl if self.ttl else None
+                conn.execute(
+                    'INSERT OR REPLACE INTO cart (cart_key, data, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(cart), expires_at)
+                )
+            else:
+                conn.execute('DELETE FROM cart WHERE cart_key = ?', (key,))
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cart WHERE cart_key = ?', (key,))
+
+class RedisCartBackend:
+    """Redis兼容的购物车存储（需要安装 redis 包）"""
+
+    def __init__(self, url, ttl=None, prefix='cart:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._watch_error = redis.WatchError
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return json.loads(data) if data else {}
+
+    def update(self, key, mutator):
+        """使用 WATCH/MULTI 乐观锁完成读取-修改-写回"""
+        redis_key = self.prefix + key
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(redis_key)
+                    data = pipe.get(redis_key)
+                    cart = json.loads(data) if data else {}
+                    result = mutator(cart)
+                    pipe.multi()
+                    if cart:
+                        pipe.set(redis_key, json.dumps(cart), ex=self.ttl)
+                    else:
+                        pipe.delete(redis_key)
+                    pipe.execute()
+                    return result
+                except self._watch_error:
+                    continue
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+def create_cart_backend(config):
+    """根据配置创建购物车存储后端"""
+    backend = config.get('CART_BACKEND', 'memory')
+    ttl = config.get('CART_TTL')
+    if backend == 'sqlite':
+        return SQLiteCartBackend(config['CART_SQLITE_PATH'], ttl=ttl)
+    if backend == 'redis':
+        return RedisCartBackend(config['CART_REDIS_URL'], ttl=ttl)
+    if backend == 'memory':
+        return MemoryCartBackend(ttl=ttl)
+    raise ValueError(f'未知的购物车存储后端: {backend}')
+
+class CartService:
+    """购物车服务 - 以用户ID为键读写服务端购物车"""
+
+    def init_app(self, app):
+        app.extensions['cart_backend'] = create_cart_backend(app.config)
+
+    @property
+    def backend(self):
+        return current_app.extensions['cart_backend']
+
+    @staticmethod
+    def _key(user_id):
+        return f'user:{user_id}'
+
+    @staticmethod
+    def count(cart):
+        """购物车菜品总数量"""
+        return sum(item['quantity'] for item in cart.values())
+
+    @staticmethod
+    def total(cart):
+        """购物车总价"""
+        return round(sum(item['price'] * item['quantity'] for item in cart.values()), 2)
+
+    def get_cart(self, user_id):
+        """获取用户购物车 {dish_id字符串: {dish_id, quantity, price, restaurant_id}}"""
+        return self.backend.get(self._key(user_id))
+
+    def get_count(self, user_id):
+        return self.count(self.get_cart(user_id))
+
+    def add(self, user_id, dish, quantity=1):
+        """添加菜品，返回 (该菜品新数量, 购物车总数量)"""
+        def mutate(cart):
+            dish_id_str = str(dish.id)
+            if dish_id_str in cart:
+                cart[dish_id_str]['quantity'] += quantity
+            else:
+                cart[dish_id_str] = {
+                    'dish_id': dish.id,
+                    'quantity': quantity,
+                    'price': float(dish.price),
+                    'restaurant_id': dish.restaurant_id
+                }
+            return cart[dish_id_str]['quantity'], self.count(cart)
+
+        return self.backend.update(self._key(user_id), mutate)
+
+    def set_quantity(self, user_id, dish_id, quantity):
+        """
+        设置菜品数量，数量<=0时移除
+        :return: (是否在购物车中, 是否被移除, 总价, 总数量)
+        """
+        def mutate(cart):
+            dish_id_str = str(dish_id)
+            if dish_id_str not in cart:
+                return False, False, self.total(cart), self.count(cart)
+            if quantity <= 0:
+                del cart[dish_id_str]
+                removed = True
+            else:
+                cart[dish_id_str]['quantity'] = quantity
+                removed = False
+            return True, removed, self.total(cart), self.count(cart)
+
+        return self.backend.update(self._key(user_id), mutate)
+
+    def apply_batch(self, user_id, operations, dishes):
+        """
+        在一次读取-修改-写回中原子地应用一批购物车操作
+        :param operations: 已校验的操作列表 [{'op': 'add'|'update'|'remove', 'dish_id': int, 'quantity': int}]
+        :param dishes: add/update 涉及的菜品 {dish_id: Dish}，用于新建购物车项
+        :return: (受影响菜品的新数量 {dish_id: quantity}, 总价, 总数量)
+        """
+        def mutate(cart):
+            changed = {}
+            for operation in operations:
+                dish_id = operation['dish_id']
+                dish_id_str = str(dish_id)
+                op = operation['op']
+                if op == 'add':
+                    current = cart[dish_id_str]['quantity'] if dish_id_str in cart else 0
+                    quantity = current + operation['quantity']
+                elif op == 'update':
+                    quantity = operation['quantity']
+                else:  # remove
+                    quantity = 0
+
+                if quantity <= 0:
+                    cart.pop(dish_id_str, None)
+                    changed[dish_id] = 0
+                    continue
+
+                if dish_id_str in cart:
+                    cart[dish_id_str]['quantity'] = quantity
+                else:
+                    dish = dishes[dish_id]
+                    cart[dish_id_str] = {
+                        'dish_id': dish.id,
+                        'quantity': quantity,
+                        'price': float(dish.price),
+                        'restaurant_id': dish.restaurant_id
+                    }
+                changed[dish_id] = quantity
+            return changed, self.total(cart), self.count(cart)
+
+        return self.backend.update(self._key(user_id), mutate)
+
+    def resolve(self, cart):
+        """
+        用一次 IN 查询解析购物车中的所有菜品
+        :return: (有效购物车项列表, 重新计算的总价, 已失效的菜品ID列表)
+        失效指菜品已被删除或已下架
+        """
+        from sqlalchemy.orm import joinedload
+        from app.models import Dish
+
+        lines = {}
+        for dish_id_str, item in cart.items():
+            try:
+                quantity = int(item.get('quantity', 0))
+                lines[int(dish_id_str)] = (quantity, item)
+            except (ValueError, TypeError, AttributeError):
+                continue
+
+        dishes = {}
+        if lines:
+            dishes = {
+                dish.id: dish
+                for dish in Dish.query.options(joinedload(Dish.category))
+                                      .filter(Dish.id.in_(list(lines))).all()
+            }
+
+        cart_items = []
+        stale_ids = []
+        total_price = 0.0
+        for dish_id, (quantity, item) in lines.items():
+            dish = dishes.get(dish_id)
+            if not dish or not dish.is_active:
+                stale_ids.append(dish_id)
+                continue
+            if quantity <= 0:
+                continue
+            price = float(item.get('price', dish.price))
+            item_total = price * quantity
+            cart_items.append({
+                'dish': dish,
+                'quantity': quantity,
+                'price': price,
+                'item_total': item_total
+            })
+            total_price += item_total
+
+        return cart_items, round(total_price, 2), stale_ids
+
+    def remove_items(self, user_id, dish_ids):
+        """批量移除菜品，返回移除后的购物车"""
+        def mutate(cart):
+            for dish_id in dish_ids:
+                cart.pop(str(dish_id), None)
+            return dict(cart)
+
+        return self.backend.update(self._key(user_id), mutate)
+
+    def clear(self, user_id):
+        self.backend.delete(self._key(user_id))
+
+    def import_legacy(self, user_id, legacy_cart):
+        """把旧版Cookie会话中的购物车合并到服务端存储"""
+        def mutate(cart):
+            for dish_id_str, item in legacy_cart.items():
+                try:
+                    line = {
+                        'dish_id': int(item.get('dish_id', dish_id_str)),
+                        'quantity': int(item.get('quantity', 0)),
+                        'price': float(item['price']),
+                        'restaurant_id': int(item['restaurant_id'])
+                    }
+                except (TypeError, ValueError, KeyError, AttributeError):
+                    continue
+                if line['quantity'] <= 0:
+                    continue
+                if dish_id_str in cart:
+                    cart[dish_id_str]['quantity'] += line['quantity']
+                else:
+                    cart[dish_id_str] = line
+
+        self.backend.update(self._key(user_id), mutate)
+
+# 创建全局实例
+cart_service = CartService()
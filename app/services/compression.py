@@ -0,0 +1,99 @@
+"""
+响应压缩模块 - 按 Accept-Encoding 对动态响应做 brotli/gzip 压缩
+
+- 只压缩 COMPRESS_MIMETYPES 中的文本类型，且响应体不小于 COMPRESS_MIN_SIZE 字节
+- 流式响应（订单推送 SSE、send_file 的文件）和已设置 Content-Encoding 的响应不处理
+- brotli 为可选依赖（pip install brotli），未安装时只使用 gzip
+- 压缩后的响应在强 ETag 后加 -br/-gzip；请求的 If-None-Match 在视图执行前去掉这个后缀，
+  视图（如菜单页）照常和自己生成的 ETag 比较，返回 304 时再加回后缀
+前面有 nginx 等代理负责压缩时可关闭 COMPRESS_ENABLED。
+"""
+import gzip
+import re
+from flask import current_app, g, request
+
+ETAG_ENCODING_SUFFIX = re.compile(r'-(br|gzip)"')
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def brotli_available():
+    return _brotli() is not None
+
+def choose_encoding(available=('br', 'gzip')):
+    """按客户端的 Accept-Encoding 选择编码，brotli 优先；都不接受时返回 None"""
+    accepted = request.accept_encodings
+    for encoding in available:
+        if encoding == 'br' and not brotli_available():
+            continue
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+def compress(data, encoding, level):
+    """level 对 gzip 是 1-9，对 brotli 是 0-11"""
+    if encoding == 'br':
+        return _brotli().compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+class Compression:
+    """动态响应压缩"""
+
+    def init_app(self, app):
+        # 静态资源（assets）的 ETag 也带编码后缀，关闭动态压缩时同样需要
+        app.before_request(self._strip_etag_suffix)
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        app.after_request(self._compress)
+
+    @staticmethod
+    def _strip_etag_suffix():
+        header = request.environ.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return
+        match = ETAG_ENCODING_SUFFIX.search(header)
+        if match:
+            g.etag_encoding = match.group(1)
+            request.environ['HTTP_IF_NONE_MATCH'] = ETAG_ENCODING_SUFFIX.sub('"', header)
+            # 已解析过的 If-None-Match 需要重新解析
+            request.__dict__.pop('if_none_match', None)
+
+    @staticmethod
+    def _compress(response):
+        config = current_app.config
+        if response.status_code == 304:
+            # 304 沿用客户端缓存的那个编码版本的 ETag
+            etag, weak = response.get_etag()
+            encoding = g.get('etag_encoding')
+            if etag and not weak and encoding and not ETAG_ENCODING_SUFFIX.search(f'"{etag}"'):
+                response.set_etag(f'{etag}-{encoding}')
+            return response
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config.get('COMPRESS_MIMETYPES', ())):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+
+        level = config.get('COMPRESS_BROTLI_QUALITY', 5) if encoding == 'br' else config.get('COMPRESS_GZIP_LEVEL', 6)
+        response.set_data(compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        # 压缩后内容不同，强 ETag 需要区分编码
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+# 创建全局实例
+compression = Compression()
@@ -2,9 +2,9 @@ from app import db
 from app.models import Restaurant, Category, Dish, Order, OrderItem, User, Blacklist
 from datetime import datetime, timedelta
 import logging
-import traceback
 from sqlalchemy import func, desc, distinct, extract
 from sqlalchemy.orm import aliased
+from app.services.blacklist_service import blacklist_service
 
 logger = logging.getLogger(__name__)
 
@@ -74,16 +74,13 @@ class ContextBuilder:
                     'found_in_blacklist': False
                 }
             
-            # 从Blacklist表查询
-            blacklist_entry = Blacklist.query.filter_by(
-                restaurant_id=restaurant_id,
-                user_id=customer_id
-            ).first()
+            # 从黑名单服务查询
+            blacklist_entry = blacklist_service.get_entry(restaurant_id, customer_id)
             
             if blacklist_entry:
                 # 如果在黑名单中
-                reason = getattr(blacklist_entry, 'reason', '未提供原因')
-                created_at = getattr(blacklist_entry, 'created_at', None)
+                reason = blacklist_entry['reason']
+                created_at = blacklist_entry['created_at']
                 
                 return {
                     'is_blacklisted': True,
@@ -123,7 +120,7 @@ class ContextBuilder:
             return blacklist_info
             
         except Exception as e:
-            logger.error(f"获取顾客黑名单信息失败: {e}")
+            logger.error("获取顾客黑名单信息失败: %s", e)
             return {
                 'is_blacklisted': False,
                 'reason': f'获取失败: {str(e)[:50]}',
@@ -137,25 +134,22 @@ class ContextBuilder:
         try:
             blacklisted_customers = []
             
-            # 从Blacklist表获取
-            blacklist_entries = Blacklist.query.filter_by(
-                restaurant_id=restaurant_id
-            ).all()
+            # 从黑名单服务获取，用户信息一次查询
+            members = blacklist_service.get_members(restaurant_id)
+            users = {}
+            if members:
+                users = {user.id: user for user in User.query.filter(User.id.in_(list(members))).all()}
             
-            for entry in blacklist_entries:
-                user_id = getattr(entry, 'user_id', None)
-                if not user_id:
-                    continue
-                    
+            for user_id, entry in members.items():
                 # 获取用户信息
-                user = User.query.get(user_id)
+                user = users.get(user_id)
                 if user:
                     username = getattr(user, 'username', f'用户{user_id}')
                     email = getattr(user, 'email', '未知邮箱')
                     
                     # 获取黑名单原因和时间
-                    reason = getattr(entry, 'reason', '未提供原因')
-                    created_at = getattr(entry, 'created_at', None)
+                    reason = entry['reason']
+                    created_at = entry['created_at']
                     
                     blacklisted_customers.append({
                         'user_id': user_id,
@@ -169,7 +163,7 @@ class ContextBuilder:
             return blacklisted_customers
             
         except Exception as e:
-            logger.error(f"获取黑名单顾客失败: {e}")
+            logger.error("获取黑名单顾客失败: %s", e)
             return []
     
     @staticmethod
@@ -197,7 +191,7 @@ class ContextBuilder:
             
             return restaurant, info
         except Exception as e:
-            logger.error(f"获取餐厅信息失败: {e}")
+            logger.error("获取餐厅信息失败: %s", e)
             return None, f"获取餐厅信息失败: {e}\n"
     
     @staticmethod
@@ -215,14 +209,14 @@ class ContextBuilder:
                 dish_count = Dish.query.filter_by(restaurant_id=restaurant_id, is_active=True).count()
                 context += f"在售菜品数: {dish_count}\n"
             except Exception as e:
-                logger.warning(f"获取菜品数失败: {e}")
+                logger.warning("获取菜品数失败: %s", e)
             
             # 分类总数
             try:
-                category_count = Category.query.filter_by(restaurant_id=restaurant_id).count()
+                category_count = Category.query.filter_by(restaurant_id=restaurant_id).filter(Category.deleted_at.is_(None)).count()
                 context += f"菜品分类数: {category_count}\n"
             except Exception as e:
-                logger.warning(f"获取分类数失败: {e}")
+                logger.warning("获取分类数失败: %s", e)
             
             # 顾客总数
             try:
@@ -231,14 +225,14 @@ class ContextBuilder:
                 ).scalar() or 0
                 context += f"顾客总数: {customer_count}\n"
             except Exception as e:
-                logger.warning(f"获取顾客数失败: {e}")
+                logger.warning("获取顾客数失败: %s", e)
             
             # 订单总数
             try:
                 order_count = Order.query.filter_by(restaurant_id=restaurant_id).count()
                 context += f"订单总数: {order_count}\n"
             except Exception as e:
-                logger.warning(f"获取订单数失败: {e}")
+                logger.warning("获取订单数失败: %s", e)
             
             # 活跃订单
             try:
@@ -247,14 +241,14 @@ class ContextBuilder:
                 ).filter(Order.status.notin_(['cancelled', 'completed'])).count()
                 context += f"活跃订单: {active_order_count}\n"
             except Exception as e:
-                logger.warning(f"获取活跃订单数失败: {e}")
+                logger.warning("获取活跃订单数失败: %s", e)
             
             # 黑名单顾客数
             try:
-                blacklist_count = Blacklist.query.filter_by(restaurant_id=restaurant_id).count()
+                blacklist_count = blacklist_service.count(restaurant_id)
                 context += f"黑名单顾客数: {blacklist_count}\n"
             except Exception as e:
-                logger.warning(f"获取黑名单数失败: {e}")
+                logger.warning("获取黑名单数失败: %s", e)
             
             context += f"餐厅ID: {restaurant_id}\n"
             context += f"数据更新时间: {now.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
@@ -262,17 +256,17 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建经营概览失败: {e}")
+            logger.error("构建经营概览失败: %s", e)
             return "=== 经营概览 ===\n经营概览获取失败\n\n"
     
     @staticmethod
     def _build_categories_context(restaurant_id):
         """构建菜品分类上下文"""
         try:
-            categories = Category.query.filter_by(restaurant_id=restaurant_id).all()
+            categories = Category.query.filter_by(restaurant_id=restaurant_id).filter(Category.deleted_at.is_(None)).all()
             
             if not categories:
-                logger.warning(f"餐厅 {restaurant_id} 没有菜品分类")
+                logger.warning("餐厅 %s 没有菜品分类", restaurant_id)
                 return "=== 菜品分类 ===\n暂无分类\n\n"
             
             context = "=== 菜品分类 ===\n"
@@ -296,7 +290,7 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建分类上下文失败: {e}")
+            logger.error("构建分类上下文失败: %s", e)
             return "=== 菜品分类 ===\n分类信息获取失败\n\n"
     
     @staticmethod
@@ -304,13 +298,15 @@ class ContextBuilder:
         """构建菜品上下文"""
         try:
             # 查询所有菜品
-            dishes = Dish.query.filter_by(restaurant_id=restaurant_id).order_by(Dish.price.asc()).all()
+            dishes = Dish.query.filter_by(restaurant_id=restaurant_id).filter(
+                Dish.deleted_at.is_(None)
+            ).order_by(Dish.price.asc()).all()
             
             if not dishes:
-                logger.warning(f"餐厅 {restaurant_id} 没有菜品数据")
+                logger.warning("餐厅 %s 没有菜品数据", restaurant_id)
                 return "=== 所有菜品详情 ===\n暂无菜品\n\n"
             
-            logger.info(f"查询到餐厅 {restaurant_id} 的菜品数量: {len(dishes)}")
+            logger.info("查询到餐厅 %s 的菜品数量: %s", restaurant_id, len(dishes))
             
             context = "=== 所有菜品详情（按价格从低到高排序） ===\n"
             
@@ -406,8 +402,7 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建菜品上下文失败: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("构建菜品上下文失败: %s", e)
             return "=== 所有菜品详情 ===\n菜品信息获取失败\n\n"
     
     @staticmethod
@@ -432,7 +427,7 @@ class ContextBuilder:
                 total_sales = float(total_sales) if total_sales else 0.0
                 context += f"总销售额: ¥{total_sales:.2f}\n"
             except Exception as e:
-                logger.warning(f"获取总销售额失败: {e}")
+                logger.warning("获取总销售额失败: %s", e)
                 context += f"总销售额: 获取失败\n"
             
             # 总订单数
@@ -443,7 +438,7 @@ class ContextBuilder:
                 ).scalar() or 0
                 context += f"总订单数: {total_orders}\n"
             except Exception as e:
-                logger.warning(f"获取总订单数失败: {e}")
+                logger.warning("获取总订单数失败: %s", e)
                 context += f"总订单数: 获取失败\n"
             
             # 平均订单金额
@@ -462,7 +457,7 @@ class ContextBuilder:
                 recent_sales = float(recent_sales) if recent_sales else 0.0
                 context += f"最近30天销售额: ¥{recent_sales:.2f}\n"
             except Exception as e:
-                logger.warning(f"获取30天销售额失败: {e}")
+                logger.warning("获取30天销售额失败: %s", e)
             
             # 最近7天销售
             try:
@@ -475,7 +470,7 @@ class ContextBuilder:
                 weekly_sales = float(weekly_sales) if weekly_sales else 0.0
                 context += f"最近7天销售额: ¥{weekly_sales:.2f}\n"
             except Exception as e:
-                logger.warning(f"获取7天销售额失败: {e}")
+                logger.warning("获取7天销售额失败: %s", e)
             
             # 今日销售
             try:
@@ -488,13 +483,13 @@ class ContextBuilder:
                 today_sales = float(today_sales) if today_sales else 0.0
                 context += f"今日销售额: ¥{today_sales:.2f}\n"
             except Exception as e:
-                logger.warning(f"获取今日销售额失败: {e}")
+                logger.warning("获取今日销售额失败: %s", e)
             
             context += "\n"
             return context
             
         except Exception as e:
-            logger.error(f"构建销售统计失败: {e}")
+            logger.error("构建销售统计失败: %s", e)
             return "=== 销售统计 ===\n销售统计获取失败\n\n"
     
     @staticmethod
@@ -517,16 +512,9 @@ class ContextBuilder:
             # 获取该餐厅的黑名单列表
             blacklist_map = {}
             try:
-                blacklist_entries = Blacklist.query.filter_by(restaurant_id=restaurant_id).all()
-                for entry in blacklist_entries:
-                    user_id = getattr(entry, 'user_id', None)
-                    if user_id:
-                        blacklist_map[user_id] = {
-                            'reason': getattr(entry, 'reason', ''),
-                            'created_at': getattr(entry, 'created_at', None)
-                        }
+                blacklist_map = blacklist_service.get_members(restaurant_id)
             except Exception as e:
-                logger.error(f"获取黑名单列表失败: {e}")
+                logger.error("获取黑名单列表失败: %s", e)
             
             context = "=== 顾客信息（包含黑名单状态） ===\n"
             
@@ -612,29 +600,25 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建顾客上下文失败: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("构建顾客上下文失败: %s", e)
             return "=== 顾客信息 ===\n顾客信息获取失败（包含黑名单状态）\n\n"
     
     @staticmethod
     def _build_blacklist_summary(restaurant_id):
         """专门构建黑名单汇总信息 - 从Blacklist表获取"""
         try:
-            # 从Blacklist表获取该餐厅的黑名单记录
-            blacklist_entries = Blacklist.query.filter_by(restaurant_id=restaurant_id).all()
+            # 从黑名单服务获取该餐厅的黑名单记录
+            members = blacklist_service.get_members(restaurant_id)
             
             # 获取黑名单用户ID列表
-            blacklisted_user_ids = []
+            blacklisted_user_ids = list(members)
             blacklist_info_map = {}
-            for entry in blacklist_entries:
-                user_id = getattr(entry, 'user_id', None)
-                if user_id:
-                    blacklisted_user_ids.append(user_id)
-                    blacklist_info_map[user_id] = {
-                        'reason': getattr(entry, 'reason', '未提供原因'),
-                        'created_at': getattr(entry, 'created_at', '未知时间'),
-                        'entry_id': getattr(entry, 'id', '未知')
-                    }
+            for user_id, entry in members.items():
+                blacklist_info_map[user_id] = {
+                    'reason': entry['reason'] or '未提供原因',
+                    'created_at': entry['created_at'] or '未知时间',
+                    'entry_id': entry['id']
+                }
             
             # 获取所有在该餐厅消费过的顾客
             customer_ids = db.session.query(distinct(Order.user_id)).filter(
@@ -718,7 +702,7 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建黑名单汇总失败: {e}")
+            logger.error("构建黑名单汇总失败: %s", e)
             return "=== 黑名单汇总 ===\n黑名单汇总获取失败\n\n"
     
     @staticmethod
@@ -767,7 +751,7 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建热门菜品分析失败: {e}")
+            logger.error("构建热门菜品分析失败: %s", e)
             return "=== 热门菜品分析 ===\n热门菜品分析获取失败\n\n"
     
     @staticmethod
@@ -805,7 +789,7 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建顾客分析失败: {e}")
+            logger.error("构建顾客分析失败: %s", e)
             return "=== 顾客消费分析 ===\n顾客消费分析获取失败\n\n"
     
     @staticmethod
@@ -870,20 +854,20 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建订单上下文失败: {e}")
+            logger.error("构建订单上下文失败: %s", e)
             return "=== 订单详情 ===\n订单信息获取失败\n\n"
     
     @staticmethod
     def build_restaurant_context(restaurant_id, force_refresh=False):
         """构建完整的餐厅上下文"""
         
-        logger.info(f"开始构建餐厅 {restaurant_id} 的完整上下文...")
+        logger.info("开始构建餐厅 %s 的完整上下文...", restaurant_id)
         
         # 检查是否需要刷新
         if force_refresh or ContextBuilder._should_refresh(restaurant_id):
-            logger.info(f"正在刷新餐厅 {restaurant_id} 的上下文...")
+            logger.info("正在刷新餐厅 %s 的上下文...", restaurant_id)
         else:
-            logger.info(f"使用缓存的餐厅 {restaurant_id} 上下文")
+            logger.info("使用缓存的餐厅 %s 上下文", restaurant_id)
         
         try:
             # 获取餐厅基本信息
@@ -923,13 +907,12 @@ class ContextBuilder:
             # 标记已更新
             ContextBuilder._mark_updated(restaurant_id)
             
-            logger.info(f"✅ 上下文构建完成，长度: {len(context)} 字符")
+            logger.info("✅ 上下文构建完成，长度: %s 字符", len(context))
             
             return context
             
         except Exception as e:
-            logger.error(f"构建上下文失败: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception("构建上下文失败: %s", e)
             return f"构建上下文时出错: {str(e)[:200]}..."
     
     @staticmethod
@@ -944,7 +927,7 @@ class ContextBuilder:
         
         # 如果上下文太长，进行智能截断
         if len(full_context) > max_length:
-            logger.warning(f"上下文过长 ({len(full_context)} > {max_length})，进行智能截断")
+            logger.warning("上下文过长 (%s > %s)，进行智能截断", len(full_context), max_length)
             
             # 根据问题类型保留相关部分
             question_lower = question.lower()
@@ -1003,7 +986,7 @@ class ContextBuilder:
                     if len(context) + len(part) < max_length * 0.8:  # 留出20%空间
                         context += part
             
-            logger.info(f"智能截断后上下文长度: {len(context)}")
+            logger.info("智能截断后上下文长度: %s", len(context))
             return context
         else:
             return full_context
@@ -1055,7 +1038,7 @@ class ContextBuilder:
             return context
             
         except Exception as e:
-            logger.error(f"构建最小上下文失败: {e}")
+            logger.error("构建最小上下文失败: %s", e)
             return f"餐厅ID: {restaurant_id}"
     
     @staticmethod
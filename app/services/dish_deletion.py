@@ -0,0 +1,225 @@
+"""
+菜品删除模块 - 归档菜品，或按集合批量级联删除菜品相关订单
+
+默认的删除是归档（软删除）：菜品下架并记录 deleted_at，历史订单和
+统计数据完整保留，只是不再出现在菜单和菜品管理中。
+
+彻底删除（purge）时需要删除所有包含该菜品的订单，并扣减订单中其他菜品的被点
+次数和餐厅销售额。这里按订单ID分批用几条集合SQL完成：
+- 一次聚合查询得到每个其他菜品要扣减的数量，一条 executemany 更新
+- 批量删除订单项和订单
+- 一条 UPDATE 扣减餐厅销售额
+每批单独提交，写锁只在一批内持有。关联订单很多时可以交给后台任务执行，
+任务进度保存在 DishDeletionJob 表中，任意worker都能查询；结束超过
+DISH_DELETE_JOB_RETENTION 秒的任务在启动新任务时清理。
+"""
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import bindparam, case, func
+from app import db
+from app.models import Restaurant, Dish, Order, OrderItem, DishDeletionJob
+from app.services.menu_cache import menu_cache
+from app.services.restaurant_ranking import restaurant_ranking
+
+def archive_dish(dish):
+    """归档（软删除）菜品，保留所有历史订单"""
+    dish.is_active = False
+    dish.deleted_at = datetime.utcnow()
+    menu_cache.bump(dish.restaurant_id)
+    db.session.commit()
+
+def count_related_orders(dish_id):
+    """统计包含该菜品的订单数"""
+    return db.session.query(func.count(func.distinct(OrderItem.order_id))).filter(
+        OrderItem.dish_id == dish_id
+    ).scalar() or 0
+
+def _delete_order_batch(restaurant_id, dish_id, order_ids):
+    """
+    删除一批订单并扣减统计数据（调用方负责提交）
+    :return: (扣减的销售额, 更新的其他菜品订单项数)
+    """
+    # 只统计已支付和已完成的订单
+    total_to_subtract = db.session.query(func.coalesce(func.sum(Order.total_amount), 0.0)).filter(
+        Order.id.in_(order_ids),
+        Order.status.in_(['paid', 'completed'])
+    ).scalar()
+
+    # 每个其他菜品在这批订单中的总数量
+    decrements = db.session.query(
+        OrderItem.dish_id,
+        func.sum(OrderItem.quantity),
+        func.count(OrderItem.id)
+    ).filter(
+        OrderItem.order_id.in_(order_ids),
+        OrderItem.dish_id != dish_id
+    ).group_by(OrderItem.dish_id).all()
+
+    updated_items = 0
+    if decrements:
+        dish_table = Dish.__table__
+        remaining = func.coalesce(dish_table.c.order_count, 0) - bindparam('b_quantity')
+        db.session.execute(
+            dish_table.update()
+            .where(dish_table.c.id == bindparam('b_dish_id'))
+            .values(order_count=case((remaining < 0, 0), else_=remaining)),
+            [{'b_dish_id': other_dish_id, 'b_quantity': quantity}
+             for other_dish_id, quantity, _ in decrements]
+        )
+        updated_items = sum(item_count for _, _, item_count in decrements)
+
+    db.session.execute(
+        OrderItem.__table__.delete().where(OrderItem.__table__.c.order_id.in_(order_ids))
+    )
+    db.session.execute(
+        Order.__table__.delete().where(Order.__table__.c.id.in_(order_ids))
+    )
+
+    if total_to_subtract > 0:
+        restaurant_table = Restaurant.__table__
+        remaining_sales = func.coalesce(restaurant_table.c.total_sales, 0) - total_to_subtract
+        db.session.execute(
+            restaurant_table.update()
+            .where(restaurant_table.c.id == restaurant_id)
+            .values(total_sales=case((remaining_sales < 0, 0), else_=remaining_sales))
+        )
+
+    return float(total_to_subtract), updated_items
+
+def delete_dish_cascade(restaurant_id, dish_id, batch_size=None, progress=None):
+    """
+    删除菜品及所有包含它的订单
+    :param progress: 可选回调 progress(已删除订单数)，每批提交后调用
+    :return: 统计信息 {'dish_name', 'orders_deleted', 'total_subtracted', 'updated_dish_count'}
+    """
+    batch_size = batch_size or current_app.config.get('DISH_DELETE_BATCH_SIZE', 500)
+    dish = db.session.get(Dish, dish_id)
+    if dish is None or dish.restaurant_id != restaurant_id:
+        raise ValueError('菜品不存在')
+
+    # 先下架，删除过程中不会再产生包含该菜品的新订单
+    if dish.is_active:
+        dish.is_active = False
+        menu_cache.bump(restaurant_id)
+        db.session.commit()
+
+    stats = {
+        'dish_name': dish.name,
+        'orders_deleted': 0,
+        'total_subtracted': 0.0,
+        'updated_dish_count': 0
+    }
+
+    while True:
+        order_ids = [row[0] for row in db.session.query(OrderItem.order_id).filter(
+            OrderItem.dish_id == dish_id
+        ).distinct().limit(batch_size).all()]
+        if not order_ids:
+            break
+
+        try:
+            subtracted, updated_items = _delete_order_batch(restaurant_id, dish_id, order_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        stats['orders_deleted'] += len(order_ids)
+        stats['total_subtracted'] += subtracted
+        stats['updated_dish_count'] += updated_items
+        if progress:
+            progress(stats['orders_deleted'])
+
+    # 删除菜品图片（如果不是默认图片）
+    if dish.image_path and dish.image_path != 'default_dish.png':
+        image_path = os.path.join(current_app.config['DISH_UPLOAD_FOLDER'], dish.image_path)
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+    db.session.delete(dish)
+    menu_cache.bump(restaurant_id)
+    db.session.commit()
+
+    # 销售额可能减少，排行缓存需要重新查询
+    if stats['orders_deleted']:
+        restaurant_ranking.invalidate()
+    return stats
+
+class DeletionJobs:
+    """后台删除任务，状态和进度记录在 DishDeletionJob 表中"""
+
+    def start(self, restaurant_id, dish_id, total_orders):
+        """启动后台删除任务，返回任务ID"""
+        app = current_app._get_current_object()
+        self._prune()
+        job = DishDeletionJob(
+            id=uuid.uuid4().hex,
+            restaurant_id=restaurant_id,
+            dish_id=dish_id,
+            status='running',
+            total_orders=total_orders,
+            orders_deleted=0,
+            message=''
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        thread = threading.Thread(
+            target=self._run,
+            args=(app, job.id, restaurant_id, dish_id),
+            name=f'delete-dish-{dish_id}',
+            daemon=True
+        )
+        thread.start()
+        return job.id
+
+    @staticmethod
+    def _update(job_id, **fields):
+        fields['updated_at'] = datetime.utcnow()
+        DishDeletionJob.query.filter_by(id=job_id).update(fields, synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def _prune():
+        """清理结束超过 DISH_DELETE_JOB_RETENTION 秒的任务"""
+        retention = current_app.config.get('DISH_DELETE_JOB_RETENTION', 3600)
+        DishDeletionJob.query.filter(
+            DishDeletionJob.status != 'running',
+            DishDeletionJob.updated_at < datetime.utcnow() - timedelta(seconds=retention)
+        ).delete(synchronize_session=False)
+
+    def _run(self, app, job_id, restaurant_id, dish_id):
+        with app.app_context():
+            try:
+                stats = delete_dish_cascade(
+                    restaurant_id, dish_id,
+                    progress=lambda deleted: self._update(job_id, orders_deleted=deleted)
+                )
+                message = f'菜品"{stats["dish_name"]}"及{stats["orders_deleted"]}个相关订单已成功删除！'
+                if stats['total_subtracted'] > 0:
+                    message += f' 已从餐厅销售额中减去¥{stats["total_subtracted"]:.2f}'
+                self._update(job_id, status='done', orders_deleted=stats['orders_deleted'], message=message)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error('后台删除菜品 %s 失败: %s', dish_id, e)
+                self._update(job_id, status='failed', message=f'删除失败：{str(e)}')
+            finally:
+                db.session.remove()
+
+    def get(self, job_id):
+        """任务状态，不存在（或已清理）返回 None"""
+        job = db.session.get(DishDeletionJob, job_id)
+        if job is None:
+            return None
+        timeout = current_app.config.get('DISH_DELETE_JOB_TIMEOUT', 600)
+        if job.status == 'running' and job.updated_at < datetime.utcnow() - timedelta(seconds=timeout):
+            # 执行任务的进程已退出（重启或崩溃）；已删除的批次都已提交，重新删除会从剩余订单继续
+            self._update(job_id, status='failed', message='删除任务已中断，请重新删除该菜品，将从剩余的订单继续')
+            db.session.refresh(job)
+        return job.to_dict()
+
+# 创建全局实例
+deletion_jobs = DeletionJobs()
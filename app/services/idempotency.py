@@ -0,0 +1,60 @@
+"""
+幂等键模块 - 结算请求的重试保护
+
+前端在超时后会重试结算。请求带上幂等键（Idempotency-Key 请求头或
+JSON 中的 idempotency_key）时，幂等键记录与订单在同一个事务中写入：
+- 首次请求：先插入幂等键记录（唯一约束占位），再创建订单，提交时
+  一起保存响应结果
+- 重试请求：直接返回保存的结果，不再读写 Order、Dish、Restaurant
+- 并发的同一请求：插入幂等键时等待首个请求提交，随后因唯一约束
+  失败，回滚后返回首个请求的结果
+失败的请求随事务回滚，不留下幂等键，可以用同一个键重试。
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app, request
+from app import db
+from app.models import IdempotencyKey
+
+def get_request_key(data):
+    """从请求头或请求体获取幂等键，没有则返回 None"""
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if not key:
+        return None
+    key = str(key).strip()
+    return key[:64] or None
+
+def fingerprint(data):
+    """请求内容摘要（不含幂等键本身），用于发现同一个键被用于不同请求"""
+    payload = {k: v for k, v in data.items() if k != 'idempotency_key'}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def find(user_id, key):
+    return IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+
+def reserve(user_id, key, request_fingerprint):
+    """
+    在当前事务中插入幂等键记录并立即 flush（占用唯一约束）
+    同一个键已被提交时抛出 IntegrityError
+    """
+    # 顺带清理过期的幂等键
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', 24 * 3600)
+    IdempotencyKey.query.filter(
+        IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=ttl)
+    ).delete(synchronize_session=False)
+
+    record = IdempotencyKey(user_id=user_id, key=key, fingerprint=request_fingerprint)
+    db.session.add(record)
+    db.session.flush()
+    return record
+
+def save_result(record, payload, status_code=200):
+    """记录响应结果（随调用方的事务一起提交）"""
+    record.response = json.dumps(payload, ensure_ascii=False)
+    record.status_code = status_code
+
+def load_result(record):
+    """返回 (响应内容, 状态码)"""
+    return json.loads(record.response), record.status_code or 200
@@ -0,0 +1,23 @@
+"""
+键集分页工具 - 游标编码
+
+游标是上一页最后一条记录排序键的JSON数组，再做URL安全的base64编码，
+对前端不透明。日期时间按ISO格式编码，解码时由调用方还原类型。
+"""
+import base64
+import json
+
+def encode_cursor(*values):
+    """把排序键编码为游标"""
+    raw = json.dumps(list(values), default=lambda value: value.isoformat())
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, size):
+    """解析游标为长度为 size 的列表，无效时返回 None"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
@@ -0,0 +1,90 @@
+"""
+菜单缓存模块 - 按餐厅缓存渲染好的菜单片段
+
+菜单很少变化，但它是访问量最大的页面。渲染好的菜单片段按
+(餐厅, 分类, 菜单版本) 缓存在进程内；菜品和分类的增删改会递增
+MenuVersion 中的版本号，各个worker读取版本号后自然失效旧缓存。
+销量等统计数字允许在 MENU_CACHE_TTL 秒内略有滞后：时间按 MENU_CACHE_TTL
+划分成所有worker一致的时间段，片段在进入新时间段时重新渲染。
+页面的 ETag/Last-Modified 只由菜单版本、版本更新时间和时间段决定，
+不同worker对同一菜单给出相同的验证器，条件GET在worker之间同样命中。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import MenuVersion
+from app.services.metrics import metrics
+
+class MenuCache:
+    """菜单片段缓存"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_version(restaurant_id):
+        """获取餐厅菜单版本号 (version, updated_at)"""
+        record = db.session.get(MenuVersion, restaurant_id)
+        if record:
+            return record.version, record.updated_at
+        return 0, None
+
+    @staticmethod
+    def bump(restaurant_id):
+        """递增菜单版本号（随调用方的事务一起提交）"""
+        record = db.session.get(MenuVersion, restaurant_id)
+        if record is None:
+            record = MenuVersion(restaurant_id=restaurant_id, version=0)
+            db.session.add(record)
+        record.version = (record.version or 0) + 1
+        record.updated_at = datetime.utcnow()
+
+    def get_fragment(self, restaurant_id, category_id, builder):
+        """
+        获取菜单片段，未命中、版本变化或进入新时间段时调用 builder() 重新渲染
+        :return: (html, version, last_modified)，last_modified 为菜单版本更新时间与
+                 当前时间段起点中较晚的一个（精确到秒），所有worker一致
+        """
+        version, updated_at = self.get_version(restaurant_id)
+        key = (restaurant_id, category_id)
+        ttl = max(current_app.config.get('MENU_CACHE_TTL', 60), 1)
+        bucket = int(time.time() // ttl)
+        last_modified = datetime.utcfromtimestamp(bucket * ttl)
+        if updated_at and updated_at > last_modified:
+            last_modified = updated_at.replace(microsecond=0)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] == version and entry[2] == bucket:
+                self._entries.move_to_end(key)
+                metrics.count_cache('menu', True)
+                return entry[0], version, last_modified
+
+        metrics.count_cache('menu', False)
+        html = builder()
+
+        with self._lock:
+            self._entries[key] = (html, version, bucket)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html, version, last_modified
+
+    @staticmethod
+    def make_etag(*parts):
+        """根据菜单版本及用户相关部分生成ETag"""
+        raw = '|'.join(str(part) for part in parts)
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# 创建全局实例
+menu_cache = MenuCache()
@@ -0,0 +1,158 @@
+"""
+监控指标模块 - Prometheus 格式的 /metrics 端点
+
+记录的指标：
+- 每个路由的请求延迟直方图和请求数（按状态码）
+- 每个请求的SQL条数和数据库耗时（来自 query_stats）
+- AI 调用延迟、结果、重试次数，以及经营顾问和菜品问答使用备选回答的比例
+- 图片处理耗时（save_image）
+- 结算时的购物车大小和结算次数
+- 菜单、黑名单、餐厅排行缓存的命中/未命中次数
+
+需要安装 prometheus_client 包；未安装或 METRICS_ENABLED 关闭时，所有记录方法
+都是空操作。gunicorn 多worker部署时设置 METRICS_MULTIPROC_DIR 为所有worker
+共享的目录（启动前清空），/metrics 会汇总所有worker的数据。
+生产环境必须设置 METRICS_TOKEN 才能抓取 /metrics，未设置时只在调试/测试环境公开。
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from flask import Response, abort, current_app, g, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+class Metrics:
+    """应用监控指标"""
+
+    def __init__(self):
+        self._metrics = None
+        self._multiproc_dir = None
+
+    @property
+    def enabled(self):
+        return self._metrics is not None
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        # prometheus_client 在导入时读取多进程目录，必须先设置环境变量
+        multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR')
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+            os.environ['PROMETHEUS_MULTIPROC_DIR'] = multiproc_dir
+        try:
+            import prometheus_client
+        except ImportError:
+            app.logger.warning('未安装 prometheus_client，/metrics 不可用')
+            return
+
+        if self._metrics is None:
+            self._multiproc_dir = multiproc_dir
+            self._metrics = self._create(prometheus_client)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    @staticmethod
+    def _create(prometheus_client):
+        Counter = prometheus_client.Counter
+        Histogram = prometheus_client.Histogram
+        return {
+            'request_latency': Histogram(
+                'http_request_duration_seconds', '请求处理耗时', ['endpoint', 'method'], buckets=LATENCY_BUCKETS),
+            'requests': Counter(
+                'http_requests_total', '请求数', ['endpoint', 'method', 'status']),
+            'db_queries': Histogram(
+                'db_queries_per_request', '每个请求执行的SQL条数', ['endpoint'], buckets=QUERY_BUCKETS),
+            'db_time': Histogram(
+                'db_time_per_request_seconds', '每个请求的数据库耗时', ['endpoint'], buckets=LATENCY_BUCKETS),
+            'llm_latency': Histogram(
+                'llm_request_duration_seconds', 'AI 接口调用耗时', ['mode', 'outcome'], buckets=LLM_BUCKETS),
+            'llm_retries': Counter(
+                'llm_retries_total', 'AI 接口重试次数', ['mode']),
+            'ai_answers': Counter(
+                'ai_answers_total', 'AI 功能的回答来源（ai/fallback）', ['feature', 'source']),
+            'image_processing': Histogram(
+                'image_processing_seconds', '图片处理耗时', ['folder'], buckets=LATENCY_BUCKETS),
+            'cart_items': Histogram(
+                'checkout_cart_items', '结算时购物车中的菜品件数', buckets=(1, 2, 3, 5, 8, 13, 20, 50)),
+            'checkouts': Counter(
+                'checkouts_total', '结算次数', ['mode', 'outcome']),
+            'cache': Counter(
+                'cache_requests_total', '缓存查询次数', ['cache', 'result']),
+        }
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        endpoint = request.endpoint or 'unknown'
+        if endpoint == 'metrics' or 'metrics_started' not in g:
+            return response
+        m = self._metrics
+        m['request_latency'].labels(endpoint, request.method).observe(time.perf_counter() - g.metrics_started)
+        m['requests'].labels(endpoint, request.method, str(response.status_code)).inc()
+        m['db_queries'].labels(endpoint).observe(g.get('db_queries', 0))
+        m['db_time'].labels(endpoint).observe(g.get('db_time', 0.0))
+        return response
+
+    def render(self):
+        """输出所有指标（多进程模式下汇总所有worker）"""
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            # 未设置令牌时只在调试/测试环境公开，避免生产环境默认暴露指标
+            if not (current_app.debug or current_app.testing):
+                abort(404)
+        elif not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                     f'Bearer {token}'.encode()):
+            abort(403)
+
+        import prometheus_client
+        if self._multiproc_dir:
+            from prometheus_client import multiprocess
+            registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prometheus_client.REGISTRY
+        return Response(prometheus_client.generate_latest(registry),
+                        mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+    def observe_llm(self, mode, seconds, outcome):
+        """记录一次AI接口调用：outcome 为 success/empty/http_error/timeout/connection_error/error"""
+        if self._metrics:
+            self._metrics['llm_latency'].labels(mode, outcome).observe(seconds)
+
+    def count_llm_retry(self, mode):
+        if self._metrics:
+            self._metrics['llm_retries'].labels(mode).inc()
+
+    def count_ai_answer(self, feature, source):
+        if self._metrics:
+            self._metrics['ai_answers'].labels(feature, source).inc()
+
+    @contextmanager
+    def time_image(self, folder):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._metrics:
+                self._metrics['image_processing'].labels(folder).observe(time.perf_counter() - started)
+
+    def observe_checkout(self, mode, outcome, cart_items=None):
+        if self._metrics:
+            self._metrics['checkouts'].labels(mode, outcome).inc()
+            if cart_items is not None:
+                self._metrics['cart_items'].observe(cart_items)
+
+    def count_cache(self, cache, hit):
+        if self._metrics:
+            self._metrics['cache'].labels(cache, 'hit' if hit else 'miss').inc()
+
+# 创建全局实例
+metrics = Metrics()
@@ -0,0 +1,157 @@
+"""
+订单归档模块 - 把旧订单移到冷归档数据库
+
+已完成/已取消且超过 ORDER_ARCHIVE_DAYS 天的订单从业务库移到 archive
+数据库（SQLALCHEMY_BINDS['archive']），报表、控制面板和AI上下文的热查询
+只扫描近期订单。已支付（待处理）的订单不论多旧都留在业务库。
+
+每批先写入归档库并提交，再从业务库删除；归档时跳过已存在的订单ID，
+中途失败后重新运行不会重复归档。
+顾客管理页的消费统计需要包含已归档的订单，而两个库之间不能 JOIN：从业务库
+删除订单的同一事务中，把这批订单按 (餐厅, 顾客) 累加到业务库的
+CustomerArchiveStats，顾客管理页与近期订单一起在SQL中排序分页。
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem, CustomerArchiveStats
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+def archive_cutoff(days=None):
+    """早于该时间的订单可以归档"""
+    if days is None:
+        days = current_app.config.get('ORDER_ARCHIVE_DAYS', 180)
+    return datetime.utcnow() - timedelta(days=days)
+
+def _archive_batch(order_ids):
+    """把一批订单复制到归档库（已存在的跳过）"""
+    already_archived = {
+        row[0] for row in db.session.query(ArchivedOrder.id).filter(ArchivedOrder.id.in_(order_ids)).all()
+    }
+    pending_ids = [order_id for order_id in order_ids if order_id not in already_archived]
+    if not pending_ids:
+        return
+
+    orders = Order.query.filter(Order.id.in_(pending_ids)).all()
+    items = OrderItem.query.filter(OrderItem.order_id.in_(pending_ids)).all()
+    now = datetime.utcnow()
+
+    db.session.execute(db.insert(ArchivedOrder), [{
+        'id': order.id,
+        'user_id': order.user_id,
+        'restaurant_id': order.restaurant_id,
+        'total_amount': order.total_amount,
+        'status': order.status,
+        'created_at': order.created_at,
+        'paid_at': order.paid_at,
+        'remarks': order.remarks,
+        'archived_at': now
+    } for order in orders])
+
+    if items:
+        db.session.execute(db.insert(ArchivedOrderItem), [{
+            'id': item.id,
+            'order_id': item.order_id,
+            'dish_id': item.dish_id,
+            'quantity': item.quantity,
+            'price_at_time': item.price_at_time
+        } for item in items])
+
+def _add_customer_stats(rows):
+    """
+    把一批订单累加到 CustomerArchiveStats（调用方负责提交）
+    :param rows: [(restaurant_id, user_id, status, total_amount, created_at)]
+    """
+    stats = {}
+    for restaurant_id, user_id, status, total_amount, created_at in rows:
+        key = (restaurant_id, user_id)
+        entry = stats.setdefault(key, {'completed': 0, 'cancelled': 0, 'total': 0.0, 'last': None})
+        entry[status] += 1
+        if status == 'completed':
+            entry['total'] += total_amount or 0
+            if created_at and (entry['last'] is None or created_at > entry['last']):
+                entry['last'] = created_at
+
+    existing = {
+        (record.restaurant_id, record.user_id): record
+        for restaurant_id in {key[0] for key in stats}
+        for record in CustomerArchiveStats.query.filter(
+            CustomerArchiveStats.restaurant_id == restaurant_id,
+            CustomerArchiveStats.user_id.in_([key[1] for key in stats if key[0] == restaurant_id])
+        ).all()
+    }
+    for (restaurant_id, user_id), entry in stats.items():
+        record = existing.get((restaurant_id, user_id))
+        if record is None:
+            record = CustomerArchiveStats(restaurant_id=restaurant_id, user_id=user_id,
+                                          completed_count=0, cancelled_count=0, total_spent=0.0)
+            db.session.add(record)
+        record.completed_count += entry['completed']
+        record.cancelled_count += entry['cancelled']
+        record.total_spent += entry['total']
+        if entry['last'] and (record.last_order_at is None or entry['last'] > record.last_order_at):
+            record.last_order_at = entry['last']
+
+def rebuild_customer_stats(batch_size=5000):
+    """按归档库重新计算 CustomerArchiveStats（汇总表建立之前已归档的订单）"""
+    CustomerArchiveStats.query.delete()
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            ArchivedOrder.id, ArchivedOrder.restaurant_id, ArchivedOrder.user_id,
+            ArchivedOrder.status, ArchivedOrder.total_amount, ArchivedOrder.created_at
+        ).filter(
+            ArchivedOrder.id > last_id,
+            ArchivedOrder.status.in_(ARCHIVABLE_STATUSES)
+        ).order_by(ArchivedOrder.id).limit(batch_size).all()
+        if not rows:
+            break
+        _add_customer_stats([row[1:] for row in rows])
+        db.session.flush()
+        last_id = rows[-1][0]
+    db.session.commit()
+
+def archive_orders(days=None, batch_size=None, progress=None):
+    """
+    归档旧订单
+    :param progress: 可选回调 progress(已归档订单数)，每批完成后调用
+    :return: 归档的订单数
+    """
+    cutoff = archive_cutoff(days)
+    batch_size = batch_size or current_app.config.get('ORDER_ARCHIVE_BATCH_SIZE', 500)
+    archived = 0
+
+    while True:
+        order_ids = [row[0] for row in db.session.query(Order.id).filter(
+            Order.status.in_(ARCHIVABLE_STATUSES),
+            Order.created_at < cutoff
+        ).order_by(Order.id).limit(batch_size).all()]
+        if not order_ids:
+            break
+
+        try:
+            # 1. 写入归档库并提交
+            _archive_batch(order_ids)
+            db.session.commit()
+
+            # 2. 累加顾客汇总并从业务库删除（同一事务，失败后重新运行不会重复累加）
+            _add_customer_stats(db.session.query(
+                Order.restaurant_id, Order.user_id, Order.status, Order.total_amount, Order.created_at
+            ).filter(Order.id.in_(order_ids)).all())
+            db.session.execute(
+                OrderItem.__table__.delete().where(OrderItem.__table__.c.order_id.in_(order_ids))
+            )
+            db.session.execute(
+                Order.__table__.delete().where(Order.__table__.c.id.in_(order_ids))
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        archived += len(order_ids)
+        if progress:
+            progress(archived)
+
+    return archived
@@ -0,0 +1,202 @@
+"""
+订单事件模块 - 订单推送的发布/订阅
+
+新订单（checkout）和订单状态变化（transition_orders）发布到按餐厅划分的
+频道，商家的订单页面通过 SSE 长连接实时收到，不必反复刷新整页；
+同一事件也发布到按订单划分的频道，顾客在下单完成页实时看到订单状态。
+
+消息代理可插拔：
+- memory: 进程内发布/订阅（单进程部署）
+- redis:  Redis PUBLISH/SUBSCRIBE（多worker/多机部署，需要安装 redis 包）
+
+每个 SSE 连接在整个页面打开期间占用处理它的 worker/线程，所以实时推送
+（ORDER_EVENTS_LIVE）默认只在 gevent worker + redis 代理下开启；
+其他部署（如 gunicorn 同步 worker、进程内代理）下页面改为定时轮询订单状态。
+"""
+import json
+import queue
+import sys
+import threading
+from datetime import datetime
+from flask import current_app
+
+class MemoryOrderBroker:
+    """进程内订单事件代理"""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """订阅频道，返回接收消息的队列"""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # 客户端太慢，丢弃消息而不是阻塞下单
+                pass
+
+class RedisOrderBroker:
+    """Redis订单事件代理：发布到Redis，由每个进程的监听线程转发给本地订阅者"""
+
+    def __init__(self, url, prefix='orders:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._local = MemoryOrderBroker()
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='order-events-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + '*')
+        for item in pubsub.listen():
+            channel = item['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            data = item['data']
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            self._local.publish(channel[len(self.prefix):], data)
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return self._local.subscribe(channel)
+
+    def unsubscribe(self, channel, subscriber):
+        self._local.unsubscribe(channel, subscriber)
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, message)
+
+def create_order_broker(config):
+    """根据配置创建订单事件代理"""
+    broker = config.get('ORDER_EVENTS_BROKER', 'memory')
+    if broker == 'redis':
+        return RedisOrderBroker(config['ORDER_EVENTS_REDIS_URL'])
+    if broker == 'memory':
+        return MemoryOrderBroker()
+    raise ValueError(f'未知的订单事件代理: {broker}')
+
+class OrderEvents:
+    """订单事件服务"""
+
+    def init_app(self, app):
+        app.extensions['order_broker'] = create_order_broker(app.config)
+        app.extensions['order_events_live'] = self._live_enabled(app.config)
+        app.context_processor(lambda: {'order_events_live': self.live})
+
+    @staticmethod
+    def _live_enabled(config):
+        setting = str(config.get('ORDER_EVENTS_LIVE', 'auto')).lower()
+        if setting != 'auto':
+            return setting in ('true', '1', 't')
+        # 同步 worker 中一个长连接就占满整个 worker；进程内代理收不到其他 worker 发布的事件
+        gevent_monkey = sys.modules.get('gevent.monkey')
+        concurrent = bool(gevent_monkey and gevent_monkey.is_module_patched('threading'))
+        return concurrent and config.get('ORDER_EVENTS_BROKER', 'memory') == 'redis'
+
+    @property
+    def live(self):
+        """是否提供 SSE 实时推送；否则页面轮询订单状态"""
+        return current_app.extensions.get('order_events_live', False)
+
+    @property
+    def broker(self):
+        return current_app.extensions['order_broker']
+
+    @staticmethod
+    def restaurant_channel(restaurant_id):
+        return f'restaurant:{restaurant_id}'
+
+    @staticmethod
+    def order_channel(order_id):
+        return f'order:{order_id}'
+
+    @staticmethod
+    def order_payload(order, event_type):
+        """订单事件内容"""
+        customer = order.customer
+        return {
+            'type': event_type,
+            'order_id': order.id,
+            'restaurant_id': order.restaurant_id,
+            'user_id': order.user_id,
+            'status': order.status,
+            'total_amount': float(order.total_amount or 0),
+            'customer': customer.username if customer else '',
+            'created_at': order.created_at.isoformat() if order.created_at else None,
+            'sent_at': datetime.utcnow().isoformat()
+        }
+
+    def publish_order(self, order, event_type, notify_restaurant=True):
+        """发布订单事件（在事务提交之后调用）"""
+        message = json.dumps(self.order_payload(order, event_type), ensure_ascii=False)
+        try:
+            if notify_restaurant:
+                self.broker.publish(self.restaurant_channel(order.restaurant_id), message)
+            self.broker.publish(self.order_channel(order.id), message)
+        except Exception as e:
+            # 推送失败不影响下单和改状态，客户端刷新即可看到
+            current_app.logger.warning('发布订单事件失败: %s', e)
+
+    def stream(self, channel, initial=None, until_statuses=()):
+        """
+        SSE 事件流生成器
+        订阅在调用时立即建立，保证之后发布的事件都不会漏掉
+        :param initial: 连接建立后先发送的事件内容（如订单当前状态）
+        :param until_statuses: 收到这些状态的事件后结束事件流
+        """
+        broker = self.broker
+        heartbeat = current_app.config.get('ORDER_EVENTS_HEARTBEAT', 15)
+        subscriber = broker.subscribe(channel)
+        initial_message = json.dumps(initial, ensure_ascii=False) if initial else None
+
+        def generate():
+            try:
+                yield 'retry: 5000\n\n'
+                message = initial_message
+                while True:
+                    if message is None:
+                        try:
+                            message = subscriber.get(timeout=heartbeat)
+                        except queue.Empty:
+                            # 心跳，防止代理服务器断开空闲连接
+                            yield ': keepalive\n\n'
+                            continue
+                    event = json.loads(message)
+                    yield f'event: {event.get("type", "message")}\ndata: {message}\n\n'
+                    if event.get('status') in until_statuses:
+                        break
+                    message = None
+            finally:
+                broker.unsubscribe(channel, subscriber)
+
+        return generate()
+
+# 创建全局实例
+order_events = OrderEvents()
@@ -0,0 +1,502 @@
+"""
+订单写入队列模块 - 高峰期的异步批量写入（write-behind）
+
+午餐高峰时每个结算请求都要拿业务库（SQLite）的写锁，所有worker在
+结算上排队。ORDER_INGEST_MODE = 'queue' 时结算只做校验，把订单追加到
+独立的 SQLite WAL 队列文件并立即返回订单号；再由单个写入线程把
+积压的订单、订单项、菜品被点次数和餐厅销售额在一个大事务里批量提交。
+
+- 订单号在入队时分配，写入业务库时使用同一个ID。队列从业务库的订单号序列
+  （OrderIdSequence）整段预留 ORDER_INGEST_ID_BLOCK 个号，直接结算和脚本
+  写入的订单也从同一序列取号，不会冲突
+- 写入线程每 ORDER_INGEST_MAX_LAG/2 秒提交一次；多个worker通过队列
+  文件中的租约保证同一时间只有一个写入者
+- 入队时发现最早的积压订单已超过 ORDER_INGEST_MAX_LAG，由当前请求
+  直接提交一次，延迟不会无限增长
+- 顾客查看订单时先查业务库，查不到再读队列，下单后立即能看到订单；
+  商家的订单列表在提交后（最多 ORDER_INGEST_MAX_LAG 秒）才出现新订单
+- 幂等键随订单一起入队，重试请求在提交前后都能得到同一个订单号
+- 无法写入业务库的订单标记为失败：顾客的订单页显示提交失败（并推送给正在
+  查看的页面），同一幂等键的重试返回失败
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import User, Restaurant, Dish, Order, OrderItem, IdempotencyKey, OrderIdSequence
+
+class OrderQueue:
+    """SQLite订单队列 - 与业务库分离，入队只占用队列文件的写锁"""
+
+    def __init__(self, path, lease_seconds=30):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.token = uuid.uuid4().hex
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS order_queue ('
+            ' order_id INTEGER PRIMARY KEY,'
+            ' user_id INTEGER NOT NULL,'
+            ' restaurant_id INTEGER NOT NULL,'
+            ' idempotency_key TEXT,'
+            ' fingerprint TEXT,'
+            ' payload TEXT NOT NULL,'
+            ' enqueued_at REAL NOT NULL,'
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            ' committed_at REAL)'
+        )
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS ux_order_queue_key'
+            ' ON order_queue (user_id, idempotency_key)'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS ix_order_queue_state ON order_queue (state, order_id)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS ingest_meta ('
+            ' name TEXT PRIMARY KEY,'
+            ' value TEXT,'
+            ' expires_at REAL)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # fork 出的子进程（gunicorn --preload）不能沿用父进程的连接
+        if conn is None or self._local.pid != os.getpid():
+            # isolation_level=None：由我们显式控制事务
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, user_id, restaurant_id, payload, reserve_ids, idempotency_key=None, fingerprint=None):
+        """
+        追加订单并分配订单号
+        订单号从预留的号段中依次取用，号段用完时调用 reserve_ids() 预留下一段，返回 (第一个号, 个数)
+        同一用户的幂等键已存在时抛出 sqlite3.IntegrityError
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            meta = dict(conn.execute(
+                "SELECT name, value FROM ingest_meta WHERE name IN ('next_id', 'id_block_end')"
+            ).fetchall())
+            order_id = int(meta.get('next_id') or 0)
+            if not order_id or order_id > int(meta.get('id_block_end') or 0):
+                order_id, count = reserve_ids()
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingest_meta (name, value) VALUES ('id_block_end', ?)",
+                    (str(order_id + count - 1),)
+                )
+            payload['order_id'] = order_id
+            conn.execute(
+                'INSERT INTO order_queue (order_id, user_id, restaurant_id, idempotency_key,'
+                ' fingerprint, payload, enqueued_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (order_id, user_id, restaurant_id, idempotency_key, fingerprint,
+                 json.dumps(payload, ensure_ascii=False), time.time())
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_meta (name, value) VALUES ('next_id', ?)",
+                (str(order_id + 1),)
+            )
+            conn.execute('COMMIT')
+            return order_id
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, order_id):
+        """获取尚未写入业务库（或写入失败）的订单内容，state 为 pending/failed"""
+        row = self._connect().execute(
+            "SELECT payload, state FROM order_queue WHERE order_id = ? AND state IN ('pending', 'failed')",
+            (order_id,)
+        ).fetchone()
+        return dict(json.loads(row[0]), state=row[1]) if row else None
+
+    def find_by_key(self, user_id, key):
+        """按幂等键查找，返回 (请求摘要, 订单内容) 或 None，订单内容中的 state 为队列状态"""
+        row = self._connect().execute(
+            'SELECT fingerprint, payload, state FROM order_queue WHERE user_id = ? AND idempotency_key = ?',
+            (user_id, key)
+        ).fetchone()
+        return (row[0], dict(json.loads(row[1]), state=row[2])) if row else None
+
+    def pending(self, limit):
+        rows = self._connect().execute(
+            "SELECT payload, idempotency_key, fingerprint FROM order_queue"
+            " WHERE state = 'pending' ORDER BY order_id LIMIT ?", (limit,)
+        ).fetchall()
+        entries = []
+        for payload, key, fingerprint in rows:
+            entry = json.loads(payload)
+            entry['idempotency_key'] = key
+            entry['fingerprint'] = fingerprint
+            entries.append(entry)
+        return entries
+
+    def oldest_pending_age(self):
+        """最早的积压订单已等待的秒数，没有积压返回 0"""
+        row = self._connect().execute(
+            "SELECT MIN(enqueued_at) FROM order_queue WHERE state = 'pending'"
+        ).fetchone()
+        return time.time() - row[0] if row and row[0] else 0
+
+    def mark(self, order_ids, state):
+        if not order_ids:
+            return
+        placeholders = ','.join('?' * len(order_ids))
+        self._connect().execute(
+            f'UPDATE order_queue SET state = ?, committed_at = ? WHERE order_id IN ({placeholders})',
+            (state, time.time(), *order_ids)
+        )
+
+    def prune(self, retention):
+        """删除已写入超过 retention 秒的记录（失败的记录保留以便排查）"""
+        self._connect().execute(
+            "DELETE FROM order_queue WHERE state = 'committed' AND committed_at < ?",
+            (time.time() - retention,)
+        )
+
+    def acquire_lease(self):
+        """获取写入者租约，其他进程持有未过期的租约时返回 False"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM ingest_meta WHERE name = 'writer'"
+            ).fetchone()
+            if row and row[0] != self.token and row[1] and row[1] > now:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO ingest_meta (name, value, expires_at) VALUES ('writer', ?, ?)",
+                (self.token, now + self.lease_seconds)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release_lease(self):
+        self._connect().execute(
+            "DELETE FROM ingest_meta WHERE name = 'writer' AND value = ?", (self.token,)
+        )
+
+class PendingOrderItem:
+    """队列中订单的订单项（只读，供订单页面显示）"""
+
+    def __init__(self, dish, quantity, price_at_time):
+        self.dish = dish
+        self.quantity = quantity
+        self.price_at_time = price_at_time
+
+class PendingOrder:
+    """已接收但尚未写入业务库的订单，属性与 Order 一致；写入失败的订单状态为 failed"""
+
+    def __init__(self, entry, customer, restaurant, dishes):
+        self.id = entry['order_id']
+        self.user_id = entry['user_id']
+        self.restaurant_id = entry['restaurant_id']
+        self.total_amount = entry['total_amount']
+        self.status = 'failed' if entry.get('state') == 'failed' else 'paid'
+        self.remarks = entry['remarks']
+        self.created_at = datetime.fromisoformat(entry['created_at'])
+        self.paid_at = None
+        self.customer = customer
+        self.restaurant = restaurant
+        self.items = [
+            PendingOrderItem(dishes[item['dish_id']], item['quantity'], item['price'])
+            for item in entry['items'] if item['dish_id'] in dishes
+        ]
+
+    @property
+    def local_created_at(self):
+        return self.created_at + timedelta(hours=8)
+
+    @property
+    def local_paid_at(self):
+        return None
+
+def _commit_entries(entries):
+    """
+    把一批队列订单写入业务库并提交（一个事务）
+    :return: 实际写入的订单ID列表
+    """
+    order_ids = [entry['order_id'] for entry in entries]
+
+    # 上次提交后、标记队列前中断的订单已经在业务库中
+    existing = {
+        row[0] for row in db.session.query(Order.id).filter(Order.id.in_(order_ids)).all()
+    }
+    entries = [entry for entry in entries if entry['order_id'] not in existing]
+    if not entries:
+        return []
+
+    db.session.execute(db.insert(Order), [{
+        'id': entry['order_id'],
+        'user_id': entry['user_id'],
+        'restaurant_id': entry['restaurant_id'],
+        'total_amount': entry['total_amount'],
+        'status': 'paid',
+        'created_at': datetime.fromisoformat(entry['created_at']),
+        'remarks': entry['remarks']
+    } for entry in entries])
+
+    db.session.execute(db.insert(OrderItem), [{
+        'order_id': entry['order_id'],
+        'dish_id': item['dish_id'],
+        'quantity': item['quantity'],
+        'price_at_time': item['price']
+    } for entry in entries for item in entry['items']])
+
+    # 菜品被点次数和餐厅销售额按批聚合，各用一条 executemany 更新
+    dish_quantities = {}
+    restaurant_sales = {}
+    for entry in entries:
+        restaurant_sales[entry['restaurant_id']] = restaurant_sales.get(entry['restaurant_id'], 0.0) + entry['total_amount']
+        for item in entry['items']:
+            dish_quantities[item['dish_id']] = dish_quantities.get(item['dish_id'], 0) + item['quantity']
+
+    dish_table = Dish.__table__
+    db.session.execute(
+        dish_table.update()
+        .where(dish_table.c.id == bindparam('b_dish_id'))
+        .values(order_count=func.coalesce(dish_table.c.order_count, 0) + bindparam('b_quantity')),
+        [{'b_dish_id': dish_id, 'b_quantity': quantity} for dish_id, quantity in dish_quantities.items()]
+    )
+    restaurant_table = Restaurant.__table__
+    db.session.execute(
+        restaurant_table.update()
+        .where(restaurant_table.c.id == bindparam('b_restaurant_id'))
+        .values(total_sales=func.coalesce(restaurant_table.c.total_sales, 0) + bindparam('b_amount')),
+        [{'b_restaurant_id': restaurant_id, 'b_amount': amount} for restaurant_id, amount in restaurant_sales.items()]
+    )
+
+    # 幂等键随订单写入业务库，队列记录清理后重试仍能得到同一结果
+    keyed = [entry for entry in entries if entry['idempotency_key']]
+    if keyed:
+        db.session.execute(db.insert(IdempotencyKey), [{
+            'user_id': entry['user_id'],
+            'key': entry['idempotency_key'],
+            'fingerprint': entry['fingerprint'],
+            'status_code': 200,
+            'response': json.dumps(dict(entry['response'], order_id=entry['order_id']), ensure_ascii=False),
+            'created_at': datetime.fromisoformat(entry['created_at'])
+        } for entry in keyed])
+
+    db.session.commit()
+    return [entry['order_id'] for entry in entries]
+
+def _after_commit(order_ids):
+    """提交后更新排行缓存并推送新订单"""
+    from app.services.order_events import order_events
+    from app.services.restaurant_ranking import restaurant_ranking
+
+    orders = Order.query.options(joinedload(Order.customer)).filter(Order.id.in_(order_ids)).all()
+    for restaurant in Restaurant.query.filter(Restaurant.id.in_({order.restaurant_id for order in orders})).all():
+        restaurant_ranking.record_sale(restaurant)
+    for order in orders:
+        order_events.publish_order(order, 'order_created')
+
+class OrderIngest:
+    """订单写入服务 - direct 模式下不做任何事，由结算直接写入业务库"""
+
+    def __init__(self):
+        self._writers = {}
+        self._flush_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if app.config.get('ORDER_INGEST_MODE', 'direct') != 'queue':
+            return
+        max_lag = app.config.get('ORDER_INGEST_MAX_LAG', 2.0)
+        order_queue = OrderQueue(
+            app.config['ORDER_INGEST_QUEUE_PATH'],
+            lease_seconds=max(30, max_lag * 10)
+        )
+        app.extensions['order_queue'] = order_queue
+        # 上次退出时还有积压订单，启动写入线程
+        if order_queue.oldest_pending_age():
+            self._ensure_writer(app)
+
+    @property
+    def enabled(self):
+        return 'order_queue' in current_app.extensions
+
+    @property
+    def queue(self):
+        return current_app.extensions['order_queue']
+
+    def _ensure_writer(self, app):
+        with self._lock:
+            writer = self._writers.get(id(app))
+            if writer and writer.is_alive():
+                return
+            writer = threading.Thread(target=self._run_writer, args=(app,), name='order-ingest-writer', daemon=True)
+            self._writers[id(app)] = writer
+            writer.start()
+
+    def _run_writer(self, app):
+        interval = max(app.config.get('ORDER_INGEST_MAX_LAG', 2.0) / 2, 0.05)
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    app.logger.error('订单队列写入失败: %s', e)
+                finally:
+                    db.session.remove()
+
+    @staticmethod
+    def _reserve_ids():
+        """从业务库的订单号序列预留一段订单号（独立的短事务，立即提交）"""
+        count = current_app.config.get('ORDER_INGEST_ID_BLOCK', 100)
+        with db.engine.begin() as connection:
+            return OrderIdSequence.allocate(connection, count), count
+
+    def enqueue(self, user_id, restaurant_id, cart_items, remarks, idempotency_key=None, fingerprint=None):
+        """
+        订单入队并返回结算结果
+        :param cart_items: cart_service.resolve() 解析出的有效购物车项
+        同一幂等键已入队时返回 None，由调用方返回首次结果
+        """
+        items = [{
+            'dish_id': line['dish'].id,
+            'quantity': line['quantity'],
+            'price': line['price']
+        } for line in cart_items]
+        total_amount = sum(item['price'] * item['quantity'] for item in items)
+        entry = {
+            'user_id': user_id,
+            'restaurant_id': restaurant_id,
+            'total_amount': total_amount,
+            'remarks': remarks,
+            'created_at': datetime.utcnow().isoformat(),
+            'items': items
+        }
+        entry['response'] = {
+            'success': True,
+            'order_id': None,
+            'total_amount': total_amount,
+            'message': '下单成功！感谢您的订购。'
+        }
+
+        queue = self.queue
+        try:
+            order_id = queue.append(user_id, restaurant_id, entry, self._reserve_ids,
+                                    idempotency_key, fingerprint)
+        except sqlite3.IntegrityError:
+            if idempotency_key:
+                return None
+            raise
+
+        self._ensure_writer(current_app._get_current_object())
+        # 写入线程跟不上时由当前请求提交一次，积压不超过最大延迟
+        if queue.oldest_pending_age() > current_app.config.get('ORDER_INGEST_MAX_LAG', 2.0):
+            self.flush()
+
+        return dict(entry['response'], order_id=order_id)
+
+    def find_by_key(self, user_id, key):
+        """按幂等键查找队列中的订单，返回 (请求摘要, 结算结果, HTTP状态码) 或 None"""
+        found = self.queue.find_by_key(user_id, key)
+        if not found:
+            return None
+        fingerprint, entry = found
+        if entry['state'] == 'failed':
+            return fingerprint, {
+                'success': False,
+                'order_id': entry['order_id'],
+                'message': '下单失败：订单未能提交到餐厅，请重新下单'
+            }, 500
+        return fingerprint, dict(entry['response'], order_id=entry['order_id']), 200
+
+    def get_pending_order(self, order_id):
+        """读取尚未写入业务库的订单，没有返回 None"""
+        if not self.enabled:
+            return None
+        entry = self.queue.get(order_id)
+        if not entry:
+            return None
+        customer = db.session.get(User, entry['user_id'])
+        restaurant = db.session.get(Restaurant, entry['restaurant_id'])
+        dish_ids = [item['dish_id'] for item in entry['items']]
+        dishes = {dish.id: dish for dish in Dish.query.filter(Dish.id.in_(dish_ids)).all()}
+        return PendingOrder(entry, customer, restaurant, dishes)
+
+    def flush(self):
+        """
+        把积压的订单批量写入业务库
+        :return: 写入的订单数（其他写入者正在写入时返回 0）
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        queue = self.queue
+        try:
+            if not queue.acquire_lease():
+                return 0
+            batch_size = current_app.config.get('ORDER_INGEST_BATCH_SIZE', 200)
+            written = 0
+            try:
+                while True:
+                    entries = queue.pending(batch_size)
+                    if not entries:
+                        break
+                    committed_ids = self._commit_batch(entries)
+                    written += len(committed_ids)
+                    queue.acquire_lease()
+                queue.prune(current_app.config.get('ORDER_INGEST_RETENTION', 600))
+            finally:
+                queue.release_lease()
+            return written
+        finally:
+            self._flush_lock.release()
+
+    def _commit_batch(self, entries):
+        queue = self.queue
+        try:
+            committed_ids = _commit_entries(entries)
+        except Exception as e:
+            db.session.rollback()
+            if len(entries) == 1:
+                # 单个订单也无法写入，标记失败，避免阻塞后续订单
+                current_app.logger.error('订单 %s 写入失败: %s', entries[0]["order_id"], e)
+                queue.mark([entries[0]['order_id']], 'failed')
+                self._notify_failed(entries[0]['order_id'])
+                return []
+            # 整批失败时逐个重试，找出有问题的订单
+            committed_ids = []
+            for entry in entries:
+                committed_ids.extend(self._commit_batch([entry]))
+            return committed_ids
+
+        queue.mark([entry['order_id'] for entry in entries], 'committed')
+        if committed_ids:
+            _after_commit(committed_ids)
+        return committed_ids
+
+    def _notify_failed(self, order_id):
+        """通知正在查看订单页的顾客：订单提交失败（商家从未收到这个订单，不通知商家）"""
+        from app.services.order_events import order_events
+
+        order = self.get_pending_order(order_id)
+        if order:
+            order_events.publish_order(order, 'status_changed', notify_restaurant=False)
+
+# 创建全局实例
+order_ingest = OrderIngest()
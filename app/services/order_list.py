@@ -0,0 +1,87 @@
+"""
+订单列表模块 - 订单管理页面的状态统计和键集分页
+
+各状态订单数用一次 GROUP BY 查询得到；列表按 (created_at, id) 降序
+键集分页，翻到再深的页也只扫描索引上的一小段，不使用 OFFSET。
+"""
+from datetime import datetime
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Order
+from app.services.keyset import encode_cursor, decode_cursor
+from app.services.order_status import VALID_STATUSES
+
+def count_by_status(restaurant_id):
+    """各状态订单数 {'all': n, 'pending': n, 'paid': n, 'completed': n, 'cancelled': n}"""
+    counts = {status: 0 for status in VALID_STATUSES}
+    rows = db.session.query(Order.status, func.count(Order.id)).filter(
+        Order.restaurant_id == restaurant_id
+    ).group_by(Order.status).all()
+    for status, count in rows:
+        counts[status] = counts.get(status, 0) + count
+    counts['all'] = sum(count for _, count in rows)
+    return counts
+
+def _decode_position(cursor):
+    values = decode_cursor(cursor, 2) if cursor else None
+    try:
+        return datetime.fromisoformat(values[0]), int(values[1])
+    except (TypeError, ValueError):
+        return None
+
+class OrderPage:
+    """一页订单及前后翻页游标"""
+
+    def __init__(self, items, prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+def fetch_orders_page(restaurant_id, status='all', after=None, before=None, per_page=15):
+    """
+    按下单时间降序获取一页订单
+    :param after: 获取该游标之后（更早）的订单
+    :param before: 获取该游标之前（更新）的订单
+    """
+    query = Order.query.options(joinedload(Order.customer)).filter(Order.restaurant_id == restaurant_id)
+    if status != 'all':
+        query = query.filter(Order.status == status)
+
+    after_position = _decode_position(after)
+    before_position = None if after_position else _decode_position(before)
+
+    if before_position:
+        created_at, order_id = before_position
+        rows = query.filter(or_(
+            Order.created_at > created_at,
+            and_(Order.created_at == created_at, Order.id > order_id)
+        )).order_by(Order.created_at.asc(), Order.id.asc()).limit(per_page + 1).all()
+        has_newer = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_older = True
+    else:
+        if after_position:
+            created_at, order_id = after_position
+            query = query.filter(or_(
+                Order.created_at < created_at,
+                and_(Order.created_at == created_at, Order.id < order_id)
+            ))
+        rows = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(per_page + 1).all()
+        has_older = len(rows) > per_page
+        items = rows[:per_page]
+        has_newer = after_position is not None
+
+    if not items:
+        return OrderPage([])
+    prev_cursor = encode_cursor(items[0].created_at, items[0].id) if has_newer else None
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if has_older else None
+    return OrderPage(items, prev_cursor, next_cursor)
@@ -0,0 +1,80 @@
+"""
+订单状态模块 - 批量变更订单状态
+
+一次变更多个订单：一条集合 UPDATE 修改状态，订单变为已完成时再用一次
+聚合查询 + 一条 executemany 增加菜品被点次数。只有状态确实发生变化的
+订单才计入，同一订单重复标记完成不会重复累加。提交后向订阅者推送状态变化。
+"""
+from sqlalchemy import bindparam, func
+from app import db
+from sqlalchemy.orm import joinedload
+from app.models import Dish, Order, OrderItem
+from app.services.order_events import order_events
+
+VALID_STATUSES = ('pending', 'paid', 'completed', 'cancelled')
+
+class OrderStatusConflict(Exception):
+    """变更过程中订单状态被其他请求修改"""
+
+def transition_orders(restaurant_id, order_ids, new_status, retries=3):
+    """
+    把餐厅的一批订单改为 new_status 并提交
+    :return: 状态实际发生变化的订单ID列表
+    """
+    if new_status not in VALID_STATUSES:
+        raise ValueError('无效的订单状态')
+
+    order_ids = list(set(order_ids))
+    for _ in range(retries):
+        # 只处理属于该餐厅且状态不同的订单
+        changed_ids = [row[0] for row in db.session.query(Order.id).filter(
+            Order.id.in_(order_ids),
+            Order.restaurant_id == restaurant_id,
+            Order.status != new_status
+        ).all()]
+        if not changed_ids:
+            return []
+
+        try:
+            result = db.session.execute(
+                Order.__table__.update()
+                .where(Order.__table__.c.id.in_(changed_ids))
+                .where(Order.__table__.c.status != new_status)
+                .values(status=new_status)
+            )
+            # 查询和更新之间有订单被其他请求改过，重新计算
+            if result.rowcount != len(changed_ids):
+                raise OrderStatusConflict()
+
+            if new_status == 'completed':
+                increments = db.session.query(
+                    OrderItem.dish_id,
+                    func.sum(OrderItem.quantity)
+                ).filter(
+                    OrderItem.order_id.in_(changed_ids)
+                ).group_by(OrderItem.dish_id).all()
+                if increments:
+                    dish_table = Dish.__table__
+                    db.session.execute(
+                        dish_table.update()
+                        .where(dish_table.c.id == bindparam('b_dish_id'))
+                        .values(order_count=func.coalesce(dish_table.c.order_count, 0) + bindparam('b_quantity')),
+                        [{'b_dish_id': dish_id, 'b_quantity': quantity} for dish_id, quantity in increments]
+                    )
+
+            db.session.commit()
+            _publish_changes(changed_ids)
+            return changed_ids
+        except OrderStatusConflict:
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    raise OrderStatusConflict('订单状态正在被其他操作修改，请稍后重试')
+
+def _publish_changes(order_ids):
+    """推送状态变化"""
+    orders = Order.query.options(joinedload(Order.customer)).filter(Order.id.in_(order_ids)).all()
+    for order in orders:
+        order_events.publish_order(order, 'status_changed')
@@ -0,0 +1,198 @@
+"""
+请求性能分析模块 - 按需对单个请求做栈采样
+
+PROFILER_ENABLED 关闭时不注册任何请求钩子，没有额外开销。开启后以下请求会被分析：
+- 带签名令牌的请求：请求头 X-Profile-Token 或查询参数 _profile（令牌由店主的
+  “性能分析”页面生成，只对该餐厅的页面有效；运维可在 flask shell 中用
+  request_profiler.make_token() 生成对所有路由有效的令牌）
+- 按 PROFILER_SAMPLE_RATE 比例随机抽样的请求
+
+分析期间由后台线程每隔 PROFILER_INTERVAL 秒采集一次请求线程的调用栈，结束后写成
+collapsed stack 格式（每行 “根;…;叶 次数”，可用 speedscope.app 或 flamegraph.pl 打开），
+连同一份 JSON 元数据保存在 PROFILER_DIR，只保留最近 PROFILER_MAX_FILES 份。
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+PROFILE_NAME_PATTERN = re.compile(r'^[0-9]{8}-[0-9]{6}-[A-Za-z0-9._-]{1,64}$')
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class StackSampler(threading.Thread):
+    """定时采集指定线程的调用栈，按栈计数"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True, name='request-profiler')
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._labels = {}
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(_BASE_DIR):
+                filename = os.path.relpath(filename, _BASE_DIR)
+            elif 'site-packages' in filename:
+                filename = filename.split('site-packages' + os.sep, 1)[1]
+            label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+            self._labels[code] = label
+        return label
+
+class RequestProfiler:
+    """请求级栈采样分析"""
+
+    def init_app(self, app):
+        if not app.config.get('PROFILER_ENABLED'):
+            return
+        # gevent 模式下所有请求是同一线程中的协程，按线程采样看不到请求的调用栈
+        gevent_monkey = sys.modules.get('gevent.monkey')
+        if gevent_monkey and gevent_monkey.is_module_patched('threading'):
+            app.logger.warning('gevent 模式下不支持请求性能分析，已忽略 PROFILER_ENABLED')
+            return
+        os.makedirs(app.config['PROFILER_DIR'], exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish)
+
+    @staticmethod
+    def _serializer():
+        return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='request-profiler')
+
+    def make_token(self, restaurant_id=None):
+        """生成分析令牌；指定餐厅时只对该餐厅的页面有效"""
+        return self._serializer().dumps({'restaurant_id': restaurant_id})
+
+    def _token_allows(self, token):
+        try:
+            data = self._serializer().loads(token, max_age=current_app.config.get('PROFILER_TOKEN_MAX_AGE', 600))
+        except BadSignature:
+            return False
+        allowed = data.get('restaurant_id')
+        return allowed is None or allowed == (request.view_args or {}).get('restaurant_id')
+
+    def _start(self):
+        token = request.headers.get('X-Profile-Token') or request.args.get('_profile')
+        if token and self._token_allows(token):
+            trigger = 'token'
+        elif random.random() < current_app.config.get('PROFILER_SAMPLE_RATE', 0.0):
+            trigger = 'sample'
+        else:
+            return
+
+        sampler = StackSampler(threading.get_ident(), current_app.config.get('PROFILER_INTERVAL', 0.005))
+        g.profiler = {'sampler': sampler, 'trigger': trigger, 'started': time.perf_counter()}
+        sampler.start()
+
+    @staticmethod
+    def _record_status(response):
+        if 'profiler' in g:
+            g.profiler['status'] = response.status_code
+        return response
+
+    def _finish(self, exc):
+        profile = g.pop('profiler', None)
+        if profile is None:
+            return
+        duration = time.perf_counter() - profile['started']
+        sampler = profile['sampler']
+        sampler.stop()
+        try:
+            self._write(sampler, profile, duration)
+        except OSError as e:
+            current_app.logger.warning('保存性能分析结果失败: %s', e)
+
+    def _write(self, sampler, profile, duration):
+        directory = current_app.config['PROFILER_DIR']
+        request_id = g.get('request_id') or uuid.uuid4().hex
+        name = f'{datetime.now():%Y%m%d-%H%M%S}-{request_id}'
+        with open(os.path.join(directory, name + '.collapsed'), 'w', encoding='utf-8') as f:
+            for stack, count in sampler.counts.most_common():
+                f.write(f'{stack} {count}\n')
+
+        meta = {
+            'name': name,
+            'time': datetime.utcnow().isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'restaurant_id': (request.view_args or {}).get('restaurant_id'),
+            'status': profile.get('status', 500),
+            'duration_ms': round(duration * 1000, 1),
+            'samples': sum(sampler.counts.values()),
+            'trigger': profile['trigger'],
+        }
+        with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        current_app.logger.info('已保存性能分析 %s (%s %.1fms)', name, request.path, duration * 1000)
+        self._rotate(directory)
+
+    @staticmethod
+    def _rotate(directory):
+        names = sorted(filename[:-5] for filename in os.listdir(directory) if filename.endswith('.json'))
+        for name in names[:-current_app.config.get('PROFILER_MAX_FILES', 100)]:
+            for suffix in ('.json', '.collapsed'):
+                try:
+                    os.remove(os.path.join(directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def recent(restaurant_id=None, limit=50):
+        """最近的分析记录（新的在前），可按餐厅过滤"""
+        directory = current_app.config['PROFILER_DIR']
+        if not os.path.isdir(directory):
+            return []
+        profiles = []
+        for filename in sorted(os.listdir(directory), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if restaurant_id is None or meta.get('restaurant_id') == restaurant_id:
+                profiles.append(meta)
+                if len(profiles) >= limit:
+                    break
+        return profiles
+
+    @staticmethod
+    def load(name):
+        """按名称读取一份分析的元数据，名称不合法或不存在时返回 None"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        try:
+            with open(os.path.join(current_app.config['PROFILER_DIR'], name + '.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+# 创建全局实例
+request_profiler = RequestProfiler()
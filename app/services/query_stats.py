@@ -0,0 +1,95 @@
+"""
+SQL统计模块 - 每个请求执行的SQL条数和数据库耗时
+
+基于 SQLAlchemy 的 before_cursor_execute / after_cursor_execute 事件：
+- 统计每个请求的SQL条数和数据库总耗时
+- 超过 SLOW_QUERY_THRESHOLD 毫秒的语句连同路由名记入慢查询日志
+- QUERY_STATS_HEADERS 开启时（调试/测试环境默认开启）在响应中加入
+  X-DB-Queries 和 Server-Timing 头，浏览器开发者工具里直接可见
+- QUERY_BUDGETS 为路由设置SQL条数上限；QUERY_BUDGET_ENFORCE 开启时
+  超出上限抛出 QueryBudgetExceeded（测试中直接失败），否则只记录警告
+"""
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+class QueryBudgetExceeded(Exception):
+    """请求执行的SQL条数超过了路由的预算"""
+
+class QueryStats:
+    """请求级SQL统计"""
+
+    def init_app(self, app):
+        with app.app_context():
+            for engine in db.engines.values():
+                if not event.contains(engine, 'before_cursor_execute', self._before_execute):
+                    event.listen(engine, 'before_cursor_execute', self._before_execute)
+                    event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # 开始时间记在本条语句的执行上下文上：语句出错时不会触发 after 事件，
+    # 记在连接上的值会残留在连接池的连接里
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @staticmethod
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_start', None)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        if not has_app_context():
+            return
+
+        endpoint = '-'
+        if has_request_context():
+            endpoint = request.endpoint or request.path
+            g.db_queries = g.get('db_queries', 0) + 1
+            g.db_time = g.get('db_time', 0.0) + elapsed
+
+        threshold = current_app.config.get('SLOW_QUERY_THRESHOLD', 200)
+        if threshold is not None and elapsed * 1000 >= threshold:
+            current_app.logger.warning('慢查询 %.1fms [%s] %s', elapsed * 1000, endpoint, ' '.join(statement.split()))
+
+    @staticmethod
+    def _start_request():
+        g.db_queries = 0
+        g.db_time = 0.0
+        g.request_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        queries = g.get('db_queries', 0)
+        db_time = g.get('db_time', 0.0)
+        config = current_app.config
+
+        if config.get('QUERY_STATS_HEADERS') or current_app.testing:
+            total = time.perf_counter() - g.get('request_started', time.perf_counter())
+            response.headers['X-DB-Queries'] = str(queries)
+            response.headers['Server-Timing'] = (
+                f'db;dur={db_time * 1000:.1f};desc="{queries} queries", app;dur={total * 1000:.1f}'
+            )
+
+        budget = self.budget_for(request.endpoint)
+        if budget is not None and queries > budget:
+            message = f'{request.endpoint} 执行了 {queries} 条SQL，超过预算 {budget}'
+            if config.get('QUERY_BUDGET_ENFORCE'):
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
+
+    @staticmethod
+    def budget_for(endpoint):
+        """路由的SQL条数上限，没有设置返回 None"""
+        budgets = current_app.config.get('QUERY_BUDGETS') or {}
+        return budgets.get(endpoint, current_app.config.get('QUERY_BUDGET_DEFAULT'))
+
+    @staticmethod
+    def current():
+        """当前请求到目前为止的 (SQL条数, 数据库耗时秒数)"""
+        return g.get('db_queries', 0), g.get('db_time', 0.0)
+
+# 创建全局实例
+query_stats = QueryStats()
@@ -0,0 +1,121 @@
+"""
+餐厅排行模块 - 餐厅列表的键集分页和销售额排行缓存
+
+餐厅列表按 (total_sales, id) 降序排列，翻页使用键集游标而不是
+OFFSET，数据量再大每一页也只扫描索引上的一小段。第一页（销售额
+前N名）缓存在进程内，下单时增量更新，其他变化（销售额减少、
+餐厅信息修改）直接让缓存失效，另有 RESTAURANT_RANKING_TTL 兜底，
+让多个worker之间的差异不会持续太久。
+"""
+import threading
+import time
+from flask import current_app
+from sqlalchemy import and_, or_
+from app.models import Restaurant
+from app.services.metrics import metrics
+from app.services.keyset import encode_cursor as _encode, decode_cursor as _decode
+
+def restaurant_to_dict(restaurant):
+    """餐厅列表展示需要的字段"""
+    return {
+        'id': restaurant.id,
+        'name': restaurant.name,
+        'description': restaurant.description,
+        'logo_path': restaurant.logo_path,
+        'total_sales': float(restaurant.total_sales or 0)
+    }
+
+def encode_cursor(item):
+    """把最后一条记录的 (total_sales, id) 编码为游标"""
+    return _encode(item['total_sales'], item['id'])
+
+def decode_cursor(cursor):
+    """解析游标，无效时返回 None"""
+    values = _decode(cursor, 2)
+    try:
+        return float(values[0]), int(values[1])
+    except (TypeError, ValueError):
+        return None
+
+def fetch_page(cursor=None, limit=12):
+    """
+    按销售额降序获取一页餐厅
+    :return: (餐厅字典列表, 下一页游标或None)
+    """
+    query = Restaurant.query
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        total_sales, restaurant_id = position
+        query = query.filter(or_(
+            Restaurant.total_sales < total_sales,
+            and_(Restaurant.total_sales == total_sales, Restaurant.id < restaurant_id)
+        ))
+
+    # 多取一条用于判断是否还有下一页
+    rows = query.order_by(Restaurant.total_sales.desc(), Restaurant.id.desc()).limit(limit + 1).all()
+    items = [restaurant_to_dict(r) for r in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
+
+class RestaurantRanking:
+    """销售额前N名餐厅缓存（即餐厅列表第一页）"""
+
+    def __init__(self):
+        self._items = None
+        self._has_more = False
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return current_app.config.get('RESTAURANTS_PER_PAGE', 12)
+
+    def _is_fresh(self):
+        ttl = current_app.config.get('RESTAURANT_RANKING_TTL', 60)
+        return self._items is not None and time.time() - self._loaded_at < ttl
+
+    def first_page(self):
+        """获取第一页 (餐厅字典列表, 下一页游标或None)"""
+        with self._lock:
+            if self._is_fresh():
+                metrics.count_cache('restaurant_ranking', True)
+                items = [dict(item) for item in self._items]
+                has_more = self._has_more
+                return items, encode_cursor(items[-1]) if has_more and items else None
+
+        metrics.count_cache('restaurant_ranking', False)
+        items, next_cursor = fetch_page(limit=self.size)
+        with self._lock:
+            self._items = [dict(item) for item in items]
+            self._has_more = next_cursor is not None
+            self._loaded_at = time.time()
+        return items, next_cursor
+
+    def record_sale(self, restaurant):
+        """下单后增量更新排行：只会上升，不需要重新查询"""
+        with self._lock:
+            if self._items is None:
+                return
+            entry = restaurant_to_dict(restaurant)
+            items = [item for item in self._items if item['id'] != entry['id']]
+            in_ranking = len(items) < len(self._items)
+
+            if not in_ranking and len(items) >= self.size:
+                # 不在前N名中，只有超过第N名才能进入排行
+                last = items[-1]
+                if (entry['total_sales'], entry['id']) <= (last['total_sales'], last['id']):
+                    return
+                items.pop()
+                self._has_more = True
+
+            items.append(entry)
+            items.sort(key=lambda item: (item['total_sales'], item['id']), reverse=True)
+            self._items = items
+
+    def invalidate(self):
+        """销售额减少或餐厅信息变化时，下次访问重新查询"""
+        with self._lock:
+            self._items = None
+
+# 创建全局实例
+restaurant_ranking = RestaurantRanking()
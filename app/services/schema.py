@@ -0,0 +1,35 @@
+"""
+数据库结构模块 - 建表和补建新列/新索引
+
+启动时不再执行：生产环境部署前运行一次 `flask --app run init-db`，
+开发环境可开启 SCHEMA_AUTO_UPGRADE 在 create_app 时自动执行。
+"""
+from flask import current_app
+from sqlalchemy import inspect, text
+from app import db
+
+def upgrade_schema():
+    """创建缺少的表，给已存在的表补建可为空的新列和新索引（需要在应用上下文中调用）"""
+    db.create_all()
+
+    # create_all 不会给已存在的表补建新列和新索引
+    added = []
+    for bind_key, metadata in db.metadatas.items():
+        engine = db.engines[bind_key]
+        inspector = inspect(engine)
+        preparer = engine.dialect.identifier_preparer
+        for table in metadata.sorted_tables:
+            existing_columns = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    with engine.begin() as conn:
+                        conn.execute(text(
+                            f'ALTER TABLE {preparer.quote(table.name)} '
+                            f'ADD COLUMN {preparer.quote(column.name)} {column_type}'
+                        ))
+                    added.append(f'{table.name}.{column.name}')
+                    current_app.logger.info('补建列: %s.%s', table.name, column.name)
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+    return added
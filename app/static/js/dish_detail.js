@@ -0,0 +1,243 @@
+// 页面数据（地址由模板写在 #pageData 上）
+const pageData = document.getElementById('pageData').dataset;
+
+// 当前正在询问的菜品ID
+let currentDishId = null;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // 加入我的餐桌按钮
+    const addToCartBtn = document.querySelector('.add-to-cart');
+    if (addToCartBtn) {
+        addToCartBtn.addEventListener('click', function() {
+            const dishId = this.dataset.dishId;
+            const dishName = this.dataset.dishName;
+            
+            fetch(pageData.addToCartUrl.replace('0', dishId), {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    quantity: 1
+                })
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    showToast('success', data.message);
+                    updateCartCount(data.cart_count || 0);
+                    
+                    // 修改按钮状态
+                    this.innerHTML = '<i class="bi bi-check"></i> 已添加';
+                    this.classList.remove('btn-success');
+                    this.classList.add('btn-outline-success');
+                    this.disabled = true;
+                    
+                    setTimeout(() => {
+                        this.innerHTML = '<i class="bi bi-plus-circle"></i> 加入我的餐桌';
+                        this.classList.remove('btn-outline-success');
+                        this.classList.add('btn-success');
+                        this.disabled = false;
+                    }, 2000);
+                } else {
+                    showToast('error', data.message || '添加失败');
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                showToast('error', '网络错误，请稍后重试');
+            });
+        });
+    }
+    
+    // 询问按钮
+    const askBtn = document.querySelector('.ask-question');
+    if (askBtn) {
+        askBtn.addEventListener('click', function() {
+            currentDishId = this.dataset.dishId;
+            const dishName = this.dataset.dishName;
+            
+            document.getElementById('askModalLabel').textContent = `咨询菜品：${dishName}`;
+            document.getElementById('aiAnswerArea').style.display = 'none';
+            document.getElementById('aiAnswerContent').innerHTML = '';
+            document.getElementById('questionText').value = `关于"${dishName}"这道菜，`;
+            document.getElementById('questionText').focus();
+        });
+    }
+    
+    // 提交问题按钮
+    document.getElementById('submitQuestion').addEventListener('click', function() {
+        const question = document.getElementById('questionText').value.trim();
+        
+        if (!question) {
+            showToast('warning', '请输入问题');
+            return;
+        }
+        
+        if (!currentDishId) {
+            showToast('error', '菜品信息错误');
+            return;
+        }
+        
+        document.getElementById('loadingIndicator').style.display = 'block';
+        document.getElementById('aiAnswerArea').style.display = 'none';
+        this.disabled = true;
+        
+        fetch(pageData.askQuestionUrl.replace('0', currentDishId), {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                question: question
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            document.getElementById('loadingIndicator').style.display = 'none';
+            this.disabled = false;
+            
+            if (data.success) {
+                const answerArea = document.getElementById('aiAnswerArea');
+                const answerContent = document.getElementById('aiAnswerContent');
+                
+                let formattedAnswer = data.answer.replace(/\n/g, '<br>');
+                
+                // 优化AI回答显示：如果回答过长，只显示前500个字符
+                if (formattedAnswer.length > 500 && !data.is_fallback) {
+                    // 截断过长的回答
+                    const shortAnswer = formattedAnswer.substring(0, 500) + '...';
+                    const fullAnswer = formattedAnswer;
+                    
+                    // 创建显示完整回答的按钮
+                    const showMoreButton = document.createElement('button');
+                    showMoreButton.className = 'btn btn-sm btn-link p-0 mt-2';
+                    showMoreButton.innerHTML = '<i class="bi bi-chevron-down"></i> 查看完整回答';
+                    showMoreButton.style.fontSize = '0.875rem';
+                    
+                    if (data.is_fallback) {
+                        answerContent.innerHTML = `
+                            <div class="alert alert-warning mb-2">
+                                <i class="bi bi-exclamation-triangle"></i> 当前为备选回答
+                            </div>
+                            ${shortAnswer}
+                        `;
+                    } else {
+                        answerContent.innerHTML = shortAnswer;
+                    }
+                    
+                    // 添加显示完整回答的按钮
+                    if (!data.is_fallback) {
+                        answerContent.appendChild(showMoreButton);
+                    }
+                    
+                    showMoreButton.addEventListener('click', function() {
+                        if (data.is_fallback) {
+                            answerContent.innerHTML = `
+                                <div class="alert alert-warning mb-2">
+                                    <i class="bi bi-exclamation-triangle"></i> 当前为备选回答
+                                </div>
+                                ${fullAnswer}
+                            `;
+                        } else {
+                            answerContent.innerHTML = fullAnswer;
+                        }
+                        this.remove();
+                    });
+                } else {
+                    if (data.is_fallback) {
+                        answerContent.innerHTML = `
+                            <div class="alert alert-warning mb-2">
+                                <i class="bi bi-exclamation-triangle"></i> 当前为备选回答
+                            </div>
+                            ${formattedAnswer}
+                        `;
+                    } else {
+                        answerContent.innerHTML = formattedAnswer;
+                    }
+                }
+                
+                answerArea.style.display = 'block';
+                answerArea.scrollIntoView({ behavior: 'smooth', block: 'start' });
+            } else {
+                showToast('error', data.message || 'AI服务暂时不可用');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            document.getElementById('loadingIndicator').style.display = 'none';
+            this.disabled = false;
+            showToast('error', '网络错误，请稍后重试');
+        });
+    });
+    
+    // 模态框关闭时重置
+    document.getElementById('askModal').addEventListener('hidden.bs.modal', function () {
+        currentDishId = null;
+        document.getElementById('loadingIndicator').style.display = 'none';
+        document.getElementById('aiAnswerArea').style.display = 'none';
+        document.getElementById('aiAnswerContent').innerHTML = '';
+        document.getElementById('questionText').value = '';
+        document.getElementById('submitQuestion').disabled = false;
+    });
+});
+
+// Toast消息函数
+function showToast(type, message) {
+    let toastContainer = document.getElementById('toastContainer');
+    if (!toastContainer) {
+        toastContainer = document.createElement('div');
+        toastContainer.id = 'toastContainer';
+        toastContainer.className = 'toast-container position-fixed bottom-0 end-0 p-3';
+        document.body.appendChild(toastContainer);
+    }
+    
+    const toastId = 'toast-' + Date.now();
+    const toast = document.createElement('div');
+    toast.id = toastId;
+    toast.className = 'toast align-items-center text-white bg-' + (type === 'success' ? 'success' : 
+                       type === 'error' ? 'danger' : 
+                       type === 'warning' ? 'warning' : 'info') + ' border-0';
+    toast.setAttribute('role', 'alert');
+    toast.setAttribute('aria-live', 'assertive');
+    toast.setAttribute('aria-atomic', 'true');
+    
+    toast.innerHTML = `
+        <div class="d-flex">
+            <div class="toast-body">
+                <i class="bi bi-${type === 'success' ? 'check-circle' : 
+                               type === 'error' ? 'exclamation-circle' : 
+                               type === 'warning' ? 'exclamation-triangle' : 'info-circle'} me-2"></i>
+                ${message}
+            </div>
+            <button type="button" class="btn-close btn-close-white me-2 m-auto" data-bs-dismiss="toast"></button>
+        </div>
+    `;
+    
+    toastContainer.appendChild(toast);
+    const bsToast = new bootstrap.Toast(toast, { delay: 3000 });
+    bsToast.show();
+    
+    toast.addEventListener('hidden.bs.toast', function () {
+        toast.remove();
+    });
+}
+
+// 更新购物车数量
+function updateCartCount(count) {
+    document.querySelectorAll('.badge.bg-danger').forEach(badge => {
+        if (badge.textContent.trim() === String(count) || 
+            badge.closest('.nav-link')?.href.includes('my-table') ||
+            badge.closest('.dropdown-item')?.href.includes('my-table')) {
+            badge.textContent = count;
+        }
+    });
+    
+    document.querySelectorAll('.badge.bg-danger').forEach(badge => {
+        if (count === 0 && badge.parentElement) {
+            badge.style.display = 'none';
+        } else if (count > 0 && badge.parentElement) {
+            badge.style.display = 'inline-block';
+        }
+    });
+}
@@ -0,0 +1,463 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 页面数据（金额和地址由模板写在 #pageData 上）
+    const pageData = document.getElementById('pageData').dataset;
+    // 初始化总价
+    let currentTotal = parseFloat(pageData.totalPrice);
+    
+    // 待提交的数量修改 {dishId: 目标数量}，连续点击会合并成一次批量请求
+    const pendingQuantities = {};
+    let cartFlushTimer = null;
+    const CART_FLUSH_DELAY = 400;
+    
+    // 数量减少按钮
+    document.querySelectorAll('.quantity-minus').forEach(button => {
+        button.addEventListener('click', function() {
+            const dishId = this.dataset.dishId;
+            const currentQuantity = parseInt(this.dataset.currentQuantity);
+            
+            if (currentQuantity > 1) {
+                updateQuantity(dishId, currentQuantity - 1);
+            } else {
+                // 如果数量为1，点击减号会弹出确认删除
+                if (confirm('确定要移除这个菜品吗？')) {
+                    updateQuantity(dishId, 0);
+                }
+            }
+        });
+    });
+    
+    // 数量增加按钮
+    document.querySelectorAll('.quantity-plus').forEach(button => {
+        button.addEventListener('click', function() {
+            const dishId = this.dataset.dishId;
+            const currentQuantity = parseInt(this.dataset.currentQuantity);
+            updateQuantity(dishId, currentQuantity + 1);
+        });
+    });
+    
+    // 删除菜品按钮
+    document.querySelectorAll('.remove-item').forEach(button => {
+        button.addEventListener('click', function() {
+            const dishId = this.dataset.dishId;
+            const dishName = this.dataset.dishName;
+            
+            if (confirm(`确定要删除 "${dishName}" 吗？`)) {
+                updateQuantity(dishId, 0);
+            }
+        });
+    });
+    
+    // 更新数量函数：先在页面上立即生效，再合并提交到服务器
+    function updateQuantity(dishId, quantity) {
+        pendingQuantities[dishId] = quantity;
+        updateCartDisplay(dishId, quantity);
+        
+        if (quantity <= 0) {
+            removeRow(dishId);
+        }
+        
+        currentTotal = calculateLocalTotal();
+        updateTotalDisplay(currentTotal);
+        
+        clearTimeout(cartFlushTimer);
+        cartFlushTimer = setTimeout(flushQuantities, CART_FLUSH_DELAY);
+    }
+    
+    // 把累积的数量修改一次性提交到批量接口
+    function flushQuantities() {
+        cartFlushTimer = null;
+        const operations = Object.keys(pendingQuantities).map(dishId => ({
+            op: pendingQuantities[dishId] > 0 ? 'update' : 'remove',
+            dish_id: parseInt(dishId),
+            quantity: pendingQuantities[dishId]
+        }));
+        Object.keys(pendingQuantities).forEach(dishId => delete pendingQuantities[dishId]);
+        if (operations.length === 0) {
+            return Promise.resolve();
+        }
+        
+        return fetch(pageData.batchUpdateUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                operations: operations
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // 以服务器返回的汇总为准
+                updateCartCount(data.cart_count || 0);
+                
+                const totalQuantityElement = document.getElementById('total-quantity');
+                if (totalQuantityElement) {
+                    totalQuantityElement.textContent = data.cart_count;
+                }
+                
+                // 如果期间没有新的修改，使用服务器计算的总价
+                if (Object.keys(pendingQuantities).length === 0) {
+                    currentTotal = data.total_price || 0;
+                    updateTotalDisplay(currentTotal);
+                }
+                
+                showToast('success', '已更新数量');
+            } else {
+                // 服务器拒绝了这批修改，重新加载以恢复一致
+                showToast('error', data.message || '更新失败');
+                setTimeout(() => window.location.reload(), 1500);
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showToast('error', '网络错误，请稍后重试');
+        });
+    }
+    
+    // 移除菜品行
+    function removeRow(dishId) {
+        const row = document.getElementById(`dish-row-${dishId}`);
+        if (row) {
+            row.style.opacity = '0';
+            setTimeout(() => {
+                row.remove();
+                updateEmptyState();
+            }, 300);
+        }
+    }
+    
+    // 根据页面上的数量计算总价
+    function calculateLocalTotal() {
+        let total = 0;
+        document.querySelectorAll('tbody tr').forEach(row => {
+            const priceCell = row.querySelector('.text-success');
+            const quantityInput = row.querySelector('.quantity-input');
+            if (priceCell && quantityInput) {
+                total += parseFloat(priceCell.textContent.replace('¥', '')) * parseInt(quantityInput.value);
+            }
+        });
+        return total;
+    }
+    
+    // 更新购物车显示
+    function updateCartDisplay(dishId, quantity) {
+        // 更新数量输入框
+        const quantityInput = document.querySelector(`.quantity-input[data-dish-id="${dishId}"]`);
+        if (quantityInput) {
+            quantityInput.value = quantity;
+        }
+        
+        // 更新按钮的当前数量
+        const minusBtn = document.querySelector(`.quantity-minus[data-dish-id="${dishId}"]`);
+        const plusBtn = document.querySelector(`.quantity-plus[data-dish-id="${dishId}"]`);
+        if (minusBtn) minusBtn.dataset.currentQuantity = quantity;
+        if (plusBtn) plusBtn.dataset.currentQuantity = quantity;
+        
+        // 更新小计
+        const row = document.getElementById(`dish-row-${dishId}`);
+        if (row) {
+            const priceCell = row.querySelector('.text-success');
+            if (priceCell) {
+                const priceText = priceCell.textContent.replace('¥', '');
+                const price = parseFloat(priceText);
+                const itemTotal = price * quantity;
+                const itemTotalElement = document.getElementById(`item-total-${dishId}`);
+                if (itemTotalElement) {
+                    itemTotalElement.textContent = `¥${itemTotal.toFixed(2)}`;
+                }
+            }
+        }
+        
+        // 更新总数量
+        let totalQuantity = 0;
+        document.querySelectorAll('.quantity-input').forEach(input => {
+            totalQuantity += parseInt(input.value) || 0;
+        });
+        const totalQuantityElement = document.getElementById('total-quantity');
+        if (totalQuantityElement) {
+            totalQuantityElement.textContent = totalQuantity;
+        }
+    }
+    
+    // 更新总价显示
+    function updateTotalDisplay(totalPrice) {
+        const subtotalElement = document.getElementById('subtotal');
+        const totalPriceElement = document.getElementById('total-price');
+        const checkoutBtn = document.querySelector('.checkout-btn');
+        
+        if (subtotalElement) subtotalElement.textContent = `¥${totalPrice.toFixed(2)}`;
+        if (totalPriceElement) totalPriceElement.textContent = `¥${totalPrice.toFixed(2)}`;
+        
+        // 更新支付按钮
+        if (checkoutBtn) {
+            const btnText = checkoutBtn.innerHTML;
+            const newText = btnText.replace(/¥[\d.]+/, `¥${totalPrice.toFixed(2)}`);
+            checkoutBtn.innerHTML = newText;
+            
+            // 如果没有商品，禁用按钮
+            if (totalPrice <= 0) {
+                checkoutBtn.disabled = true;
+            } else {
+                checkoutBtn.disabled = false;
+            }
+        }
+    }
+    
+    // 更新空状态
+    function updateEmptyState() {
+        const tbody = document.querySelector('tbody');
+        if (tbody && tbody.children.length === 0) {
+            // 如果表格为空，提交修改后重定向到空购物车状态
+            clearTimeout(cartFlushTimer);
+            flushQuantities().then(() => window.location.reload());
+        }
+    }
+    
+    // 离开页面前提交尚未发送的修改
+    window.addEventListener('pagehide', function() {
+        const operations = Object.keys(pendingQuantities).map(dishId => ({
+            op: pendingQuantities[dishId] > 0 ? 'update' : 'remove',
+            dish_id: parseInt(dishId),
+            quantity: pendingQuantities[dishId]
+        }));
+        if (operations.length > 0 && navigator.sendBeacon) {
+            navigator.sendBeacon(pageData.batchUpdateUrl,
+                new Blob([JSON.stringify({ operations: operations })], { type: 'application/json' }));
+        }
+    });
+    
+    // 结算按钮点击事件
+    const checkoutBtn = document.querySelector('.checkout-btn');
+    if (checkoutBtn) {
+        checkoutBtn.addEventListener('click', function() {
+            if (currentTotal <= 0) {
+                showToast('warning', '请先添加菜品');
+                return;
+            }
+            
+            // 获取订单备注
+            const remarks = document.getElementById('order-remarks').value.trim();
+            
+            // 准备结算模态框
+            prepareCheckoutModal(remarks);
+            
+            // 显示结算确认模态框
+            const checkoutModal = new bootstrap.Modal(document.getElementById('checkoutModal'));
+            checkoutModal.show();
+        });
+    }
+    
+    // 准备结算模态框
+    function prepareCheckoutModal(remarks) {
+        const checkoutItemsList = document.getElementById('checkout-items-list');
+        const checkoutQuantity = document.getElementById('checkout-quantity');
+        const checkoutTotal = document.getElementById('checkout-total');
+        
+        // 清空现有内容
+        checkoutItemsList.innerHTML = '';
+        
+        // 从DOM获取购物车数据
+        const cartData = {};
+        let totalQuantity = 0;
+        let totalPrice = 0;
+        
+        document.querySelectorAll('tbody tr').forEach(row => {
+            const dishId = row.id.replace('dish-row-', '');
+            const dishName = row.querySelector('h6') ? row.querySelector('h6').textContent : '菜品';
+            const priceCell = row.querySelector('.text-success');
+            const quantityInput = row.querySelector('.quantity-input');
+            
+            if (priceCell && quantityInput) {
+                const priceText = priceCell.textContent.replace('¥', '');
+                const price = parseFloat(priceText);
+                const quantity = parseInt(quantityInput.value);
+                
+                if (quantity > 0) {
+                    const itemTotal = price * quantity;
+                    totalQuantity += quantity;
+                    totalPrice += itemTotal;
+                    
+                    const row = document.createElement('tr');
+                    row.innerHTML = `
+                        <td>${dishName}</td>
+                        <td class="text-end">×${quantity}</td>
+                        <td class="text-end text-success">¥${itemTotal.toFixed(2)}</td>
+                    `;
+                    checkoutItemsList.appendChild(row);
+                }
+            }
+        });
+        
+        // 更新总计
+        checkoutQuantity.textContent = totalQuantity;
+        checkoutTotal.textContent = `¥${totalPrice.toFixed(2)}`;
+    }
+    
+    // 结算幂等键：同一次结算的重试使用同一个键，服务器不会重复下单
+    let checkoutKey = null;
+    const CHECKOUT_TIMEOUT = 10000;
+    const CHECKOUT_ATTEMPTS = 3;
+    
+    function newCheckoutKey() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    }
+    
+    // 发送结算请求，超时或网络错误时用同一个幂等键重试
+    function postCheckout(payload, attempt = 1) {
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), CHECKOUT_TIMEOUT);
+        return fetch(pageData.checkoutUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Idempotency-Key': checkoutKey
+            },
+            body: JSON.stringify(payload),
+            signal: controller.signal
+        })
+        .then(response => {
+            clearTimeout(timer);
+            if (response.status >= 500 && attempt < CHECKOUT_ATTEMPTS) {
+                return postCheckout(payload, attempt + 1);
+            }
+            return response.json();
+        }, error => {
+            clearTimeout(timer);
+            if (attempt < CHECKOUT_ATTEMPTS) {
+                return postCheckout(payload, attempt + 1);
+            }
+            throw error;
+        });
+    }
+    
+    // 确认付款按钮
+    document.getElementById('confirm-checkout').addEventListener('click', function() {
+        const remarks = document.getElementById('order-remarks').value.trim();
+        
+        // 显示加载状态
+        this.disabled = true;
+        this.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> 处理中...';
+        
+        // 先提交尚未发送的数量修改，再发送结算请求，包含备注
+        clearTimeout(cartFlushTimer);
+        if (!checkoutKey) {
+            checkoutKey = newCheckoutKey();
+        }
+        flushQuantities()
+        .then(() => postCheckout({
+            remarks: remarks
+        }))
+        .then(data => {
+            if (data.success) {
+                // 关闭结算确认模态框
+                bootstrap.Modal.getInstance(document.getElementById('checkoutModal')).hide();
+                
+                // 更新成功模态框信息
+                document.getElementById('success-order-id').textContent = `#${data.order_id}`;
+                document.getElementById('success-order-amount').textContent = `¥${data.total_amount.toFixed(2)}`;
+                
+                // 设置当前时间
+                const now = new Date();
+                const timeString = now.getFullYear() + '-' + 
+                    String(now.getMonth() + 1).padStart(2, '0') + '-' + 
+                    String(now.getDate()).padStart(2, '0') + ' ' + 
+                    String(now.getHours()).padStart(2, '0') + ':' + 
+                    String(now.getMinutes()).padStart(2, '0') + ':' + 
+                    String(now.getSeconds()).padStart(2, '0');
+                document.getElementById('success-order-time').textContent = timeString;
+                
+                // 显示成功模态框
+                const successModal = new bootstrap.Modal(document.getElementById('successModal'));
+                successModal.show();
+                
+                // 更新购物车数量
+                updateCartCount(0);
+            } else {
+                // 服务器明确拒绝，下次结算使用新的幂等键
+                checkoutKey = null;
+                showToast('error', data.message || '付款失败');
+                this.disabled = false;
+                this.innerHTML = '确认付款';
+                // 失效的菜品已从购物车移除，刷新页面显示新的金额
+                if (data.stale_dish_ids) {
+                    setTimeout(() => window.location.reload(), 1500);
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showToast('error', '网络错误，请稍后重试');
+            this.disabled = false;
+            this.innerHTML = '确认付款';
+        });
+    });
+    
+    // 成功模态框关闭后重定向
+    document.getElementById('successModal').addEventListener('hidden.bs.modal', function () {
+        window.location.href = pageData.dashboardUrl;
+    });
+    
+    // 更新购物车数量显示
+    function updateCartCount(count) {
+        document.querySelectorAll('.badge.bg-danger').forEach(badge => {
+            if (badge.textContent.trim() === String(count) || 
+                badge.closest('.nav-link')?.href.includes('my-table') ||
+                badge.closest('.dropdown-item')?.href.includes('my-table')) {
+                badge.textContent = count;
+            }
+        });
+        
+        document.querySelectorAll('.badge.bg-danger').forEach(badge => {
+            if (count === 0 && badge.parentElement) {
+                badge.style.display = 'none';
+            } else if (count > 0 && badge.parentElement) {
+                badge.style.display = 'inline-block';
+            }
+        });
+    }
+});
+
+// Toast消息函数
+function showToast(type, message) {
+    let toastContainer = document.getElementById('toastContainer');
+    if (!toastContainer) {
+        toastContainer = document.createElement('div');
+        toastContainer.id = 'toastContainer';
+        toastContainer.className = 'toast-container position-fixed bottom-0 end-0 p-3';
+        document.body.appendChild(toastContainer);
+    }
+    
+    const toastId = 'toast-' + Date.now();
+    const toast = document.createElement('div');
+    toast.id = toastId;
+    toast.className = 'toast align-items-center text-white bg-' + (type === 'success' ? 'success' : 
+                       type === 'error' ? 'danger' : 
+                       type === 'warning' ? 'warning' : 'info') + ' border-0';
+    toast.setAttribute('role', 'alert');
+    toast.setAttribute('aria-live', 'assertive');
+    toast.setAttribute('aria-atomic', 'true');
+    
+    toast.innerHTML = `
+        <div class="d-flex">
+            <div class="toast-body">
+                <i class="bi bi-${type === 'success' ? 'check-circle' : 
+                               type === 'error' ? 'exclamation-circle' : 
+                               type === 'warning' ? 'exclamation-triangle' : 'info-circle'} me-2"></i>
+                ${message}
+            </div>
+            <button type="button" class="btn-close btn-close-white me-2 m-auto" data-bs-dismiss="toast"></button>
+        </div>
+    `;
+    
+    toastContainer.appendChild(toast);
+    const bsToast = new bootstrap.Toast(toast, { delay: 3000 });
+    bsToast.show();
+    
+    toast.addEventListener('hidden.bs.toast', function () {
+        toast.remove();
+    });
+}
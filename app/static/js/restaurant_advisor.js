@@ -0,0 +1,67 @@
+function setQuestion(question) {
+    const questionInput = document.getElementById('question');
+    if (questionInput) {
+        questionInput.value = question;
+        questionInput.focus();
+    }
+}
+
+function copyAnswer() {
+    const answerElement = document.querySelector('.advisor-answer');
+    if (!answerElement) {
+        alert('没有可复制的内容');
+        return;
+    }
+    
+    const answerText = answerElement.innerText;
+    
+    if (navigator.clipboard && window.isSecureContext) {
+        navigator.clipboard.writeText(answerText).then(function() {
+            // 显示成功提示
+            const btn = document.querySelector('button[onclick="copyAnswer()"]');
+            if (btn) {
+                const originalHTML = btn.innerHTML;
+                btn.innerHTML = '<i class="bi bi-check"></i> 已复制';
+                btn.classList.remove('btn-outline-secondary');
+                btn.classList.add('btn-outline-success');
+                
+                setTimeout(() => {
+                    btn.innerHTML = originalHTML;
+                    btn.classList.remove('btn-outline-success');
+                    btn.classList.add('btn-outline-secondary');
+                }, 2000);
+            } else {
+                alert('回答已复制到剪贴板！');
+            }
+        }).catch(function(err) {
+            console.error('复制失败: ', err);
+            fallbackCopyToClipboard(answerText);
+        });
+    } else {
+        fallbackCopyToClipboard(answerText);
+    }
+}
+
+function fallbackCopyToClipboard(text) {
+    const textArea = document.createElement("textarea");
+    textArea.value = text;
+    
+    // 避免屏幕闪烁
+    textArea.style.position = "fixed";
+    textArea.style.left = "-999999px";
+    textArea.style.top = "-999999px";
+    document.body.appendChild(textArea);
+    
+    textArea.focus();
+    textArea.select();
+    
+    try {
+        document.execCommand('copy');
+        alert('回答已复制到剪贴板！');
+    } catch (err) {
+        console.error('复制失败: ', err);
+        alert('复制失败，请手动选择复制');
+    }
+    
+    document.body.removeChild(textArea);
+}
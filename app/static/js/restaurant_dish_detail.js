@@ -0,0 +1,86 @@
+// 销售趋势图表
+document.addEventListener('DOMContentLoaded', function() {
+    const trendCtx = document.getElementById('salesTrendChart');
+    if (!trendCtx) return;
+    
+    try {
+        // 从 data 属性获取数据
+        const chartData = document.getElementById('chartData');
+        if (!chartData) {
+            trendCtx.innerHTML = '<div class="text-center p-3"><i class="bi bi-graph-up text-muted"></i><p class="mt-2 small text-muted">暂无销售趋势数据</p></div>';
+            return;
+        }
+        
+        const trendDates = JSON.parse(chartData.dataset.trendDates || '[]');
+        const trendQuantities = JSON.parse(chartData.dataset.trendQuantities || '[]');
+        const trendSales = JSON.parse(chartData.dataset.trendSales || '[]');
+        
+        if (trendDates.length === 0 || trendQuantities.length === 0 || trendSales.length === 0) {
+            trendCtx.innerHTML = '<div class="text-center p-3"><i class="bi bi-graph-up text-muted"></i><p class="mt-2 small text-muted">暂无销售趋势数据</p></div>';
+            return;
+        }
+        
+        new Chart(trendCtx, {
+            type: 'line',
+            data: {
+                labels: trendDates,
+                datasets: [
+                    {
+                        label: '销量 (份)',
+                        data: trendQuantities,
+                        borderColor: 'rgb(54, 162, 235)',
+                        backgroundColor: 'rgba(54, 162, 235, 0.1)',
+                        borderWidth: 2,
+                        tension: 0.3,
+                        yAxisID: 'y'
+                    },
+                    {
+                        label: '销售额 (元)',
+                        data: trendSales,
+                        borderColor: 'rgb(75, 192, 192)',
+                        backgroundColor: 'rgba(75, 192, 192, 0.1)',
+                        borderWidth: 2,
+                        tension: 0.3,
+                        yAxisID: 'y1'
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                interaction: {
+                    mode: 'index',
+                    intersect: false
+                },
+                scales: {
+                    y: {
+                        type: 'linear',
+                        display: true,
+                        position: 'left',
+                        title: {
+                            display: true,
+                            text: '销量 (份)'
+                        },
+                        beginAtZero: true
+                    },
+                    y1: {
+                        type: 'linear',
+                        display: true,
+                        position: 'right',
+                        title: {
+                            display: true,
+                            text: '销售额 (元)'
+                        },
+                        beginAtZero: true,
+                        grid: {
+                            drawOnChartArea: false
+                        }
+                    }
+                }
+            }
+        });
+    } catch (error) {
+        console.error('图表初始化失败:', error);
+        trendCtx.innerHTML = '<div class="text-center p-3"><i class="bi bi-exclamation-triangle text-danger"></i><p class="mt-2 small text-danger">图表加载失败</p></div>';
+    }
+});
@@ -0,0 +1,318 @@
+// 页面数据（地址由模板写在 #pageData 上）
+const pageData = document.getElementById('pageData').dataset;
+
+// 当前正在询问的菜品ID
+let currentDishId = null;
+
+// 待提交的加菜操作 {dishId: 数量}，连续点击会合并成一次批量请求
+const pendingAdds = {};
+let cartFlushTimer = null;
+const CART_FLUSH_DELAY = 400;
+
+// 把累积的加菜操作一次性提交到批量接口
+function flushPendingAdds() {
+    cartFlushTimer = null;
+    const operations = Object.keys(pendingAdds).map(dishId => ({
+        op: 'add',
+        dish_id: parseInt(dishId),
+        quantity: pendingAdds[dishId]
+    }));
+    Object.keys(pendingAdds).forEach(dishId => delete pendingAdds[dishId]);
+    if (operations.length === 0) {
+        return;
+    }
+    
+    fetch(pageData.batchUpdateUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            operations: operations
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const added = operations.reduce((sum, op) => sum + op.quantity, 0);
+            showToast('success', `已添加 ${added} 份菜品到我的餐桌`);
+            
+            // 更新购物车数量显示
+            updateCartCount(data.cart_count || 0);
+        } else {
+            showToast('error', data.message || '添加失败');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showToast('error', '网络错误，请稍后重试');
+    });
+}
+
+// 加入我的餐桌功能
+document.addEventListener('DOMContentLoaded', function() {
+    // 为所有"加入我的餐桌"按钮添加点击事件
+    document.querySelectorAll('.add-to-cart').forEach(button => {
+        let resetTimer = null;
+        let clickCount = 0;
+        
+        button.addEventListener('click', function() {
+            const dishId = this.dataset.dishId;
+            
+            // 先记录操作，稍后合并提交
+            pendingAdds[dishId] = (pendingAdds[dishId] || 0) + 1;
+            clearTimeout(cartFlushTimer);
+            cartFlushTimer = setTimeout(flushPendingAdds, CART_FLUSH_DELAY);
+            
+            // 立即反馈按钮状态
+            clickCount += 1;
+            this.innerHTML = `<i class="bi bi-check"></i> 已添加 ×${clickCount}`;
+            this.classList.remove('btn-success');
+            this.classList.add('btn-outline-success');
+            
+            // 2秒无操作后恢复按钮状态
+            clearTimeout(resetTimer);
+            resetTimer = setTimeout(() => {
+                clickCount = 0;
+                this.innerHTML = '<i class="bi bi-plus-circle"></i> 加入我的餐桌';
+                this.classList.remove('btn-outline-success');
+                this.classList.add('btn-success');
+            }, 2000);
+        });
+    });
+    
+    // 离开页面前提交尚未发送的操作
+    window.addEventListener('pagehide', function() {
+        const operations = Object.keys(pendingAdds).map(dishId => ({
+            op: 'add',
+            dish_id: parseInt(dishId),
+            quantity: pendingAdds[dishId]
+        }));
+        if (operations.length > 0 && navigator.sendBeacon) {
+            navigator.sendBeacon(pageData.batchUpdateUrl,
+                new Blob([JSON.stringify({ operations: operations })], { type: 'application/json' }));
+        }
+    });
+    
+    // 询问按钮点击事件
+    document.querySelectorAll('.ask-question').forEach(button => {
+        button.addEventListener('click', function() {
+            currentDishId = this.dataset.dishId;
+            const dishName = this.dataset.dishName;
+            
+            // 更新模态框标题
+            document.getElementById('askModalLabel').textContent = `咨询菜品：${dishName}`;
+            
+            // 清空之前的回答
+            document.getElementById('aiAnswerArea').style.display = 'none';
+            document.getElementById('aiAnswerContent').innerHTML = '';
+            document.getElementById('questionText').value = '';
+            
+            // 设置默认问题
+            document.getElementById('questionText').value = `关于"${dishName}"这道菜，`;
+            document.getElementById('questionText').focus();
+        });
+    });
+    
+    // 提交问题按钮
+    document.getElementById('submitQuestion').addEventListener('click', function() {
+        const question = document.getElementById('questionText').value.trim();
+        
+        if (!question) {
+            showToast('warning', '请输入问题');
+            return;
+        }
+        
+        if (!currentDishId) {
+            showToast('error', '菜品信息错误');
+            return;
+        }
+        
+        // 显示加载指示器
+        document.getElementById('loadingIndicator').style.display = 'block';
+        document.getElementById('aiAnswerArea').style.display = 'none';
+        this.disabled = true;
+        
+        // 发送AJAX请求
+        fetch(pageData.askQuestionUrl.replace('0', currentDishId), {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                question: question
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            // 隐藏加载指示器
+            document.getElementById('loadingIndicator').style.display = 'none';
+            this.disabled = false;
+            
+            if (data.success) {
+                // 显示AI回答
+                const answerArea = document.getElementById('aiAnswerArea');
+                const answerContent = document.getElementById('aiAnswerContent');
+                
+                // 格式化回答（保留换行）
+                let formattedAnswer = data.answer;
+                formattedAnswer = formattedAnswer.replace(/\n/g, '<br>');
+                
+                // 优化AI回答显示：如果回答过长，只显示前500个字符
+                if (formattedAnswer.length > 500 && !data.is_fallback) {
+                    // 截断过长的回答
+                    const shortAnswer = formattedAnswer.substring(0, 500) + '...';
+                    const fullAnswer = formattedAnswer;
+                    
+                    // 创建显示完整回答的按钮
+                    const showMoreButton = document.createElement('button');
+                    showMoreButton.className = 'btn btn-sm btn-link p-0 mt-2';
+                    showMoreButton.innerHTML = '<i class="bi bi-chevron-down"></i> 查看完整回答';
+                    showMoreButton.style.fontSize = '0.875rem';
+                    
+                    // 如果是备选回答，添加提示
+                    if (data.is_fallback) {
+                        answerContent.innerHTML = `
+                            <div class="alert alert-warning mb-2">
+                                <i class="bi bi-exclamation-triangle"></i> 当前为备选回答
+                            </div>
+                            ${shortAnswer}
+                        `;
+                    } else {
+                        answerContent.innerHTML = shortAnswer;
+                    }
+                    
+                    // 添加显示完整回答的按钮
+                    if (!data.is_fallback) {
+                        answerContent.appendChild(showMoreButton);
+                    }
+                    
+                    // 点击按钮显示完整回答
+                    showMoreButton.addEventListener('click', function() {
+                        if (data.is_fallback) {
+                            answerContent.innerHTML = `
+                                <div class="alert alert-warning mb-2">
+                                    <i class="bi bi-exclamation-triangle"></i> 当前为备选回答
+                                </div>
+                                ${fullAnswer}
+                            `;
+                        } else {
+                            answerContent.innerHTML = fullAnswer;
+                        }
+                        
+                        // 移除按钮
+                        this.remove();
+                    });
+                } else {
+                    // 如果是备选回答，添加提示
+                    if (data.is_fallback) {
+                        answerContent.innerHTML = `
+                            <div class="alert alert-warning mb-2">
+                                <i class="bi bi-exclamation-triangle"></i> 当前为备选回答
+                            </div>
+                            ${formattedAnswer}
+                        `;
+                    } else {
+                        answerContent.innerHTML = formattedAnswer;
+                    }
+                }
+                
+                answerArea.style.display = 'block';
+                
+                // 滚动到回答区域
+                answerArea.scrollIntoView({ behavior: 'smooth', block: 'start' });
+            } else {
+                showToast('error', data.message || 'AI服务暂时不可用');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            document.getElementById('loadingIndicator').style.display = 'none';
+            this.disabled = false;
+            showToast('error', '网络错误，请稍后重试');
+        });
+    });
+    
+    // 模态框关闭时重置状态
+    document.getElementById('askModal').addEventListener('hidden.bs.modal', function () {
+        currentDishId = null;
+        document.getElementById('loadingIndicator').style.display = 'none';
+        document.getElementById('aiAnswerArea').style.display = 'none';
+        document.getElementById('aiAnswerContent').innerHTML = '';
+        document.getElementById('questionText').value = '';
+        document.getElementById('submitQuestion').disabled = false;
+    });
+    
+    // 返回顶部按钮
+    document.querySelector('.btn-outline-secondary[href="#"]').addEventListener('click', function(e) {
+        e.preventDefault();
+        window.scrollTo({ top: 0, behavior: 'smooth' });
+    });
+});
+
+// 显示Toast消息
+function showToast(type, message) {
+    // 创建Toast容器（如果不存在）
+    let toastContainer = document.getElementById('toastContainer');
+    if (!toastContainer) {
+        toastContainer = document.createElement('div');
+        toastContainer.id = 'toastContainer';
+        toastContainer.className = 'toast-container position-fixed bottom-0 end-0 p-3';
+        document.body.appendChild(toastContainer);
+    }
+    
+    // 创建Toast元素
+    const toastId = 'toast-' + Date.now();
+    const toast = document.createElement('div');
+    toast.id = toastId;
+    toast.className = 'toast align-items-center text-white bg-' + (type === 'success' ? 'success' : 
+                       type === 'error' ? 'danger' : 
+                       type === 'warning' ? 'warning' : 'info') + ' border-0';
+    toast.setAttribute('role', 'alert');
+    toast.setAttribute('aria-live', 'assertive');
+    toast.setAttribute('aria-atomic', 'true');
+    
+    toast.innerHTML = `
+        <div class="d-flex">
+            <div class="toast-body">
+                <i class="bi bi-${type === 'success' ? 'check-circle' : 
+                               type === 'error' ? 'exclamation-circle' : 
+                               type === 'warning' ? 'exclamation-triangle' : 'info-circle'} me-2"></i>
+                ${message}
+            </div>
+            <button type="button" class="btn-close btn-close-white me-2 m-auto" data-bs-dismiss="toast"></button>
+        </div>
+    `;
+    
+    toastContainer.appendChild(toast);
+    
+    // 显示Toast
+    const bsToast = new bootstrap.Toast(toast, { delay: 3000 });
+    bsToast.show();
+    
+    // Toast隐藏后移除元素
+    toast.addEventListener('hidden.bs.toast', function () {
+        toast.remove();
+    });
+}
+
+// 更新购物车数量显示
+function updateCartCount(count) {
+    // 更新所有显示购物车数量的地方
+    document.querySelectorAll('.badge.bg-danger').forEach(badge => {
+        if (badge.textContent.trim() === String(count) || 
+            badge.closest('.nav-link')?.href.includes('my-table') ||
+            badge.closest('.dropdown-item')?.href.includes('my-table')) {
+            badge.textContent = count;
+        }
+    });
+    
+    // 如果没有商品，隐藏徽章
+    document.querySelectorAll('.badge.bg-danger').forEach(badge => {
+        if (count === 0 && badge.parentElement) {
+            badge.style.display = 'none';
+        } else if (count > 0 && badge.parentElement) {
+            badge.style.display = 'inline-block';
+        }
+    });
+}
@@ -0,0 +1,236 @@
+// 注册数据标签插件
+Chart.register(ChartDataLabels);
+
+// 从隐藏元素获取数据
+document.addEventListener('DOMContentLoaded', function() {
+    const chartData = document.getElementById('chartData');
+    if (!chartData) return;
+    
+    try {
+        // 解析JSON数据
+        const labels = JSON.parse(chartData.dataset.labels || '[]');
+        const data = JSON.parse(chartData.dataset.data || '[]');
+        const trendLabels = JSON.parse(chartData.dataset.trendLabels || '[]');
+        const trendData = JSON.parse(chartData.dataset.trendData || '[]');
+        const chartLabel = chartData.dataset.chartLabel || '销售额 (元)';
+        const chartType = chartData.dataset.chartType || 'sales';
+        
+        // 解析菜品统计数据
+        let dishStats = [];
+        try {
+            dishStats = JSON.parse(chartData.dataset.dishStats || '[]');
+        } catch (e) {
+            console.warn('解析dishStats失败:', e);
+        }
+        
+        // 菜品销售排行图表
+        const salesCtx = document.getElementById('salesChart');
+        if (salesCtx && labels.length > 0 && data.length > 0) {
+            // 计算总数用于百分比显示
+            const total = data.reduce((a, b) => a + b, 0);
+            
+            // 定义颜色数组
+            const backgroundColors = [
+                '#ff6384', '#36a2eb', '#ffce56', '#4bc0c0', 
+                '#9966ff', '#ff9f40', '#c9cbcf', '#f7464a',
+                '#46bfbd', '#fdb45c', '#949fb1', '#4d5360'
+            ];
+            
+            new Chart(salesCtx, {
+                type: 'pie',
+                data: {
+                    labels: labels,
+                    datasets: [{
+                        data: data,
+                        backgroundColor: backgroundColors,
+                        borderWidth: 2,
+                        borderColor: '#fff'
+                    }]
+                },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    plugins: {
+                        legend: {
+                            position: 'right',
+                            labels: {
+                                usePointStyle: true,
+                                pointStyle: 'circle',
+                                padding: 20,
+                                font: {
+                                    size: 12
+                                },
+                                generateLabels: function(chart) {
+                                    const data = chart.data;
+                                    if (data.labels.length && data.datasets.length) {
+                                        return data.labels.map((label, i) => {
+                                            const value = data.datasets[0].data[i];
+                                            const percentage = total > 0 ? ((value / total) * 100).toFixed(1) : 0;
+                                            
+                                            return {
+                                                text: `${label}: ${chartType === 'sales' ? '¥' + value.toFixed(2) : value + ' 份'} (${percentage}%)`,
+                                                fillStyle: data.datasets[0].backgroundColor[i],
+                                                strokeStyle: '#000',
+                                                lineWidth: 1,
+                                                hidden: false,
+                                                index: i
+                                            };
+                                        });
+                                    }
+                                    return [];
+                                }
+                            }
+                        },
+                        title: {
+                            display: true,
+                            text: chartLabel + ' 排行',
+                            font: {
+                                size: 16,
+                                weight: 'bold'
+                            },
+                            padding: {
+                                top: 10,
+                                bottom: 20
+                            }
+                        },
+                        tooltip: {
+                            callbacks: {
+                                label: function(context) {
+                                    const label = context.label || '';
+                                    const value = context.raw || 0;
+                                    const percentage = total > 0 ? ((value / total) * 100).toFixed(1) : 0;
+                                    
+                                    // 获取当前菜品的详细统计
+                                    const index = context.dataIndex;
+                                    let quantity = 0;
+                                    let sales = 0;
+                                    if (dishStats[index]) {
+                                        quantity = dishStats[index][2] || 0;
+                                        sales = dishStats[index][3] || 0;
+                                    }
+                                    
+                                    if (chartType === 'sales') {
+                                        return [
+                                            `${label}`,
+                                            `销售额: ¥${value.toFixed(2)} (${percentage}%)`,
+                                            `销量: ${quantity} 份`,
+                                            `占总销售额: ${percentage}%`
+                                        ];
+                                    } else {
+                                        return [
+                                            `${label}`,
+                                            `销量: ${value} 份 (${percentage}%)`,
+                                            `销售额: ¥${sales.toFixed(2)}`,
+                                            `占总销量: ${percentage}%`
+                                        ];
+                                    }
+                                }
+                            }
+                        },
+                        // 数据标签配置
+                        datalabels: {
+                            color: '#fff',
+                            font: {
+                                weight: 'bold',
+                                size: 12
+                            },
+                            formatter: function(value, context) {
+                                // 获取百分比
+                                const percentage = total > 0 ? ((value / total) * 100).toFixed(1) : 0;
+                                
+                                if (chartType === 'sales') {
+                                    // 如果是销售额，显示简化的数值
+                                    if (value >= 1000) {
+                                        return '¥' + (value/1000).toFixed(1) + 'k';
+                                    } else {
+                                        return '¥' + value.toFixed(0);
+                                    }
+                                } else {
+                                    // 如果是销量，直接显示数值
+                                    return value;
+                                }
+                            },
+                            anchor: 'center',
+                            align: 'center',
+                            offset: 0
+                        }
+                    },
+                    // 饼图半径设置
+                    radius: '70%',
+                    animation: {
+                        animateScale: true,
+                        animateRotate: true
+                    }
+                },
+                plugins: [ChartDataLabels]
+            });
+        } else if (salesCtx) {
+            // 如果没有数据，显示提示
+            salesCtx.innerHTML = '<div class="text-center p-5"><i class="bi bi-bar-chart display-1 text-muted"></i><p class="mt-3">暂无销售数据</p></div>';
+        }
+        
+        // 销售趋势图表
+        const trendCtx = document.getElementById('trendChart');
+        if (trendCtx && trendLabels.length > 0 && trendData.length > 0) {
+            new Chart(trendCtx, {
+                type: 'line',
+                data: {
+                    labels: trendLabels,
+                    datasets: [{
+                        label: '销售额 (元)',
+                        data: trendData,
+                        backgroundColor: 'rgba(54, 162, 235, 0.2)',
+                        borderColor: 'rgba(54, 162, 235, 1)',
+                        borderWidth: 2,
+                        fill: true,
+                        tension: 0.4
+                    }]
+                },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    plugins: {
+                        legend: {
+                            display: true
+                        },
+                        title: {
+                            display: true,
+                            text: '近7天销售趋势',
+                            font: {
+                                size: 16
+                            }
+                        }
+                    },
+                    scales: {
+                        y: {
+                            beginAtZero: true,
+                            ticks: {
+                                callback: function(value) {
+                                    return '¥' + value;
+                                }
+                            }
+                        }
+                    }
+                }
+            });
+        } else if (trendCtx) {
+            // 如果没有数据，显示提示
+            trendCtx.innerHTML = '<div class="text-center p-5"><i class="bi bi-graph-up display-1 text-muted"></i><p class="mt-3">暂无趋势数据</p></div>';
+        }
+        
+        // 设置进度条宽度
+        document.querySelectorAll('.progress-bar[data-width]').forEach(function(bar) {
+            const width = bar.getAttribute('data-width');
+            if (width && !isNaN(width)) {
+                bar.style.width = width + '%';
+            }
+        });
+    } catch (error) {
+        console.error('图表初始化失败:', error);
+    }
+});
+
+// 导出功能
+function exportData() {
+    alert('导出功能开发中...');
+}
@@ -1,8 +1,8 @@
 import os
 import secrets
-from PIL import Image
 from flask import current_app
 from werkzeug.utils import secure_filename
+from app.services.metrics import metrics
 
 def save_image(image_file, folder, size=(100, 100)):
     """
@@ -27,34 +27,36 @@ def save_image(image_file, folder, size=(100, 100)):
     
     filepath = os.path.join(upload_folder, filename)
     
-    # 处理图片
+    # 处理图片（PIL 导入较慢，只在上传图片时导入）
+    from PIL import Image
     try:
-        img = Image.open(image_file)
-        
-        # 转换为RGB（如果是PNG有透明通道）
-        if img.mode in ('RGBA', 'LA', 'P'):
-            # 创建白色背景
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-        
-        # 根据文件夹调整不同的大小
-        if folder == 'avatars':
-            # 头像调整为100x100
-            img.thumbnail((100, 100), Image.Resampling.LANCZOS)
-        elif folder == 'dishes':
-            # 菜品图片调整为300x300
-            img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-        elif folder == 'logos':
-            # Logo调整为200x200
-            img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-        else:
-            # 默认调整大小
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        img.save(filepath)
+        with metrics.time_image(folder):
+            img = Image.open(image_file)
+            
+            # 转换为RGB（如果是PNG有透明通道）
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # 创建白色背景
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+                img = background
+            
+            # 根据文件夹调整不同的大小
+            if folder == 'avatars':
+                # 头像调整为100x100
+                img.thumbnail((100, 100), Image.Resampling.LANCZOS)
+            elif folder == 'dishes':
+                # 菜品图片调整为300x300
+                img.thumbnail((300, 300), Image.Resampling.LANCZOS)
+            elif folder == 'logos':
+                # Logo调整为200x200
+                img.thumbnail((200, 200), Image.Resampling.LANCZOS)
+            else:
+                # 默认调整大小
+                img.thumbnail(size, Image.Resampling.LANCZOS)
+            
+            img.save(filepath)
         
         return filename
     except Exception as e:
@@ -70,7 +72,7 @@ def delete_image(file_path):
             os.remove(file_path)
             return True
     except Exception as e:
-        print(f"删除文件失败: {e}")
+        current_app.logger.warning('删除文件失败 %s: %s', file_path, e)
     return False
 
 def allowed_file(filename):
@@ -95,4 +97,4 @@ def calculate_percentage(part, total):
     """计算百分比"""
     if total == 0:
         return 0
-    return round((part / total) * 100, 1)
\ No newline at end of file
+    return round((part / total) * 100, 1)
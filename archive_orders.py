@@ -0,0 +1,25 @@
+# 归档旧订单：python archive_orders.py [天数]
+# 重新计算已归档订单的顾客汇总：python archive_orders.py --rebuild-stats
+import sys
+import os
+sys.path.insert(0, '.')
+from app import create_app
+from app.services.order_archive import archive_orders, archive_cutoff, rebuild_customer_stats
+
+app = create_app()
+
+with app.app_context():
+    if '--rebuild-stats' in sys.argv[1:]:
+        rebuild_customer_stats()
+        print("✅ 已按归档库重新计算顾客汇总")
+        sys.exit(0)
+    
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else app.config['ORDER_ARCHIVE_DAYS']
+    print(f"=== 归档 {archive_cutoff(days):%Y-%m-%d %H:%M} 之前已完成/已取消的订单 ===")
+    
+    archived = archive_orders(days, progress=lambda count: print(f"  已归档 {count} 个订单"))
+    
+    if archived:
+        print(f"✅ 归档完成，共 {archived} 个订单")
+    else:
+        print("📁 没有需要归档的订单")
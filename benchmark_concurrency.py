@@ -0,0 +1,217 @@
+# 并发基准测试：python benchmark_concurrency.py [--modes sync,gevent] [--slow 0,4,16]
+#
+# 比较 gunicorn sync worker 和 gevent worker（SERVER_MODE）在I/O密集请求下的并发上限：
+# - 本地启动一个模拟的AI接口，每次调用等待 --llm-latency 秒（代替 DeepSeek）
+# - “慢请求”客户端不停调用菜品问答 /api/ask-question（等待AI接口）
+# - “快请求”客户端同时访问菜单页，统计它们的延迟和吞吐
+# sync 模式下每个worker同时只能处理一个请求，慢请求数超过worker数后菜单页开始排队；
+# gevent 模式下等待AI接口时不占用worker，菜单页延迟基本不变。
+# 需要安装 gunicorn（gevent 模式还需要 gevent）。
+import sys
+import os
+import argparse
+import json
+import shutil
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, '.')
+from benchmark_startup import pad
+from load_driver import HttpSession, Stats, login
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """模拟 chat/completions 接口：等待固定时间后返回回答"""
+    latency = 1.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        body = json.dumps({'choices': [{'message': {'content': '这道菜微辣，适合大多数人。'}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def make_env(workdir, llm_url):
+    env = dict(os.environ)
+    env.update({
+        'FLASK_DEBUG': 'False',
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "app.db")}',
+        'ARCHIVE_DATABASE_URL': f'sqlite:///{os.path.join(workdir, "archive.db")}',
+        'CART_SQLITE_PATH': os.path.join(workdir, 'carts.db'),
+        'ORDER_INGEST_QUEUE_PATH': os.path.join(workdir, 'order_queue.db'),
+        'METRICS_MULTIPROC_DIR': os.path.join(workdir, 'metrics'),
+        'DEEPSEEK_API_URL': llm_url,
+        'DEEPSEEK_API_KEY': 'sk-benchmark-' + '0' * 24,
+        'LOG_FILE': '',
+        'LOG_LEVEL': 'WARNING',
+        'SCHEMA_AUTO_UPGRADE': 'False',
+    })
+    return env
+
+def prepare_data(env):
+    """在子进程中建表并生成少量数据，返回账号清单"""
+    script = (
+        'import json, sys; sys.path.insert(0, ".")\n'
+        'from app import create_app\n'
+        'from app.services.schema import upgrade_schema\n'
+        'from generate_test_data import generate\n'
+        'app = create_app()\n'
+        'with app.app_context():\n'
+        '    upgrade_schema()\n'
+        '    manifest = generate(restaurants=5, dishes=20, customers=200, orders=2000, log=lambda m: None)\n'
+        'print(json.dumps(manifest))\n'
+    )
+    completed = subprocess.run([sys.executable, '-c', script], env=env, cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def start_server(mode, workers, port, env):
+    env = dict(env, SERVER_MODE=mode)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(workers),
+         '-b', f'127.0.0.1:{port}', '--timeout', '120', 'run:app'],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            status, _ = HttpSession(url).request('GET', '/auth/login')
+            if status == 200:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} 模式的服务器没有启动')
+
+def run_level(url, manifest, slow_clients, fast_clients, duration):
+    """slow_clients 个慢请求客户端压测期间，fast_clients 个客户端访问菜单页"""
+    rid, dish_ids = next(iter(manifest['restaurants'].items()))
+    customers = manifest['customers']
+    stop = threading.Event()
+    fast_latencies, slow_done, errors = [], [], []
+    lock = threading.Lock()
+
+    def session_for(index):
+        session = HttpSession(url)
+        if not login(Stats(), session, customers[index % len(customers)]['email'], manifest['password']):
+            raise RuntimeError('登录失败')
+        return session
+
+    def slow_worker(index):
+        session = session_for(index)
+        while not stop.is_set():
+            status, _ = session.request('POST', f'/api/ask-question/{dish_ids[0]}', json_body={'question': '辣吗？'})
+            with lock:
+                (slow_done if status == 200 else errors).append(status)
+
+    def fast_worker(index):
+        session = session_for(1000 + index)
+        while not stop.is_set():
+            started = time.perf_counter()
+            status, _ = session.request('GET', f'/restaurant/{rid}/menu')
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    fast_latencies.append(elapsed)
+                else:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=slow_worker, args=(i,), daemon=True) for i in range(slow_clients)]
+    threads += [threading.Thread(target=fast_worker, args=(i,), daemon=True) for i in range(fast_clients)]
+    for thread in threads:
+        thread.start()
+    # 等慢请求全部发出后再开始统计
+    time.sleep(1.0)
+    with lock:
+        fast_latencies.clear()
+        slow_done.clear()
+    time.sleep(duration)
+    with lock:
+        latencies = sorted(fast_latencies)
+        slow_count = len(slow_done)
+        error_count = len(errors)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    if not latencies:
+        return {'fast_rps': 0.0, 'p50': None, 'p95': None, 'slow_rps': slow_count / duration, 'errors': error_count}
+    return {
+        'fast_rps': len(latencies) / duration,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'slow_rps': slow_count / duration,
+        'errors': error_count,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='sync 与 gevent worker 的并发对比')
+    parser.add_argument('--modes', default='sync,gevent', help='SERVER_MODE，逗号分隔')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker 数')
+    parser.add_argument('--slow', default='0,2,8,32', help='慢请求（等待AI接口）的并发客户端数，逗号分隔')
+    parser.add_argument('--fast-clients', type=int, default=2, help='访问菜单页的并发客户端数')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='模拟AI接口的响应时间（秒）')
+    parser.add_argument('--duration', type=float, default=5.0, help='每档统计的秒数')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        sys.exit('需要安装 gunicorn')
+
+    FakeLLMHandler.latency = args.llm_latency
+    llm_server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLMHandler)
+    llm_server.daemon_threads = True
+    threading.Thread(target=llm_server.serve_forever, daemon=True).start()
+    llm_url = f'http://127.0.0.1:{llm_server.server_port}/v1/chat/completions'
+
+    workdir = tempfile.mkdtemp(prefix='concurrency-bench-')
+    try:
+        env = make_env(workdir, llm_url)
+        manifest = prepare_data(env)
+        print(f"=== {args.workers} 个worker，AI接口延迟 {args.llm_latency}s，{args.fast_clients} 个菜单页客户端 ===")
+        columns = ['模式', '慢请求并发', '菜单页/秒', 'p50(ms)', 'p95(ms)', '问答/秒', '错误']
+        print(''.join(pad(column, 12) for column in columns))
+        for mode in args.modes.split(','):
+            if mode == 'gevent':
+                try:
+                    import gevent  # noqa: F401
+                except ImportError:
+                    print("gevent 未安装，跳过")
+                    continue
+            process, url = start_server(mode, args.workers, free_port(), env)
+            try:
+                for slow in [int(value) for value in args.slow.split(',')]:
+                    result = run_level(url, manifest, slow, args.fast_clients, args.duration)
+                    p50 = f"{result['p50']:.1f}" if result['p50'] is not None else '-'
+                    p95 = f"{result['p95']:.1f}" if result['p95'] is not None else '-'
+                    row = [mode, str(slow), f"{result['fast_rps']:.1f}", p50, p95,
+                           f"{result['slow_rps']:.1f}", str(result['errors'])]
+                    print(''.join(pad(value, 12) for value in row))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    finally:
+        llm_server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# 路由基准测试：python benchmark_routes.py [--sizes 1000,10000,100000] [--save-baseline]
+#
+# 用 generate_test_data.generate() 分别生成 1k/10k/100k 订单的数据集（各自独立的
+# 临时数据库），通过 Flask 测试客户端反复请求主要路由，记录延迟分位数和每次请求
+# 执行的SQL条数（取自 X-DB-Queries 响应头）。
+# - --save-baseline：把结果写入基线文件
+# - 默认与基线比较：SQL条数增加，或中位延迟超过基线 (1 + --tolerance) 倍且多出
+#   --min-delta 毫秒以上，视为性能退化，进程以退出码 1 结束（可用于CI）
+# - 没有基线文件时以退出码 2 结束（不运行测试），避免CI在缺少基线时误报通过
+import sys
+import os
+import argparse
+import json
+import shutil
+import statistics
+import tempfile
+import time
+sys.path.insert(0, '.')
+from sqlalchemy import func
+from config import Config
+from app import create_app, db
+from app.models import User, Restaurant, Dish, Order
+from generate_test_data import generate, PASSWORD
+
+DEFAULT_BASELINE = 'route_benchmark_baseline.json'
+
+def make_app(workdir):
+    """每个数据集使用独立的临时数据库和购物车存储"""
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+        SQLALCHEMY_BINDS = {'archive': f'sqlite:///{os.path.join(workdir, "archive.db")}'}
+        SCHEMA_AUTO_UPGRADE = True
+        CART_BACKEND = 'memory'
+        ORDER_INGEST_MODE = 'direct'
+        WTF_CSRF_ENABLED = False
+        TESTING = True
+        QUERY_STATS_HEADERS = True
+
+    return create_app(BenchmarkConfig)
+
+def login(client, email):
+    response = client.post('/auth/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'登录失败: {email}')
+
+def build_cases(app, owner_client, customer_client):
+    """选出订单最多的餐厅和它的常客，返回 [(名称, 客户端, 方法, 路径, 准备函数)]"""
+    with app.app_context():
+        restaurant = Restaurant.query.order_by(Restaurant.total_sales.desc()).first()
+        rid = restaurant.id
+        dish = Dish.query.filter_by(restaurant_id=rid).order_by(Dish.order_count.desc()).first()
+        top_customer = db.session.query(Order.user_id).filter_by(restaurant_id=rid).group_by(
+            Order.user_id).order_by(func.count(Order.id).desc()).first()[0]
+        owner_email = restaurant.owner.email
+        customer_email = User.query.filter_by(role='customer').order_by(User.id).first().email
+        dish_ids = [dish.id] + [d.id for d in Dish.query.filter(
+            Dish.restaurant_id == rid, Dish.id != dish.id).limit(1).all()]
+
+    # 请求不能在外层应用上下文中发出，否则会共用 g 中的登录用户
+    login(owner_client, owner_email)
+    login(customer_client, customer_email)
+
+    def fill_cart():
+        customer_client.post('/api/clear-cart')
+        for dish_id in dish_ids:
+            customer_client.post(f'/api/add-to-cart/{dish_id}', json={'quantity': 1})
+
+    return [
+        ('dashboard', owner_client, 'GET', f'/restaurant/{rid}/dashboard', None),
+        ('reports', owner_client, 'GET', f'/restaurant/{rid}/reports', None),
+        ('customers', owner_client, 'GET', f'/restaurant/{rid}/customers', None),
+        ('customer_detail', owner_client, 'GET', f'/restaurant/{rid}/customers/{top_customer}', None),
+        ('owner_dish_detail', owner_client, 'GET', f'/restaurant/{rid}/dishes/{dish.id}', None),
+        ('advisor', owner_client, 'GET', f'/restaurant/{rid}/advisor', None),
+        ('dish_detail', customer_client, 'GET', f'/dish/{dish.id}', None),
+        ('restaurant_menu', customer_client, 'GET', f'/restaurant/{rid}/menu', None),
+        ('checkout', customer_client, 'POST', '/order/checkout', fill_cart),
+    ]
+
+def run_case(client, method, path, prepare, repeat, warmup):
+    latencies, queries = [], []
+    for index in range(warmup + repeat):
+        if prepare:
+            prepare()
+        started = time.perf_counter()
+        response = client.open(path, method=method, json={} if method == 'POST' else None)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f'{method} {path} 返回 {response.status_code}')
+        if index >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(int(response.headers['X-DB-Queries']))
+
+    latencies.sort()
+    return {
+        'p50': round(statistics.median(latencies), 2),
+        'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        'p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        'queries': max(queries)
+    }
+
+def benchmark_size(orders, repeat, warmup):
+    workdir = tempfile.mkdtemp(prefix='route-bench-')
+    try:
+        app = make_app(workdir)
+        with app.app_context():
+            generate(restaurants=10, dishes=30, customers=max(100, orders // 20), orders=orders,
+                     log=lambda message: None)
+
+        owner_client, customer_client = app.test_client(), app.test_client()
+        results = {}
+        for name, client, method, path, prepare in build_cases(app, owner_client, customer_client):
+            results[name] = run_case(client, method, path, prepare, repeat, warmup)
+            result = results[name]
+            print(f"  {name:<18}p50 {result['p50']:>8.1f}ms  p95 {result['p95']:>8.1f}ms  "
+                  f"p99 {result['p99']:>8.1f}ms  SQL {result['queries']:>4}")
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def compare(results, baseline, tolerance, min_delta):
+    """返回退化列表"""
+    regressions = []
+    for size, routes in results.items():
+        for name, result in routes.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            if result['queries'] > base['queries']:
+                regressions.append(f"{size} 订单 {name}: SQL {base['queries']} → {result['queries']}")
+            limit = base['p50'] * (1 + tolerance)
+            if result['p50'] > limit and result['p50'] - base['p50'] > min_delta:
+                regressions.append(f"{size} 订单 {name}: p50 {base['p50']:.1f}ms → {result['p50']:.1f}ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='主要路由随数据量变化的基准测试')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='订单数量，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=20, help='每个路由计时的请求次数')
+    parser.add_argument('--warmup', type=int, default=3, help='不计时的预热请求次数')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的中位延迟增长比例')
+    parser.add_argument('--min-delta', type=float, default=5.0, help='忽略小于该值（毫秒）的延迟增长')
+    args = parser.parse_args()
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"❌ 没有基线文件 {args.baseline}，先用 --save-baseline 生成")
+        sys.exit(2)
+
+    results = {}
+    for orders in [int(size) for size in args.sizes.split(',')]:
+        print(f"=== {orders} 个订单 ===")
+        results[str(orders)] = benchmark_size(orders, args.repeat, args.warmup)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📄 基线已保存: {args.baseline}")
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print("❌ 性能退化:")
+        for line in regressions:
+            print(f"   {line}")
+        sys.exit(1)
+    print("✅ 没有超过基线的退化")
+
+if __name__ == '__main__':
+    main()
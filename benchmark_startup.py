@@ -0,0 +1,147 @@
+# 启动基准测试：python benchmark_startup.py [--repeat 5]
+#
+# 每次在新的 Python 进程中冷启动应用（空的临时数据库已建好表），比较：
+# - 每次启动建表检查：SCHEMA_AUTO_UPGRADE=True，create_app 中执行 create_all 和补列检查
+# - 快速启动：SCHEMA_AUTO_UPGRADE=False，数据库结构由 flask init-db 在部署时处理
+# - preload + fork：master 中已加载好应用（gunicorn --preload），只计 fork 出 worker
+#   到处理完第一个请求的时间
+# 输出各阶段耗时的中位数（毫秒）：进程总耗时、import app、create_app、第一个请求
+# --importtime：用 python -X importtime 统计 create_app 导入的顶层包和 app 模块的累计
+#   导入耗时，找出拖慢启动的依赖
+import sys
+import os
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import unicodedata
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 在子进程中执行，最后一行输出各阶段耗时（秒）
+PROBE = '''
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+if sys.argv[1] == 'preload':
+    read_fd, write_fd = os.pipe()
+    forked = time.perf_counter()
+    if os.fork() == 0:
+        app.test_client().get('/auth/login')
+        os.write(write_fd, repr(time.perf_counter()).encode())
+        os._exit(0)
+    os.wait()
+    finished = float(os.read(read_fd, 64))
+    result = {{'first_request': finished - forked}}
+else:
+    app.test_client().get('/auth/login')
+    result = {{'import': imported - started, 'create_app': created - imported,
+              'first_request': time.perf_counter() - created}}
+print(json.dumps(result))
+'''
+
+SCENARIOS = [
+    ('每次启动建表检查', 'cold', {'SCHEMA_AUTO_UPGRADE': 'True'}),
+    ('快速启动', 'cold', {'SCHEMA_AUTO_UPGRADE': 'False'}),
+    ('preload + fork', 'preload', {'SCHEMA_AUTO_UPGRADE': 'False'}),
+]
+
+def pad(text, width):
+    """按显示宽度补齐（中文占两列）"""
+    display = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+    return text + ' ' * max(width - display, 0)
+
+def make_env(workdir, overrides):
+    """临时数据库和存储，关闭调试和文件日志"""
+    env = dict(os.environ)
+    env.update({
+        'FLASK_DEBUG': 'False',
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "app.db")}',
+        'ARCHIVE_DATABASE_URL': f'sqlite:///{os.path.join(workdir, "archive.db")}',
+        'CART_SQLITE_PATH': os.path.join(workdir, 'carts.db'),
+        'ORDER_INGEST_QUEUE_PATH': os.path.join(workdir, 'order_queue.db'),
+        'LOG_FILE': '',
+        'LOG_LEVEL': 'WARNING',
+    })
+    env.pop('METRICS_MULTIPROC_DIR', None)
+    env.update(overrides)
+    return env
+
+def run_probe(mode, env):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE.format(root=ROOT), mode],
+        env=env, cwd=ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f'启动失败:\n{completed.stderr[-2000:]}')
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if mode == 'cold':
+        result['wall'] = wall
+    return result
+
+def importtime_report(env, top):
+    """python -X importtime 的输出：每行 “自身耗时 | 累计耗时 | 模块名”（微秒，缩进表示层级）"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         f'import sys; sys.path.insert(0, {ROOT!r}); from app import create_app; create_app()'],
+        env=env, cwd=ROOT, capture_output=True, text=True
+    )
+    packages, app_modules = [], []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        module = name.strip()
+        entry = (int(cumulative) / 1000, module)
+        if module == 'app' or module.startswith('app.'):
+            app_modules.append(entry)
+        elif '.' not in module and not module.startswith('_'):
+            # 只统计包本身（子模块已计入所属包的累计耗时）
+            packages.append(entry)
+
+    print("\n=== 导入耗时（第三方包和标准库，含其依赖）===")
+    for ms, module in sorted(packages, reverse=True)[:top]:
+        print(f"{ms:>9.1f}ms  {module}")
+    print("\n=== 导入耗时（app 模块，含其依赖）===")
+    for ms, module in sorted(app_modules, reverse=True)[:top]:
+        print(f"{ms:>9.1f}ms  {module}")
+
+def main():
+    parser = argparse.ArgumentParser(description='应用冷启动耗时基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每个场景启动的次数')
+    parser.add_argument('--importtime', action='store_true', help='输出 -X importtime 导入耗时报告')
+    parser.add_argument('--top', type=int, default=20, help='导入耗时报告显示的条数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    try:
+        # 先建好表，同时预热磁盘缓存和 .pyc
+        run_probe('cold', make_env(workdir, {'SCHEMA_AUTO_UPGRADE': 'True'}))
+
+        print(f"{pad('场景', 20)}{pad('进程总耗时', 12)}{pad('import', 10)}{pad('create_app', 12)}首个请求")
+        for name, mode, overrides in SCENARIOS:
+            env = make_env(workdir, overrides)
+            runs = [run_probe(mode, env) for _ in range(args.repeat)]
+
+            def median(key):
+                values = [run[key] for run in runs if key in run]
+                return f'{statistics.median(values) * 1000:.1f}' if values else '-'
+            print(f"{pad(name, 20)}{pad(median('wall'), 12)}{pad(median('import'), 10)}"
+                  f"{pad(median('create_app'), 12)}{median('first_request')}")
+        
+        if args.importtime:
+            importtime_report(make_env(workdir, {'SCHEMA_AUTO_UPGRADE': 'False'}), args.top)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
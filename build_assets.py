@@ -0,0 +1,140 @@
+# 前端资源构建：python build_assets.py
+#
+# 把页面依赖的第三方前端文件放到 app/static/vendor，页面不再访问 cdn.jsdelivr.net：
+# - Bootstrap 5.1.3 CSS，Popper + Bootstrap JS 合并为一个 bootstrap.bundle.min.js
+# - Chart.js 和 chartjs-plugin-datalabels（报表页、菜品详情页的图表）
+# - Bootstrap Icons 只保留模板和 JS 中用到的图标，生成 bootstrap-icons.css
+# 输出文件由 asset_url() 加内容指纹后通过 /assets/ 提供（一年 immutable 缓存，预压缩）。
+#
+# 源文件取自 PyPI 上内置了这些文件的 wheel（版本固定，并检查文件中的版本号），
+# 构建机只需要能访问 PyPI 或其镜像（pip 的 index 配置同样生效）。
+# 新页面用到新图标后重新运行本脚本并提交 app/static/vendor。
+import sys
+import os
+import argparse
+import glob
+import re
+import subprocess
+import tempfile
+import zipfile
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+VENDOR_DIR = os.path.join(ROOT, 'app', 'static', 'vendor')
+SCAN_DIRS = [os.path.join(ROOT, 'app', 'templates'), os.path.join(ROOT, 'app', 'static', 'js')]
+
+# (wheel, 包内路径, 文件中必须包含的版本标记)
+BOOTSTRAP_CSS = ('bootstrap-flask==2.0.2', 'flask_bootstrap/static/bootstrap5/css/bootstrap.min.css', b'Bootstrap v5.1.3')
+POPPER_JS = ('bootstrap-flask==2.0.2', 'flask_bootstrap/static/bootstrap5/umd/popper.min.js', b'@popperjs/core v2.10.2')
+BOOTSTRAP_JS = ('bootstrap-flask==2.0.2', 'flask_bootstrap/static/bootstrap5/js/bootstrap.min.js', b'Bootstrap v5.1.3')
+ICON_SPRITE = ('bootstrap-flask==2.4.1', 'flask_bootstrap/static/bootstrap5/icons/bootstrap-icons.svg', b'<symbol')
+CHART_JS = ('django-unfold==0.91.0', 'unfold/static/unfold/js/chart/chart.js', b'"4.4.0"')
+DATALABELS_JS = ('wagtailcharts==0.7', 'wagtailcharts/static/wagtailcharts/js/chartjs-plugin-datalabels.min.js',
+                 b'chartjs-plugin-datalabels v2.0.0')
+
+# 扫描不到的图标（在 Python 代码中拼出的类名等）
+EXTRA_ICONS = []
+
+SOURCE_MAP_PATTERN = re.compile(rb'\n?/[/*]# sourceMappingURL=\S+(?: \*/)?\s*$')
+ICON_PATTERN = re.compile(r'\bbi-([a-z0-9]+(?:-[a-z0-9]+)*)')
+# class="bi bi-{{ 'arrow-down' if ... else 'arrow-up' }}"
+DYNAMIC_ICON_PATTERN = re.compile(r'\bbi-\{\{(.*?)\}\}')
+
+class WheelCache:
+    """按需用 pip 下载 wheel（不下载依赖），读取其中的文件"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._wheels = {}
+
+    def read(self, source):
+        requirement, member, marker = source
+        if requirement not in self._wheels:
+            target = os.path.join(self.directory, requirement.replace('==', '-'))
+            subprocess.run([sys.executable, '-m', 'pip', 'download', '--no-deps', '--only-binary', ':all:',
+                            '--quiet', '-d', target, requirement], check=True)
+            self._wheels[requirement] = zipfile.ZipFile(glob.glob(os.path.join(target, '*.whl'))[0])
+        data = self._wheels[requirement].read(member)
+        if marker not in data:
+            raise RuntimeError(f'{requirement} 中的 {member} 不是预期的版本（缺少 {marker!r}）')
+        # 不提供 source map，去掉引用避免浏览器开发者工具请求 404
+        return SOURCE_MAP_PATTERN.sub(b'\n', data)
+
+def used_icons():
+    """模板和 JS 中出现的图标名"""
+    names = set(EXTRA_ICONS)
+    for directory in SCAN_DIRS:
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if not filename.endswith(('.html', '.js')):
+                    continue
+                with open(os.path.join(dirpath, filename), encoding='utf-8') as f:
+                    content = f.read()
+                names.update(ICON_PATTERN.findall(content))
+                for expression in DYNAMIC_ICON_PATTERN.findall(content):
+                    names.update(re.findall(r"['\"]([a-z0-9-]+)['\"]", expression))
+    return names
+
+def icon_css(sprite, names):
+    """
+    用 sprite 中的 SVG 生成图标样式：::before 以 currentColor 填充，SVG 作为 mask，
+    和图标字体一样随 font-size 缩放、跟随文字颜色。返回 (css, 找不到的图标)
+    """
+    symbols = {
+        match.group('id'): (match.group('viewbox'), match.group('body'))
+        for match in re.finditer(
+            r'<symbol[^>]*?viewBox="(?P<viewbox>[^"]+)"[^>]*?id="(?P<id>[^"]+)"[^>]*>(?P<body>.*?)</symbol>',
+            sprite, re.S)
+    }
+    found = sorted(name for name in names if name in symbols)
+    missing = sorted(name for name in names if name not in symbols)
+
+    lines = [
+        '/* Bootstrap Icons (MIT) - 只包含本项目用到的图标，由 build_assets.py 生成 */',
+        ',\n'.join(f'.bi-{name}::before' for name in found) + ' {',
+        '  content: "";',
+        '  display: inline-block;',
+        '  width: 1em;',
+        '  height: 1em;',
+        '  vertical-align: -.125em;',
+        '  background-color: currentColor;',
+        '  -webkit-mask: var(--bi-icon) center / contain no-repeat;',
+        '  mask: var(--bi-icon) center / contain no-repeat;',
+        '}',
+    ]
+    for name in found:
+        viewbox, body = symbols[name]
+        svg = f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{viewbox}">{body}</svg>'.replace('"', "'")
+        data_uri = 'data:image/svg+xml,' + quote(svg, safe=" =:/.,-_'")
+        lines.append(f'.bi-{name} {{ --bi-icon: url("{data_uri}"); }}')
+    return '\n'.join(lines) + '\n', missing
+
+def write(filename, data):
+    path = os.path.join(VENDOR_DIR, filename)
+    with open(path, 'wb') as f:
+        f.write(data)
+    print(f"  {filename:<36} {len(data) / 1024:>8.1f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description='构建自托管的第三方前端资源')
+    parser.add_argument('--download-dir', help='wheel 下载目录（默认使用临时目录）')
+    args = parser.parse_args()
+
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='vendor-assets-') as tmp:
+        wheels = WheelCache(args.download_dir or tmp)
+        print(f"写入 {os.path.relpath(VENDOR_DIR, ROOT)}:")
+        write('bootstrap.min.css', wheels.read(BOOTSTRAP_CSS))
+        write('bootstrap.bundle.min.js', wheels.read(POPPER_JS).rstrip() + b'\n' + wheels.read(BOOTSTRAP_JS))
+        write('chart.umd.min.js', wheels.read(CHART_JS))
+        write('chartjs-plugin-datalabels.min.js', wheels.read(DATALABELS_JS))
+
+        names = used_icons()
+        css, missing = icon_css(wheels.read(ICON_SPRITE).decode('utf-8'), names)
+        write('bootstrap-icons.css', css.encode('utf-8'))
+    print(f"图标 {len(names) - len(missing)} 个")
+    if missing:
+        print(f"⚠️ 以下图标在 Bootstrap Icons 中不存在: {', '.join(missing)}")
+
+if __name__ == '__main__':
+    main()
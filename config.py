@@ -23,6 +23,15 @@ class Config:
         f'sqlite:///{os.path.join(basedir, "app.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 启动时自动建表/补建新列（开发环境默认开启）；生产环境部署时执行 flask --app run init-db
+    SCHEMA_AUTO_UPGRADE = os.environ.get('SCHEMA_AUTO_UPGRADE', str(DEBUG)).lower() in ('true', '1', 't')
+    
+    # 冷归档数据库：旧订单从业务库移到这里，热查询只扫描近期数据
+    SQLALCHEMY_BINDS = {
+        'archive': os.environ.get('ARCHIVE_DATABASE_URL') or
+            f'sqlite:///{os.path.join(basedir, "instance", "archive.db")}'
+    }
+    
     # ================= 上传配置 =================
     # 上传文件总目录
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
@@ -52,6 +61,36 @@ class Config:
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     
+    # ================= 购物车配置 =================
+    # 购物车保存在服务端，Cookie中不再携带购物车内容
+    # memory: 进程内（单进程）; sqlite: 多worker共享; redis: 多机部署
+    CART_BACKEND = os.environ.get('CART_BACKEND', 'sqlite')
+    CART_SQLITE_PATH = os.environ.get('CART_SQLITE_PATH') or os.path.join(basedir, 'instance', 'carts.db')
+    CART_REDIS_URL = os.environ.get('CART_REDIS_URL', 'redis://localhost:6379/0')
+    CART_TTL = int(PERMANENT_SESSION_LIFETIME.total_seconds())  # 购物车保留时间（秒）
+    
+    # ================= 订单推送配置 =================
+    # memory: 进程内（单进程）; redis: 多worker/多机部署
+    ORDER_EVENTS_BROKER = os.environ.get('ORDER_EVENTS_BROKER', 'memory')
+    ORDER_EVENTS_REDIS_URL = os.environ.get('ORDER_EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+    ORDER_EVENTS_HEARTBEAT = 15  # SSE心跳间隔（秒）
+    # 实时推送（SSE）：auto 时只在 gevent worker + redis 代理下开启，否则页面定时轮询；
+    # 单进程多线程的开发服务器可设为 True
+    ORDER_EVENTS_LIVE = os.environ.get('ORDER_EVENTS_LIVE', 'auto')
+    ORDER_POLL_INTERVAL = 15  # 轮询订单状态的间隔（秒）
+    
+    # ================= 结算配置 =================
+    IDEMPOTENCY_KEY_TTL = 24 * 3600  # 结算幂等键保留时间（秒）
+    
+    # ================= 订单写入队列配置 =================
+    # direct: 结算时直接写入业务库; queue: 先写入本地队列，由单个写入线程批量提交
+    ORDER_INGEST_MODE = os.environ.get('ORDER_INGEST_MODE', 'direct')
+    ORDER_INGEST_QUEUE_PATH = os.environ.get('ORDER_INGEST_QUEUE_PATH') or os.path.join(basedir, 'instance', 'order_queue.db')
+    ORDER_INGEST_MAX_LAG = float(os.environ.get('ORDER_INGEST_MAX_LAG', 2.0))  # 入队到写入业务库的最大延迟（秒）
+    ORDER_INGEST_BATCH_SIZE = 200  # 每个事务最多写入的订单数
+    ORDER_INGEST_RETENTION = 600  # 已写入的队列记录保留时间（秒），用于幂等重试
+    ORDER_INGEST_ID_BLOCK = 100  # 队列每次从业务库订单号序列预留的订单号个数
+    
     # ================= 登录配置 =================
     REMEMBER_COOKIE_DURATION = timedelta(days=7)
     SESSION_PROTECTION = 'strong'
@@ -64,7 +103,7 @@ class Config:
     # ================= AI服务配置 =================
     # DeepSeek API配置
     DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY', '')
-    DEEPSEEK_API_URL = 'https://api.deepseek.com/v1/chat/completions'
+    DEEPSEEK_API_URL = os.environ.get('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1/chat/completions')
     DEEPSEEK_MODEL = 'deepseek-chat'
     
     # 本地AI配置（可选）
@@ -72,10 +111,76 @@ class Config:
     ANYTHINGLLM_WORKSPACE_SLUG = os.environ.get('ANYTHINGLLM_WORKSPACE_SLUG', '')
     ANYTHINGLLM_API_URL = 'http://localhost:3001/api/v1'
     
+    # ================= 菜单缓存配置 =================
+    MENU_CACHE_TTL = int(os.environ.get('MENU_CACHE_TTL', 60))  # 菜单片段中销量等统计允许滞后的秒数
+    
+    # ================= 黑名单缓存配置 =================
+    BLACKLIST_CACHE_TTL = int(os.environ.get('BLACKLIST_CACHE_TTL', 30))  # 缓存过期前不查询数据库，其他worker的黑名单最多滞后的秒数
+    
+    # ================= 菜品删除配置 =================
+    # 默认归档（软删除）菜品，保留历史订单；purge 模式才级联删除订单
+    DISH_DELETE_BATCH_SIZE = 500  # 每批删除的订单数（每批单独提交）
+    DISH_DELETE_SYNC_LIMIT = 500  # 关联订单超过该数量时转为后台任务
+    DISH_DELETE_JOB_RETENTION = 3600  # 已结束的后台删除任务保留时间（秒）
+    DISH_DELETE_JOB_TIMEOUT = 600  # 运行中的任务超过该时间没有进度，视为进程已退出（秒）
+    
+    # ================= 订单归档配置 =================
+    ORDER_ARCHIVE_DAYS = int(os.environ.get('ORDER_ARCHIVE_DAYS', 180))  # 已完成/已取消订单超过该天数后归档
+    ORDER_ARCHIVE_BATCH_SIZE = 500
+    
     # ================= 分页配置 =================
     DISHES_PER_PAGE = 12
     ORDERS_PER_PAGE = 15
     CUSTOMERS_PER_PAGE = 20
+    RESTAURANTS_PER_PAGE = 12
+    RESTAURANT_RANKING_TTL = int(os.environ.get('RESTAURANT_RANKING_TTL', 60))  # 餐厅排行缓存兜底刷新秒数
+    
+    # ================= SQL统计配置 =================
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 200))  # 超过该毫秒数的语句记入慢查询日志
+    # 响应中加入 X-DB-Queries / Server-Timing 头（调试和测试环境默认开启，生产环境不暴露）
+    QUERY_STATS_HEADERS = os.environ.get('QUERY_STATS_HEADERS', str(DEBUG)).lower() in ('true', '1', 't')
+    QUERY_BUDGETS = {}  # 路由SQL条数上限，如 {'restaurant.customers': 20}
+    QUERY_BUDGET_DEFAULT = None  # 未单独设置的路由的上限，None 表示不限制
+    QUERY_BUDGET_ENFORCE = os.environ.get('QUERY_BUDGET_ENFORCE', 'False').lower() in ('true', '1', 't')  # 超出时抛出异常
+    
+    # ================= 监控指标配置 =================
+    # /metrics 输出 Prometheus 指标（需要安装 prometheus_client 包）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    # gunicorn 多worker时各worker共享的指标目录，启动前需清空
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # 抓取时需要携带 Authorization: Bearer <token>；未设置时非调试环境返回404
+    
+    # ================= 日志配置 =================
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    # 单独设置模块的日志级别，环境变量格式 "app.services.ai_service=DEBUG,werkzeug=WARNING"
+    LOG_LEVELS = {
+        'urllib3': 'WARNING',
+        'PIL': 'WARNING',
+        **dict(item.strip().split('=', 1) for item in os.environ.get('LOG_LEVELS', '').split(',') if '=' in item)
+    }
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json 或 text
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')  # 调试/测试模式不写文件
+    
+    # ================= 性能分析配置 =================
+    # 关闭时不注册任何钩子；开启后带签名令牌的请求和按比例抽样的请求会被栈采样分析
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'False').lower() in ('true', '1', 't')
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.0))  # 随机抽样比例，如 0.001
+    PROFILER_INTERVAL = 0.005  # 采样间隔（秒）
+    PROFILER_DIR = os.environ.get('PROFILER_DIR') or os.path.join(basedir, 'instance', 'profiles')
+    PROFILER_MAX_FILES = 200  # 只保留最近的分析数
+    PROFILER_TOKEN_MAX_AGE = 600  # 分析令牌有效期（秒）
+    
+    # ================= 响应压缩和静态资源配置 =================
+    # 前面有 nginx 等代理负责压缩时可关闭
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True').lower() in ('true', '1', 't')
+    COMPRESS_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+    COMPRESS_MIMETYPES = [
+        'text/html', 'text/css', 'text/plain', 'text/javascript',
+        'application/javascript', 'application/json', 'image/svg+xml'
+    ]
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5  # 需要安装 brotli，未安装时只使用 gzip
+    ASSETS_MAX_AGE = 365 * 24 * 3600  # 带指纹的静态资源（/assets/）缓存时间（秒）
     
     # ================= 生产服务器配置 =================
     # 设置服务器名称
@@ -0,0 +1,259 @@
+# 生成大规模压测数据：python generate_test_data.py --restaurants 50 --dishes 40 --customers 5000 --orders 200000
+#
+# add_test_dishes.py / add_test_customers_orders.py 只有一家餐厅、三个顾客，
+# 无法复现线上的数据分布。这里按可配置规模生成餐厅、菜品、顾客和订单：
+# - 餐厅、菜品、顾客的热度服从 Zipf 分布（少数热门，长尾冷门）
+# - 下单时间集中在午餐（12点前后）和晚餐（18点半前后）高峰
+# - 用 executemany 分批插入，几十万订单也只需要几十秒
+# 生成的账号密码都是 password123，账号和ID写入 --manifest 文件供 load_driver.py 使用
+import sys
+import os
+import argparse
+import bisect
+import itertools
+import json
+import random
+import time
+sys.path.insert(0, '.')
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models import User, Restaurant, Category, Dish, Order, OrderItem, OrderIdSequence
+
+PASSWORD = 'password123'
+CATEGORY_NAMES = ['招牌菜', '热菜', '凉菜', '主食', '汤羹', '饮品']
+DISH_NAMES = ['宫保鸡丁', '鱼香肉丝', '麻婆豆腐', '回锅肉', '水煮鱼', '红烧肉', '糖醋里脊', '酸辣土豆丝',
+              '番茄炒蛋', '蒜蓉西兰花', '扬州炒饭', '牛肉面', '小笼包', '酸梅汤', '柠檬茶', '拍黄瓜',
+              '口水鸡', '干锅花菜', '剁椒鱼头', '清蒸鲈鱼', '皮蛋瘦肉粥', '葱油拌面', '冬瓜排骨汤', '奶茶']
+
+class WeightedPicker:
+    """按权重抽样（预先计算累积权重，每次抽样是一次二分查找）"""
+
+    def __init__(self, items, weights, rng):
+        self.items = list(items)
+        self.cumulative = list(itertools.accumulate(weights))
+        self.rng = rng
+
+    def pick(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return self.items[bisect.bisect_right(self.cumulative, point)]
+
+    def pick_distinct(self, count):
+        chosen = []
+        for _ in range(count * 3):
+            item = self.pick()
+            if item not in chosen:
+                chosen.append(item)
+                if len(chosen) == count:
+                    break
+        return chosen
+
+def zipf_picker(items, exponent, rng):
+    """Zipf 分布：第k热门的权重为 1/k^s，热度排名与ID顺序无关"""
+    items = list(items)
+    rng.shuffle(items)
+    return WeightedPicker(items, [1.0 / (rank ** exponent) for rank in range(1, len(items) + 1)], rng)
+
+def order_time(days, rng, now):
+    """随机下单时间（UTC）：午餐、晚餐高峰加全天少量订单，按北京时间生成"""
+    day = (now + timedelta(hours=8)).date() - timedelta(days=rng.randrange(days))
+    roll = rng.random()
+    if roll < 0.45:
+        minutes = rng.gauss(12.25 * 60, 40)
+    elif roll < 0.85:
+        minutes = rng.gauss(18.5 * 60, 50)
+    else:
+        minutes = rng.uniform(8 * 60, 22 * 60)
+    minutes = min(max(minutes, 0), 24 * 60 - 1)
+    local = datetime.combine(day, datetime.min.time()) + timedelta(minutes=minutes, seconds=rng.randrange(60))
+    created_at = local - timedelta(hours=8)
+    # 今天还没到的时间挪到昨天
+    if created_at > now:
+        created_at -= timedelta(days=1)
+    return created_at
+
+def order_status(created_at, rng, now):
+    """较早的订单大多已完成，当天的订单还有很多待处理"""
+    roll = rng.random()
+    if now - created_at < timedelta(hours=12):
+        return 'paid' if roll < 0.6 else 'completed'
+    if roll < 0.85:
+        return 'completed'
+    return 'cancelled' if roll < 0.95 else 'paid'
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+def insert_rows(model, rows, chunk_size):
+    """分批 executemany 插入，每批提交一次"""
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(db.insert(model), rows[start:start + chunk_size])
+        db.session.commit()
+
+def generate(restaurants=20, dishes=30, customers=1000, orders=20000, days=30,
+             zipf=1.1, seed=42, prefix='loadtest', chunk_size=5000, log=print):
+    """
+    生成压测数据（需要在应用上下文中调用）
+    :param dishes: 每家餐厅的菜品数
+    :return: 清单 {'password', 'owners', 'customers', 'restaurants'}
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+    started = time.time()
+
+    # 1. 店主、餐厅、分类、菜品（显式分配ID，避免逐行 flush）
+    user_id = next_id(User)
+    restaurant_id = next_id(Restaurant)
+    category_id = next_id(Category)
+    dish_id = next_id(Dish)
+
+    user_rows, restaurant_rows, category_rows, dish_rows = [], [], [], []
+    owners, restaurant_ids = [], []
+    dish_prices = {}
+    restaurant_dishes = {}
+    for _ in range(restaurants):
+        user_rows.append({
+            'id': user_id, 'username': f'{prefix}_owner_{user_id}', 'email': f'{prefix}_owner_{user_id}@test.com',
+            'password_hash': password_hash, 'role': 'owner', 'avatar_path': 'default_avatar.png',
+            'is_active': True, 'created_at': now - timedelta(days=days + 30)
+        })
+        restaurant_rows.append({
+            'id': restaurant_id, 'name': f'{prefix}餐厅{restaurant_id}', 'owner_id': user_id,
+            'description': '压测数据', 'logo_path': 'default_logo.png', 'total_sales': 0.0,
+            'created_at': now - timedelta(days=days + 30)
+        })
+        owners.append({'user_id': user_id, 'email': f'{prefix}_owner_{user_id}@test.com', 'restaurant_id': restaurant_id})
+        restaurant_ids.append(restaurant_id)
+
+        category_ids = []
+        for name in CATEGORY_NAMES:
+            category_rows.append({'id': category_id, 'name': name, 'restaurant_id': restaurant_id, 'created_at': now})
+            category_ids.append(category_id)
+            category_id += 1
+
+        restaurant_dishes[restaurant_id] = []
+        for index in range(dishes):
+            price = round(rng.uniform(8, 88) * 2) / 2
+            dish_rows.append({
+                'id': dish_id, 'name': f'{DISH_NAMES[index % len(DISH_NAMES)]}{index // len(DISH_NAMES) + 1}',
+                'description': '压测数据', 'price': price, 'image_path': 'default_dish.png',
+                'category_id': rng.choice(category_ids), 'restaurant_id': restaurant_id,
+                'created_at': now, 'order_count': 0, 'is_active': True
+            })
+            dish_prices[dish_id] = price
+            restaurant_dishes[restaurant_id].append(dish_id)
+            dish_id += 1
+
+        user_id += 1
+        restaurant_id += 1
+
+    # 2. 顾客
+    customer_ids = []
+    for _ in range(customers):
+        user_rows.append({
+            'id': user_id, 'username': f'{prefix}_customer_{user_id}', 'email': f'{prefix}_customer_{user_id}@test.com',
+            'password_hash': password_hash, 'role': 'customer', 'avatar_path': 'default_avatar.png',
+            'is_active': True, 'created_at': now - timedelta(days=days + 30)
+        })
+        customer_ids.append(user_id)
+        user_id += 1
+
+    insert_rows(User, user_rows, chunk_size)
+    insert_rows(Restaurant, restaurant_rows, chunk_size)
+    insert_rows(Category, category_rows, chunk_size)
+    insert_rows(Dish, dish_rows, chunk_size)
+    log(f"✅ {restaurants} 家餐厅、{len(dish_rows)} 个菜品、{customers} 个顾客 ({time.time() - started:.1f}s)")
+
+    # 3. 订单：餐厅、顾客、菜品都按 Zipf 热度抽样
+    restaurant_picker = zipf_picker(restaurant_ids, zipf, rng)
+    customer_picker = zipf_picker(customer_ids, zipf * 0.6, rng)
+    dish_pickers = {rid: zipf_picker(ids, zipf, rng) for rid, ids in restaurant_dishes.items()}
+
+    # 订单号从序列中整段预留，不会和运行中的应用分配的订单号冲突
+    order_id = OrderIdSequence.allocate(db.session.connection(), orders)
+    db.session.commit()
+    dish_counts = {}
+    restaurant_sales = {}
+    order_rows, item_rows = [], []
+    for count in range(1, orders + 1):
+        rid = restaurant_picker.pick()
+        created_at = order_time(days, rng, now)
+        status = order_status(created_at, rng, now)
+
+        total = 0.0
+        for picked_dish in dish_pickers[rid].pick_distinct(rng.choice((1, 1, 2, 2, 3, 4))):
+            quantity = rng.choice((1, 1, 1, 2, 2, 3))
+            price = dish_prices[picked_dish]
+            item_rows.append({'order_id': order_id, 'dish_id': picked_dish, 'quantity': quantity, 'price_at_time': price})
+            total += price * quantity
+            if status != 'cancelled':
+                dish_counts[picked_dish] = dish_counts.get(picked_dish, 0) + quantity
+
+        order_rows.append({
+            'id': order_id, 'user_id': customer_picker.pick(), 'restaurant_id': rid,
+            'total_amount': round(total, 2), 'status': status, 'created_at': created_at,
+            'paid_at': created_at if status != 'cancelled' else None, 'remarks': ''
+        })
+        if status in ('paid', 'completed'):
+            restaurant_sales[rid] = restaurant_sales.get(rid, 0.0) + total
+        order_id += 1
+
+        if len(order_rows) >= chunk_size or count == orders:
+            insert_rows(Order, order_rows, chunk_size)
+            insert_rows(OrderItem, item_rows, chunk_size * 4)
+            order_rows, item_rows = [], []
+            log(f"  已插入 {count}/{orders} 个订单 ({time.time() - started:.1f}s)")
+
+    # 4. 被点次数和销售额
+    if dish_counts:
+        dish_table = Dish.__table__
+        db.session.execute(
+            dish_table.update().where(dish_table.c.id == bindparam('b_id'))
+            .values(order_count=func.coalesce(dish_table.c.order_count, 0) + bindparam('b_count')),
+            [{'b_id': key, 'b_count': value} for key, value in dish_counts.items()]
+        )
+    if restaurant_sales:
+        restaurant_table = Restaurant.__table__
+        db.session.execute(
+            restaurant_table.update().where(restaurant_table.c.id == bindparam('b_id'))
+            .values(total_sales=func.coalesce(restaurant_table.c.total_sales, 0) + bindparam('b_sales')),
+            [{'b_id': key, 'b_sales': round(value, 2)} for key, value in restaurant_sales.items()]
+        )
+    db.session.commit()
+    log(f"✅ {orders} 个订单生成完成 ({time.time() - started:.1f}s)")
+
+    return {
+        'password': PASSWORD,
+        'owners': owners,
+        'customers': [{'user_id': uid, 'email': f'{prefix}_customer_{uid}@test.com'} for uid in customer_ids],
+        'restaurants': {str(rid): ids for rid, ids in restaurant_dishes.items()}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='生成大规模压测数据')
+    parser.add_argument('--restaurants', type=int, default=20, help='餐厅数')
+    parser.add_argument('--dishes', type=int, default=30, help='每家餐厅的菜品数')
+    parser.add_argument('--customers', type=int, default=1000, help='顾客数')
+    parser.add_argument('--orders', type=int, default=20000, help='订单数')
+    parser.add_argument('--days', type=int, default=30, help='订单分布在最近多少天')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf 指数，越大越集中')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--prefix', default='loadtest', help='账号和餐厅名前缀')
+    parser.add_argument('--manifest', default=os.path.join('instance', 'loadtest_manifest.json'))
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print("=== 生成压测数据 ===")
+        manifest = generate(args.restaurants, args.dishes, args.customers, args.orders,
+                            args.days, args.zipf, args.seed, args.prefix)
+
+    os.makedirs(os.path.dirname(args.manifest) or '.', exist_ok=True)
+    with open(args.manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    print(f"📄 账号清单: {args.manifest}（密码 {PASSWORD}）")
+
+if __name__ == '__main__':
+    main()
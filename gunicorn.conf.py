@@ -0,0 +1,42 @@
+# gunicorn.conf.py - gunicorn 启动时自动加载（与 start.sh 中的命令行参数一起生效）
+import os
+import shutil
+
+# SERVER_MODE=gevent：协程 worker，等待AI接口、SSE推送等I/O时不占用 worker，
+# 同一 worker 中的其他请求继续处理。必须在加载应用（--preload）之前打补丁。
+SERVER_MODE = os.environ.get('SERVER_MODE', 'sync')
+if SERVER_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('GEVENT_WORKER_CONNECTIONS', 1000))  # 每个worker的最大并发连接
+
+# master 进程中加载一次应用，worker 通过 fork 共享已导入的模块（写时复制），启动更快、
+# 占用内存更少。数据库连接池、SQLite 连接和日志线程在 worker 中会自动重建。
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 't')
+
+def on_starting(server):
+    """清空上次运行留下的多进程指标文件"""
+    multiproc_dir = os.environ.get('METRICS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+def post_fork(server, worker):
+    """gevent 模式下让 PostgreSQL 驱动协作式等待（需要安装 psycogreen；SQLite 查询本身不让出）"""
+    if SERVER_MODE == 'gevent' and os.environ.get('DATABASE_URL', '').startswith('postgres'):
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning('未安装 psycogreen，PostgreSQL 查询会阻塞整个 gevent worker')
+            return
+        patch_psycopg()
+
+def child_exit(server, worker):
+    """worker退出后合并它的指标文件，避免 /metrics 中残留已退出的进程"""
+    if os.environ.get('METRICS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid, os.environ['METRICS_MULTIPROC_DIR'])
@@ -26,6 +26,7 @@ echo "📦 安装依赖包..."
 pip install --upgrade pip
 pip install flask flask-sqlalchemy flask-login flask-wtf flask-migrate pillow werkzeug
 pip install requests python-dotenv gunicorn
+pip install gevent  # 可选：SERVER_MODE=gevent 时使用协程 worker
 
 # 5. 创建必要目录
 echo "📁 创建目录结构..."
@@ -0,0 +1,196 @@
+# 压测驱动：python load_driver.py [--url http://127.0.0.1:5000] --users 20 --iterations 10
+#
+# 按 generate_test_data.py 生成的账号清单回放真实流程：
+# - 顾客：登录 → 餐厅列表 → 菜单 → 菜品详情 → 加入购物车 → 购物车 → 结算 → 订单完成页
+# - 店主：登录 → 餐厅仪表板 → 订单管理
+# 不指定 --url 时在进程内用 Flask 测试客户端直接调用 WSGI 应用；
+# 指定 --url 时通过 HTTP 压测已启动的服务器（gunicorn 等）。
+# 结束后输出每一步的次数、错误数和 p50/p95/p99 延迟。
+import sys
+import os
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+sys.path.insert(0, '.')
+
+class TestClientSession:
+    """进程内会话（Flask 测试客户端）"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, json_body=None, headers=None):
+        response = self.client.open(path, method=method, data=data, json=json_body, headers=headers)
+        return response.status_code, response.get_data(as_text=True)
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpSession:
+    """HTTP会话（保存Cookie，不跟随重定向，与测试客户端行为一致）"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            _NoRedirect()
+        )
+
+    def request(self, method, path, data=None, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+class Stats:
+    """按步骤记录延迟和错误"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, step, elapsed, ok):
+        with self._lock:
+            self.latencies.setdefault(step, []).append(elapsed)
+            if not ok:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+    @staticmethod
+    def percentile(values, p):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def report(self, elapsed):
+        print(f"\n{'步骤':<16}{'次数':>8}{'错误':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+        total = 0
+        for step, values in self.latencies.items():
+            total += len(values)
+            print(f"{step:<16}{len(values):>8}{self.errors.get(step, 0):>8}"
+                  f"{self.percentile(values, 50) * 1000:>10.1f}{self.percentile(values, 95) * 1000:>10.1f}"
+                  f"{self.percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+        checkouts = len(self.latencies.get('checkout', []))
+        print(f"\n总请求 {total}，耗时 {elapsed:.1f}s，{total / elapsed:.1f} 请求/秒，{checkouts / elapsed:.1f} 单/秒")
+
+def timed(stats, step, session, method, path, expect=(200,), **kwargs):
+    started = time.perf_counter()
+    status, body = session.request(method, path, **kwargs)
+    stats.record(step, time.perf_counter() - started, status in expect)
+    return status, body
+
+def login(stats, session, email, password):
+    data = {'email': email, 'password': password}
+    # 通过HTTP登录时需要从登录页取 CSRF 令牌
+    if isinstance(session, HttpSession):
+        _, body = session.request('GET', '/auth/login')
+        match = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', body)
+        if match:
+            data['csrf_token'] = match.group(1)
+    status, _ = timed(stats, 'login', session, 'POST', '/auth/login', expect=(302,), data=data)
+    return status == 302
+
+def customer_flow(stats, session, manifest, rng):
+    """顾客：浏览 → 加购 → 结算"""
+    restaurant_ids = list(manifest['restaurants'])
+    # 前面的餐厅被更多人访问
+    rid = rng.choices(restaurant_ids, weights=[1.0 / (i + 1) for i in range(len(restaurant_ids))])[0]
+    dish_ids = manifest['restaurants'][rid]
+
+    timed(stats, 'restaurants', session, 'GET', '/restaurants')
+    timed(stats, 'menu', session, 'GET', f'/restaurant/{rid}/menu')
+    timed(stats, 'dish_detail', session, 'GET', f'/dish/{rng.choice(dish_ids)}')
+
+    session.request('POST', '/api/clear-cart')
+    for dish_id in rng.sample(dish_ids, min(len(dish_ids), rng.randint(1, 3))):
+        timed(stats, 'add_to_cart', session, 'POST', f'/api/add-to-cart/{dish_id}',
+              json_body={'quantity': rng.randint(1, 2)})
+    timed(stats, 'my_table', session, 'GET', '/my-table')
+
+    status, body = timed(stats, 'checkout', session, 'POST', '/order/checkout', expect=(200, 202),
+                         json_body={'remarks': ''}, headers={'Idempotency-Key': uuid.uuid4().hex})
+    if status in (200, 202):
+        order_id = json.loads(body).get('order_id')
+        if order_id:
+            timed(stats, 'order_complete', session, 'GET', f'/order/complete/{order_id}')
+
+def owner_flow(stats, session, owner):
+    """店主：查看仪表板和订单"""
+    rid = owner['restaurant_id']
+    timed(stats, 'owner_dashboard', session, 'GET', f'/restaurant/{rid}/dashboard')
+    timed(stats, 'owner_orders', session, 'GET', f'/restaurant/{rid}/orders')
+
+def run_user(stats, make_session, manifest, args, index):
+    rng = random.Random(args.seed + index)
+    session = make_session()
+    is_owner = index < round(args.users * args.owner_ratio)
+    if is_owner:
+        account = manifest['owners'][index % len(manifest['owners'])]
+    else:
+        account = rng.choice(manifest['customers'])
+
+    if not login(stats, session, account['email'], manifest['password']):
+        return
+    for _ in range(args.iterations):
+        if is_owner:
+            owner_flow(stats, session, account)
+        else:
+            customer_flow(stats, session, manifest, rng)
+        if args.think_time:
+            time.sleep(rng.uniform(0, args.think_time))
+
+def main():
+    parser = argparse.ArgumentParser(description='回放顾客和店主流程的压测驱动')
+    parser.add_argument('--url', help='压测已启动的服务器，不指定时在进程内调用应用')
+    parser.add_argument('--manifest', default=os.path.join('instance', 'loadtest_manifest.json'))
+    parser.add_argument('--users', type=int, default=10, help='并发虚拟用户数')
+    parser.add_argument('--iterations', type=int, default=5, help='每个用户重复流程的次数')
+    parser.add_argument('--owner-ratio', type=float, default=0.1, help='店主用户的比例')
+    parser.add_argument('--think-time', type=float, default=0.0, help='每轮之间的最大随机等待（秒）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if args.url:
+        make_session = lambda: HttpSession(args.url)
+    else:
+        from app import create_app
+        app = create_app()
+        app.config['WTF_CSRF_ENABLED'] = False
+        make_session = lambda: TestClientSession(app)
+
+    print(f"=== 压测：{args.users} 个用户 × {args.iterations} 轮，目标 {args.url or '进程内应用'} ===")
+    stats = Stats()
+    started = time.time()
+    threads = [
+        threading.Thread(target=run_user, args=(stats, make_session, manifest, args, index))
+        for index in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats.report(time.time() - started)
+
+if __name__ == '__main__':
+    main()
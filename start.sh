@@ -23,6 +23,13 @@ pip install -r requirements.txt 2>/dev/null || echo "⚠️  requirements.txt不
 export FLASK_DEBUG=False
 export SERVER_HOST=0.0.0.0
 export SERVER_PORT=5000
+# sync: 每个worker同时处理一个请求; gevent: 协程worker，AI调用等I/O等待不阻塞其他请求
+export SERVER_MODE=${SERVER_MODE:-sync}
+# 订单实时推送（SSE）只在 SERVER_MODE=gevent 且 ORDER_EVENTS_BROKER=redis 时开启，
+# 否则订单页和下单完成页定时轮询（同步 worker 中一个SSE长连接会占满整个worker）
+export ORDER_EVENTS_BROKER=${ORDER_EVENTS_BROKER:-memory}
+# gunicorn 多worker共享的监控指标目录（/metrics 汇总所有worker）
+export METRICS_MULTIPROC_DIR=${METRICS_MULTIPROC_DIR:-"$(pwd)/instance/metrics"}
 
 # 创建必要目录
 mkdir -p app/static/uploads/avatars
@@ -37,9 +44,18 @@ echo "📡 服务器启动在: http://0.0.0.0:5000"
 echo "🌐 客户端可通过IP地址访问"
 echo "-" * 50
 
+# 建表和补建新列只在部署时执行一次，worker 启动时不再检查（SCHEMA_AUTO_UPGRADE）
+echo "🗄️  检查数据库结构..."
+flask --app run init-db || exit 1
+
 # 使用Gunicorn启动（生产环境）
 if command -v gunicorn &> /dev/null; then
-    echo "🔧 使用Gunicorn启动..."
+    echo "🔧 使用Gunicorn启动（${SERVER_MODE} 模式）..."
+    if [ "$SERVER_MODE" = "gevent" ] && [ "$ORDER_EVENTS_BROKER" = "redis" ]; then
+        echo "📣 订单实时推送: SSE"
+    else
+        echo "📣 订单实时推送: 关闭（页面每 15 秒轮询）"
+    fi
     gunicorn -w 4 -b 0.0.0.0:5000 "app:create_app()" --access-logfile logs/access.log --error-logfile logs/error.log
 else
     echo "🔧 使用Flask开发服务器启动..."
@@ -1,6 +1,13 @@
 # start_server.py
 import os
 import sys
+
+# SERVER_MODE=gevent 时必须在导入应用之前打补丁
+SERVER_MODE = os.environ.get('SERVER_MODE', 'threaded')
+if SERVER_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 from app import create_app
 from config import Config
 
@@ -21,10 +28,15 @@ if __name__ == '__main__':
     print(f"🌐 客户端访问地址: http://{server_host}:{server_port}")
     print(f"📁 数据库位置: {app.config['SQLALCHEMY_DATABASE_URI']}")
     print(f"🔧 调试模式: {app.config.get('DEBUG', False)}")
+    print(f"⚙️  运行模式: {SERVER_MODE}")
     print("-" * 50)
     
-    app.run(
-        host=server_host,
-        port=server_port,
-        debug=app.config.get('DEBUG', False)
-    )
\ No newline at end of file
+    if SERVER_MODE == 'gevent':
+        from gevent.pywsgi import WSGIServer
+        WSGIServer((server_host, server_port), app).serve_forever()
+    else:
+        app.run(
+            host=server_host,
+            port=server_port,
+            debug=app.config.get('DEBUG', False)
+        )
@@ -0,0 +1,91 @@
+"""响应压缩与条件请求：压缩后的 ETag 带编码后缀，用它重新验证仍应得到 304"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import User, Restaurant, Category, Dish
+from app.services.compression import brotli_available
+from config import Config
+
+ENCODINGS = ['gzip', 'identity'] + (['br'] if brotli_available() else [])
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "app.db"}'
+        SQLALCHEMY_BINDS = {'archive': f'sqlite:///{tmp_path / "archive.db"}'}
+        CART_SQLITE_PATH = str(tmp_path / 'carts.db')
+        ORDER_INGEST_QUEUE_PATH = str(tmp_path / 'order_queue.db')
+        METRICS_MULTIPROC_DIR = None
+        LOG_FILE = ''
+        SCHEMA_AUTO_UPGRADE = True
+        COMPRESS_ENABLED = True
+        COMPRESS_MIN_SIZE = 200
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        customer = User(username='customer', email='customer@example.com')
+        customer.set_password('password')
+        owner = User(username='owner', email='owner@example.com', role='owner')
+        owner.set_password('password')
+        db.session.add_all([customer, owner])
+        db.session.flush()
+        restaurant = Restaurant(name='测试餐厅', owner_id=owner.id)
+        db.session.add(restaurant)
+        db.session.flush()
+        category = Category(name='主食', restaurant_id=restaurant.id)
+        db.session.add(category)
+        db.session.flush()
+        for i in range(5):
+            db.session.add(Dish(name=f'菜品{i}', description='好吃', price=10 + i,
+                                category_id=category.id, restaurant_id=restaurant.id))
+        db.session.commit()
+        app.config['TEST_RESTAURANT_ID'] = restaurant.id
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': 'customer@example.com', 'password': 'password'})
+    assert response.status_code == 302
+    return client
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_menu_revalidates_with_compressed_etag(app, client, encoding):
+    url = f"/restaurant/{app.config['TEST_RESTAURANT_ID']}/menu"
+    headers = {'Accept-Encoding': encoding}
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    assert first.headers.get('Content-Encoding') == (None if encoding == 'identity' else encoding)
+    etag = first.headers['ETag']
+    if encoding != 'identity':
+        assert etag.endswith(f'-{encoding}"')
+
+    second = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_asset_revalidates_with_compressed_etag(app, client, encoding):
+    with app.test_request_context():
+        url = app.jinja_env.globals['asset_url']('vendor/bootstrap.min.css')
+    headers = {'Accept-Encoding': encoding}
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    assert 'immutable' in first.headers['Cache-Control']
+    assert first.headers.get('Content-Encoding') == (None if encoding == 'identity' else encoding)
+
+    second = client.get(url, headers={**headers, 'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']